@@ -1,21 +1,68 @@
+import importlib
+import threading
+from collections.abc import Mapping
 from .base import BaseAnalyzer
-from .spread import SpreadAnalyzer
-from .bs_deviation import BSDeviationAnalyzer
-from .skew import SkewAnalyzer
-from .macro_overlay import MacroOverlayAnalyzer
-from .iron_condor import IroncondorAnalyzer
 
-def init_analyzers(app):
-    """Initialize all analyzers and register with Flask app"""
-    app.analyzers = {
-        'spread': SpreadAnalyzer(),
-        'bs_deviation': BSDeviationAnalyzer(),
-        'skew': SkewAnalyzer(),
-        'macro_overlay': MacroOverlayAnalyzer(),
-        'iron_condor': IroncondorAnalyzer()
-    }
+# Analyzer classes by registry name. Modules are imported only when an
+# analyzer is first used, so pandas/scipy stay out of app startup.
+ANALYZER_CLASSES = {
+    'spread': 'analyzers.spread:SpreadAnalyzer',
+    'bs_deviation': 'analyzers.bs_deviation:BSDeviationAnalyzer',
+    'skew': 'analyzers.skew:SkewAnalyzer',
+    'macro_overlay': 'analyzers.macro_overlay:MacroOverlayAnalyzer',
+    'iron_condor': 'analyzers.iron_condor:IroncondorAnalyzer',
+    'short_vertical': 'analyzers.short_vertical:ShortverticalAnalyzer'
+}
+
+def _load_class(path):
+    module_name, class_name = path.split(':')
+    return getattr(importlib.import_module(module_name), class_name)
+
+def create_analyzer(name):
+    """A new, unregistered instance of the named analyzer (e.g. for replays)"""
+    return _load_class(ANALYZER_CLASSES[name])()
+
+def __getattr__(name):
+    # Keep `from analyzers import SpreadAnalyzer` working without eager imports
+    for path in ANALYZER_CLASSES.values():
+        if path.endswith(f':{name}'):
+            return _load_class(path)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+class AnalyzerRegistry(Mapping):
+    """Analyzers by name; each one is imported and constructed on first access"""
     
-    # Initialize each analyzer
-    for analyzer in app.analyzers.values():
-        if hasattr(analyzer, 'init_app'):
-            analyzer.init_app(app)
\ No newline at end of file
+    def __init__(self, app, classes=None):
+        self.app = app
+        self._classes = dict(classes or ANALYZER_CLASSES)
+        self._instances = {}
+        self._lock = threading.Lock()
+        
+    def __getitem__(self, name):
+        analyzer = self._instances.get(name)
+        if analyzer is not None:
+            return analyzer
+        if name not in self._classes:
+            raise KeyError(name)
+        with self._lock:
+            analyzer = self._instances.get(name)
+            if analyzer is None:
+                analyzer = _load_class(self._classes[name])()
+                if hasattr(analyzer, 'init_app'):
+                    analyzer.init_app(self.app)
+                self._instances[name] = analyzer
+        return analyzer
+        
+    def __iter__(self):
+        return iter(self._classes)
+        
+    def __len__(self):
+        return len(self._classes)
+        
+    def loaded(self):
+        """Analyzers constructed so far"""
+        return dict(self._instances)
+
+def init_analyzers(app):
+    """Register all analyzers with the Flask app; they are built lazily"""
+    app.analyzers = AnalyzerRegistry(app)
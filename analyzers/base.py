@@ -1,34 +1,177 @@
 import logging
-from datetime import datetime, timedelta
-from models import db, SPXOptionStream, SPXSpot
+from collections import deque
+from datetime import datetime
+from models import db
+from analyzers.persistence import analysis_writer
+from analyzers.broadcast import ResultChannel
+from analyzers.chain import MarketData
+from analyzers.ingest import chain_loader, spot_price
+from analyzers.metrics import chain_rows_fetched, stage
+from analyzers.snapshot_cache import chain_cache
 
 class BaseAnalyzer:
     name = "base"
     description = "Base analyzer class"
     refresh_interval = 30  # seconds
+    # Skip analysis when the chain snapshot has not changed since the last run
+    skip_unchanged_snapshot = True
+    # Result lists that `?since=<version>` requests return as deltas, with
+    # the fields that identify an item across versions
+    delta_collections = {}
+    # Fields ignored when deciding whether an item changed
+    delta_ignored_fields = ('timestamp',)
+    # Number of past result versions kept for deltas
+    result_history_size = 32
+    # Write results to spx_analysis (turned off for replays)
+    persist_results = True
     
     def __init__(self):
         self.last_run = None
         self.last_results = None
         self.logger = logging.getLogger(f"analyzer.{self.name}")
         self.spot_price = None
+        self.snapshot_version = None
+        # Set while a background scheduler publishes this analyzer's results
+        self.scheduled = False
+        # Increases by one on every publish; used as the ETag and SSE event id
+        self.result_version = 0
+        # (result_version, results) of the last publish, swapped in as one
+        # tuple so routes always read a version with its own results
+        self.published = (0, None)
+        self.channel = ResultChannel(self.name)
+        # VolSurfaceCache for this analyzer's surfaces; None shares vol_surface.surface_cache
+        self.surface_cache = None
+        self._history = deque(maxlen=self.result_history_size)
         
-    # def analyze(self, market_data):
-    #     """To be implemented by each analyzer"""
-    #     raise NotImplementedError
+    def analyze(self, market_data):
+        """To be implemented by each analyzer"""
+        raise NotImplementedError
         
     def get_latest_results(self):
-        """Get cached results or fetch new ones"""
-        if not self.last_results or self._needs_refresh():
-            market_data = self._fetch_market_data()
-            if market_data:
-                return market_data
+        """
+        Get the last published results.
+        
+        When a scheduler is running this never touches the database; without
+        one, a stale or missing result is refreshed on demand.
+        """
+        if not self.scheduled and (not self.last_results or self._needs_refresh()):
+            try:
+                self.run_cycle()
+            except Exception as e:
+                self.logger.error(f"On-demand analysis failed: {str(e)}")
         return self.last_results or {
             'timestamp': datetime.now().isoformat(),
             'spot_price': None,
             'error': 'No market data available'
         }
         
+    def run_cycle(self):
+        """
+        Fetch the shared snapshot, analyze it and publish the results.
+        
+        Analysis is skipped when the snapshot has not changed since the last
+        published result. Each stage is timed for /metrics.
+        """
+        with stage(self.name, 'fetch'):
+            market_data = self.get_market_data()
+        if (self.skip_unchanged_snapshot and self.last_results is not None
+                and not self.is_new_snapshot(market_data)):
+            self.last_run = datetime.now()
+            return self.last_results
+        
+        with stage(self.name, 'analyze'):
+            results = self.analyze(market_data)
+        self.snapshot_version = market_data.get('snapshot_version') if market_data else None
+        with stage(self.name, 'publish'):
+            self.publish(results)
+        return results
+        
+    def publish(self, results):
+        """Make results the ones routes read and push them to stream subscribers"""
+        self.last_results = results
+        self.last_run = datetime.now()
+        self.push(results)
+        
+    def republish(self, results):
+        """Replace the published results between runs (e.g. after a position change) and push them"""
+        self.last_results = results
+        self.push(results)
+        
+    def push(self, results):
+        """
+        Give results a new version and send them to stream subscribers.
+        
+        Used directly when the published state changes between runs (e.g.
+        a position is opened), so ETags and deltas see the change.
+        """
+        version = self.result_version + 1
+        if self.delta_collections:
+            self._history.append((version, self._index_collections(results)))
+        self.published = (version, results)
+        self.result_version = version
+        try:
+            self.channel.publish(version, self.stream_payload(results))
+        except Exception as e:
+            self.logger.error(f"Failed to push results to subscribers: {str(e)}")
+        
+    def _index_collections(self, results):
+        index = {}
+        for name, key_fields in self.delta_collections.items():
+            items = results.get(name) or []
+            index[name] = {
+                tuple(item.get(f) for f in key_fields): dict(item) for item in items
+            }
+        return index
+        
+    def _comparable(self, item):
+        return {k: v for k, v in item.items() if k not in self.delta_ignored_fields}
+        
+    def changes_since(self, version):
+        """
+        Items added, changed or removed in each delta collection since
+        `version`.
+        
+        Returns {'changed': {name: [items]}, 'removed': {name: [keys]}}, or
+        None when `version` is too old (or unknown) to diff against.
+        """
+        if not self._history:
+            return None
+        history = list(self._history)
+        current_version, current = history[-1]
+        if version == current_version:
+            previous = current
+        else:
+            previous = next((index for v, index in history if v == version), None)
+            if previous is None:
+                return None
+        
+        changed, removed = {}, {}
+        for name, items in current.items():
+            before = previous.get(name, {})
+            changed[name] = [
+                item for key, item in items.items()
+                if key not in before or self._comparable(before[key]) != self._comparable(item)
+            ]
+            removed[name] = [list(key) for key in before if key not in items]
+        return {'changed': changed, 'removed': removed}
+        
+    def stream_payload(self, results):
+        """What stream subscribers receive for a published result"""
+        return results
+        
+    def get_market_data(self):
+        """Get the shared market data snapshot (fetched at most once per refresh interval)"""
+        market_data = chain_cache.get(self._fetch_market_data)
+        if market_data:
+            self.spot_price = market_data.get('spx_price', market_data.get('spot_price'))
+        return market_data
+
+    def is_new_snapshot(self, market_data):
+        """True if market_data is a snapshot this analyzer has not processed yet"""
+        if not market_data or market_data.get('snapshot_version') is None:
+            return True
+        return market_data['snapshot_version'] != self.snapshot_version
+
     def _needs_refresh(self):
         if not self.last_run:
             return True
@@ -37,27 +180,14 @@ class BaseAnalyzer:
     def _fetch_market_data(self):
         """Fetch market data from database tables"""
         try:
-            # Get current spot price
-            spot = db.session.execute(
-                db.select(SPXOptionStream)
-                .order_by(SPXOptionStream.timestamp.desc())
-                .limit(1)
-            ).scalar()
-            self.spot_price = spot.strike_price if spot else None
-
-            # Get options data from last 5 minutes (increased from 2)
-            cutoff = datetime.now() - timedelta(minutes=5)
+            # Only rows newer than the last load are read; the loader keeps
+            # the latest quote per (exp_date, strike_price) in memory
+            chain = chain_loader.load(db.session)
+            chain_rows_fetched.observe(chain_loader.rows_fetched)
             
-            options = db.session.execute(
-                db.select(SPXOptionStream)
-                # .where(SPXOptionStream.timestamp >= cutoff)
-                .order_by(SPXOptionStream.timestamp.desc())
-            ).scalars().all()
-
-            # options = db.session.query(SPXOptionStream).limit(10).all()
-            
-            if not options:
-                self.logger.warning(f"No options data found since {cutoff}")
+            if not len(chain):
+                self.spot_price = None
+                self.logger.warning("No options data found in spx_0dte_stream")
                 # Return minimal data structure to prevent template errors
                 return {
                     'timestamp': datetime.now().isoformat(),
@@ -67,80 +197,31 @@ class BaseAnalyzer:
                     'error': 'No options data available'
                 }
                 
-            # Organize data by expiration and strike
-            calls = []
-            puts = []
-            for opt in options:
-                # if opt.exp_date not in organized_data:
-                #     organized_data = {'calls': [], 'puts': []}
-            
-                calls.append({
-                    'strike': opt.strike_price,
-                    'bid': opt.call_bid,
-                    'ask': opt.call_ask,
-                    'last': opt.call_last,
-                    'volatility': opt.call_iv,
-                    'delta': opt.call_delta,
-                    'gamma': opt.call_gamma,
-                    'theta': opt.call_theta,
-                    'vega': opt.call_vega,
-                    'openInterest': opt.call_open_int,
-                    'net_change': opt.call_net_chg,
-                    'timestamp': opt.timestamp.isoformat(),
-                    'daysToExpiration': 0,
-                    'type': 'C'
-                })
-                
-                puts.append({
-                    'strike': opt.strike_price,
-                    'bid': opt.put_bid,
-                    'ask': opt.put_ask,
-                    'last': opt.put_last,
-                    'volatility': opt.put_iv,
-                    'delta': opt.put_delta,
-                    'gamma': opt.put_gamma,
-                    'theta': opt.put_theta,
-                    'vega': opt.put_vega,
-                    'openInterest': opt.put_open_int,
-                    'net_change': opt.put_net_chg,
-                    'timestamp': opt.timestamp.isoformat(),
-                    'daysToExpiration': 0,
-                    'type': 'P'
-                })
+            self.spot_price = spot_price(db.session, chain)
             
-            
-            return {
-                'timestamp': datetime.now().isoformat(),
-                'spx_price': self.spot_price,
-                'calls': calls,
-                'puts': puts
-                #'primary_expiry': min(organized_data.keys()) if organized_data else None
-            }
+            return MarketData(
+                chain,
+                timestamp=datetime.now().isoformat(),
+                spx_price=self.spot_price,
+                chain_version=chain_loader.book.version
+            )
         except Exception as e:
             self.logger.error(f"Failed to fetch market data: {str(e)}")
             return None
         
     def _log_results(self, results):
-        """Store results to spx_analysis table"""
-        if not results or 'error' in results:
+        """Queue results for the spx_analysis table (written in batches)"""
+        if not self.persist_results or not results or 'error' in results:
             return
             
-        try:
-            record = SPXAnalysis(
-                timestamp=datetime.now(),
-                spx_price=results.get('spot_price'),
-                opportunity={
+        with stage(self.name, 'log'):
+            queued = analysis_writer.put({
+                'timestamp': datetime.now(),
+                'spx_price': results.get('spot_price'),
+                'opportunity': {
                     'analyzer': self.name,
                     'data': results
                 }
-            )
-            
-            db.session.add(record)
-            db.session.commit()
-            
-            self.last_results = results
-            self.last_run = datetime.now()
-            self.logger.info(f"Analysis completed at {self.last_run}")
-        except Exception as e:
-            db.session.rollback()
-            self.logger.error(f"Failed to save results: {str(e)}")
\ No newline at end of file
+            })
+        if queued:
+            self.logger.info(f"Analysis completed at {datetime.now()}")
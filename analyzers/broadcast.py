@@ -0,0 +1,82 @@
+import json
+import logging
+import threading
+import time
+
+logger = logging.getLogger("analyzer.broadcast")
+
+
+def format_event(event_id, data, event='result'):
+    """One server-sent event frame"""
+    return f"id: {event_id}\nevent: {event}\ndata: {data}\n\n"
+
+
+class ResultChannel:
+    """
+    Fan-out of an analyzer's published results to server-sent event streams.
+
+    Each published result is serialized once and shared by every
+    subscriber. Subscribers always receive the newest result: a client that
+    falls behind skips straight to the latest one instead of replaying a
+    backlog, which is what a dashboard wants.
+
+    Event ids are the analyzer's result version. A client reconnecting
+    with a Last-Event-ID equal to the current version waits for the next
+    result; any other id (older, or from before a server restart) gets the
+    current result straight away.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.subscribers = 0
+        self.published = 0
+        self._event = None  # (event_id, serialized payload)
+        self._cond = threading.Condition()
+
+    def publish(self, event_id, payload):
+        """Serialize payload and wake every subscriber"""
+        data = json.dumps(payload, default=str)
+        with self._cond:
+            self._event = (event_id, data)
+            self.published += 1
+            self._cond.notify_all()
+
+    def latest(self):
+        with self._cond:
+            return self._event
+
+    def _wait_for_event(self, last_id, timeout):
+        with self._cond:
+            self._cond.wait_for(
+                lambda: self._event is not None and self._event[0] != last_id,
+                timeout
+            )
+            if self._event is not None and self._event[0] != last_id:
+                return self._event
+            return None
+
+    def subscribe(self, last_event_id=None, heartbeat=15, retry_ms=3000):
+        """
+        Generator of SSE frames for one client.
+
+        A comment line is sent every `heartbeat` seconds without a result so
+        proxies keep the connection open and dead clients are noticed.
+        """
+        with self._cond:
+            self.subscribers += 1
+        logger.debug(f"{self.name}: subscriber connected ({self.subscribers} total)")
+
+        try:
+            yield f"retry: {retry_ms}\n\n"
+            last_id = last_event_id
+            while True:
+                event = self._wait_for_event(last_id, heartbeat)
+                if event is None:
+                    yield f": heartbeat {int(time.time())}\n\n"
+                    continue
+                last_id, data = event
+                yield format_event(last_id, data)
+        finally:
+            with self._cond:
+                self.subscribers -= 1
+            logger.debug(f"{self.name}: subscriber disconnected ({self.subscribers} left)")
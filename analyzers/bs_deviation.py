@@ -1,4 +1,9 @@
 from analyzers.base import BaseAnalyzer
+from analyzers.chain import FEED_IV_SCALE, json_float
+from analyzers.vol_surface import vol_surface
+from analyzers.pricing import (
+    bs_price_greeks, call_flags, implied_volatility, parity_forward, years_to_expiration
+)
 import numpy as np
 import pandas as pd
 from scipy.stats import norm
@@ -7,8 +12,19 @@ import pytz
 
 
 class BSDeviationAnalyzer(BaseAnalyzer):
+    name = "bs_deviation"
+    description = "Black-Scholes Deviation Analyzer"
+    
+    # Options cheaper than this are too noisy to compare in relative terms
+    MIN_THEORETICAL_PRICE = 0.05
+    # Largest deviations reported per refresh
+    MAX_DEVIATIONS = 50
+    
     def __init__(self):
         super().__init__()
+        # Previous IV solution, sorted by key, used to warm-start the solver
+        self._iv_cache_keys = np.empty(0, dtype=np.int64)
+        self._iv_cache_values = np.empty(0, dtype=np.float64)
         
     def black_scholes(self, S, K, T, sigma, r=0, option_type='call'):
         """
@@ -66,7 +82,8 @@ class BSDeviationAnalyzer(BaseAnalyzer):
         current_time: Current time (default: now)
         
         Returns:
-        DataFrame with option data and calculated Black-Scholes prices
+        DataFrame with option data, calculated Black-Scholes prices and
+        greeks (BS_Delta, BS_Gamma, BS_Theta per year, BS_Vega per 1.00 vol)
         """
         if current_time is None:
             current_time = datetime.now(pytz.utc)
@@ -74,21 +91,165 @@ class BSDeviationAnalyzer(BaseAnalyzer):
         # Market closing time (3 PM Central)
         market_close = time(15, 0)
         
-        # Calculate Black-Scholes price for each option
-        option_data['BS_Price'] = option_data.apply(
-            lambda row: self.black_scholes(
-                S=row['underlying_price'],
-                K=row['strike'],
-                T=self.calculate_time_to_expiration(current_time, row['expiration_date'], market_close),
-                # r=row['risk_free_rate'],
-                r = 0,
-                sigma=row['IV'],
-                option_type=row['option_type']
-            ), axis=1
+        # Price the whole frame at once; time to expiry is computed once
+        # per expiration date rather than once per row
+        T = years_to_expiration(current_time, option_data['expiration_date'].to_numpy(), market_close)
+        results = bs_price_greeks(
+            S=option_data['underlying_price'].to_numpy(dtype=np.float64),
+            K=option_data['strike'].to_numpy(dtype=np.float64),
+            T=T,
+            # r=option_data['risk_free_rate'].to_numpy(dtype=np.float64),
+            r=0,
+            sigma=option_data['IV'].to_numpy(dtype=np.float64),
+            is_call=call_flags(option_data['option_type'].to_numpy())
         )
         
+        option_data['BS_Price'] = results['price']
+        option_data['BS_Delta'] = results['delta']
+        option_data['BS_Gamma'] = results['gamma']
+        option_data['BS_Theta'] = results['theta']
+        option_data['BS_Vega'] = results['vega']
+        
+        return option_data
+    def chain_to_frame(self, chain, surface=None):
+        """
+        Long-format DataFrame with one row per call and per put of a ChainSnapshot.
+        
+        underlying_price is the put-call parity forward of each expiration and
+        market_price is the bid/ask mid. With a VolSurface, surface_iv is the
+        fitted smile's IV at each strike.
+        """
+        forward = parity_forward(chain.exp_date, chain.strike, chain.call.mid, chain.put.mid)
+        n = len(chain)
+        frame = pd.DataFrame({
+            'strike': np.concatenate([chain.strike, chain.strike]),
+            'expiration_date': np.concatenate([chain.exp_date, chain.exp_date]),
+            'option_type': np.repeat(['call', 'put'], n),
+            'underlying_price': np.concatenate([forward, forward]),
+            'market_price': np.concatenate([chain.call.mid, chain.put.mid]),
+            'feed_iv': np.concatenate([chain.call.iv, chain.put.iv]) / FEED_IV_SCALE
+        })
+        if surface is not None:
+            smile = surface.expiry_iv(chain.exp_date, chain.strike)
+            frame['surface_iv'] = np.concatenate([smile, smile])
+        return frame
+    def _iv_keys(self, option_data):
+        # One int64 key per (expiration, strike, type) for warm-start lookups
+        days = option_data['expiration_date'].to_numpy().astype('datetime64[D]').astype(np.int64)
+        strikes = np.rint(option_data['strike'].to_numpy(dtype=np.float64) * 100).astype(np.int64)
+        return days * 10_000_000 + strikes * 2 + call_flags(option_data['option_type'].to_numpy())
+    def recompute_iv(self, option_data, current_time=None):
+        """
+        Solve implied volatility from market_price for every row at once
+        
+        The solver is warm-started from the previous call's solution for the
+        same (expiration, strike, type), so a refresh usually converges in a
+        couple of Newton steps. Rows that cannot be solved fall back to the
+        volatility surface (surface_iv column), then to the feed IV (feed_iv
+        column), when present.
+        
+        Returns:
+        DataFrame with an IV column (decimal volatility)
+        """
+        if current_time is None:
+            current_time = datetime.now(pytz.utc)
+        
+        keys = self._iv_keys(option_data)
+        guess = np.full(len(keys), np.nan)
+        if self._iv_cache_keys.size:
+            pos = np.clip(np.searchsorted(self._iv_cache_keys, keys), 0, self._iv_cache_keys.size - 1)
+            hit = self._iv_cache_keys[pos] == keys
+            guess[hit] = self._iv_cache_values[pos[hit]]
+        
+        iv = implied_volatility(
+            option_data['market_price'].to_numpy(dtype=np.float64),
+            option_data['underlying_price'].to_numpy(dtype=np.float64),
+            option_data['strike'].to_numpy(dtype=np.float64),
+            years_to_expiration(current_time, option_data['expiration_date'].to_numpy()),
+            r=0,
+            is_call=call_flags(option_data['option_type'].to_numpy()),
+            initial_guess=guess
+        )
+        
+        solved = np.isfinite(iv)
+        order = np.argsort(keys[solved])
+        self._iv_cache_keys = keys[solved][order]
+        self._iv_cache_values = iv[solved][order]
+        
+        for fallback in ('surface_iv', 'feed_iv'):
+            if fallback in option_data:
+                iv = np.where(np.isfinite(iv), iv, option_data[fallback].to_numpy(dtype=np.float64))
+        option_data['IV'] = iv
         return option_data
-    def analyze(self, option_data):
+    def analyze(self, market_data, current_time=None):
         """
         Analyze the option data and return the results
-        """
\ No newline at end of file
+        
+        Compares every option's market mid with its Black-Scholes value at the
+        expiration's at-the-money volatility. IVs are solved from mids rather
+        than taken from the feed. Time to expiry is measured from the newest
+        quote (unless current_time is given), so replayed snapshots are
+        priced at their own time.
+        """
+        chain = getattr(market_data, 'chain', None)
+        if chain is None or not len(chain):
+            return {
+                'timestamp': datetime.now().isoformat(),
+                'error': 'No market data available',
+                'deviations': [],
+                'summary': {}
+            }
+        if current_time is None:
+            current_time = chain.quote_time()
+        
+        option_data = self.chain_to_frame(chain, vol_surface(market_data, self.surface_cache))
+        quoted = np.isfinite(option_data['market_price']) & (option_data['market_price'] > 0)
+        option_data = self.recompute_iv(option_data[quoted].reset_index(drop=True), current_time)
+        
+        # At-the-money volatility per expiration: mean IV at the strike nearest the forward
+        distance = (option_data['strike'] - option_data['underlying_price']).abs()
+        nearest = distance == distance.groupby(option_data['expiration_date']).transform('min')
+        atm_iv = option_data['IV'].where(nearest).groupby(option_data['expiration_date']).transform('mean')
+        
+        priced = self.process_option_data(option_data.assign(IV=atm_iv), current_time)
+        theoretical = priced['BS_Price'].to_numpy()
+        market = option_data['market_price'].to_numpy()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            deviation = np.where(theoretical >= self.MIN_THEORETICAL_PRICE, market / theoretical - 1, np.nan)
+        
+        valid = np.flatnonzero(np.isfinite(deviation))
+        if not valid.size:
+            return {
+                'timestamp': datetime.now().isoformat(),
+                'spot_price': market_data.get('spx_price'),
+                'error': 'No options could be priced',
+                'deviations': [],
+                'summary': {}
+            }
+        
+        abs_deviation = np.abs(deviation[valid])
+        top = valid[np.argsort(-abs_deviation, kind='stable')[:self.MAX_DEVIATIONS]]
+        strikes = option_data['strike'].to_numpy()
+        types = option_data['option_type'].to_numpy()
+        ivs = option_data['IV'].to_numpy()
+        
+        return {
+            'timestamp': datetime.now().isoformat(),
+            'spot_price': market_data.get('spx_price'),
+            'deviations': [
+                {
+                    'strike': float(strikes[i]),
+                    'type': types[i],
+                    'market': float(market[i]),
+                    'theoretical': float(theoretical[i]),
+                    'deviation': float(deviation[i]),
+                    'iv': json_float(ivs[i])
+                }
+                for i in top
+            ],
+            'summary': {
+                'max_deviation': float(abs_deviation.max()),
+                'avg_deviation': float(abs_deviation.mean()),
+                'priced_count': int(valid.size)
+            }
+        }
@@ -0,0 +1,459 @@
+import logging
+from datetime import datetime, timezone
+import numpy as np
+from models import SPXOptionStream
+
+logger = logging.getLogger("analyzer.chain")
+
+# Per-side quote fields kept as columns on a ChainSnapshot
+SIDE_FIELDS = ('bid', 'ask', 'last', 'iv', 'delta', 'gamma', 'theta', 'vega', 'oi', 'net_chg')
+
+# spx_0dte_stream column suffix for each side field (call_<suffix> / put_<suffix>)
+COLUMN_SUFFIXES = {
+    'bid': 'bid',
+    'ask': 'ask',
+    'last': 'last',
+    'iv': 'iv',
+    'delta': 'delta',
+    'gamma': 'gamma',
+    'theta': 'theta',
+    'vega': 'vega',
+    'oi': 'open_int',
+    'net_chg': 'net_chg'
+}
+
+# Key used for each side field in the legacy per-row 'calls'/'puts' dicts
+LEGACY_KEYS = {
+    'bid': 'bid',
+    'ask': 'ask',
+    'last': 'last',
+    'iv': 'volatility',
+    'delta': 'delta',
+    'gamma': 'gamma',
+    'theta': 'theta',
+    'vega': 'vega',
+    'oi': 'openInterest',
+    'net_chg': 'net_change'
+}
+
+LEGACY_LIST_KEYS = ('calls', 'puts')
+
+# spx_0dte_stream quotes implied volatility in percent (18.5 == 0.185)
+FEED_IV_SCALE = 100.0
+
+
+def chain_columns(model=SPXOptionStream):
+    """Columns selected to build a ChainSnapshot, in row order"""
+    columns = [model.timestamp, model.exp_date, model.strike_price]
+    for side in ('call', 'put'):
+        columns.extend(getattr(model, f"{side}_{COLUMN_SUFFIXES[f]}") for f in SIDE_FIELDS)
+    return columns
+
+
+def json_float(value):
+    """Python float for JSON output, None for NaN"""
+    value = float(value)
+    return None if value != value else value
+
+
+def _epoch_us(ts):
+    # Naive timestamps (e.g. from SQLite) are taken to be UTC
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)
+    return ts.timestamp() * 1e6
+
+
+class SideColumns:
+    """Struct-of-arrays quote columns for one side (calls or puts) of a chain"""
+    __slots__ = SIDE_FIELDS
+
+    def __init__(self, **columns):
+        for field in SIDE_FIELDS:
+            setattr(self, field, columns[field])
+
+    @classmethod
+    def empty(cls):
+        return cls(**{f: np.empty(0, dtype=np.float64) for f in SIDE_FIELDS})
+
+    def take(self, index):
+        """Return a new SideColumns holding the selected rows"""
+        return SideColumns(**{f: getattr(self, f)[index] for f in SIDE_FIELDS})
+
+    @property
+    def mid(self):
+        return (self.bid + self.ask) / 2
+
+
+class ChainSnapshot:
+    """
+    Columnar view of option chain quotes.
+
+    Every row is one (timestamp, exp_date, strike_price) quote. Common columns
+    live on the snapshot; per-side quote columns live on `call` and `put`.
+    All quote columns are float64 with NaN for missing values.
+    """
+
+    def __init__(self, timestamp, exp_date, strike, call, put):
+        self.timestamp = timestamp  # int64 epoch microseconds (UTC)
+        self.exp_date = exp_date    # datetime64[D]
+        self.strike = strike        # float64
+        self.call = call
+        self.put = put
+
+    @classmethod
+    def empty(cls):
+        return cls(
+            np.empty(0, dtype=np.int64),
+            np.empty(0, dtype='datetime64[D]'),
+            np.empty(0, dtype=np.float64),
+            SideColumns.empty(),
+            SideColumns.empty()
+        )
+
+    @classmethod
+    def from_rows(cls, rows):
+        """
+        Build a snapshot from rows selected with chain_columns().
+
+        Rows are transposed once and each column is converted to a NumPy
+        array in a single call, so no per-row Python objects are kept.
+        """
+        if not rows:
+            return cls.empty()
+
+        columns = list(zip(*rows))
+        n = len(rows)
+        n_fields = len(SIDE_FIELDS)
+
+        timestamp = np.rint(
+            np.fromiter((_epoch_us(ts) for ts in columns[0]), dtype=np.float64, count=n)
+        ).astype(np.int64)
+        exp_date = np.array(columns[1], dtype='datetime64[D]')
+        strike = np.array(columns[2], dtype=np.float64)
+
+        sides = []
+        for offset in (3, 3 + n_fields):
+            sides.append(SideColumns(**{
+                field: np.array(columns[offset + i], dtype=np.float64)
+                for i, field in enumerate(SIDE_FIELDS)
+            }))
+
+        return cls(timestamp, exp_date, strike, sides[0], sides[1])
+
+    @classmethod
+    def from_legacy(cls, calls, puts):
+        """
+        Build a snapshot from legacy per-row `calls`/`puts` dict lists.
+
+        The lists must be parallel (same strike at the same position), as
+        produced by to_legacy(). Expiration dates are not part of the legacy
+        format and are left as NaT.
+        """
+        n = len(calls)
+        if not n:
+            return cls.empty()
+
+        timestamp = np.array([
+            _epoch_us(datetime.fromisoformat(c['timestamp'])) if c.get('timestamp') else 0
+            for c in calls
+        ], dtype=np.float64).astype(np.int64)
+        strike = np.array([c['strike'] for c in calls], dtype=np.float64)
+
+        sides = []
+        for rows in (calls, puts):
+            sides.append(SideColumns(**{
+                field: np.array([r.get(LEGACY_KEYS[field]) for r in rows], dtype=np.float64)
+                for field in SIDE_FIELDS
+            }))
+
+        return cls(timestamp, np.full(n, np.datetime64('NaT'), dtype='datetime64[D]'),
+                   strike, sides[0], sides[1])
+
+    @classmethod
+    def from_market_data(cls, market_data):
+        """The snapshot behind a market data payload, rebuilt from legacy lists if needed"""
+        chain = getattr(market_data, 'chain', None)
+        if chain is not None:
+            return chain
+        return cls.from_legacy(market_data.get('calls', []), market_data.get('puts', []))
+
+    def __len__(self):
+        return len(self.strike)
+
+    def quote_time(self):
+        """UTC datetime of the newest quote, or None for an empty snapshot"""
+        if not len(self):
+            return None
+        return datetime.fromtimestamp(int(self.timestamp.max()) / 1e6, tz=timezone.utc)
+
+    def expirations(self):
+        """Sorted distinct expiration dates (NaT excluded)"""
+        return np.unique(self.exp_date[~np.isnat(self.exp_date)])
+
+    def current_expiration(self):
+        """Earliest expiration on or after the newest quote's date (the latest one if all are past)"""
+        expirations = self.expirations()
+        if not expirations.size:
+            return None
+        today = np.datetime64(self.quote_time().date(), 'D')
+        live = expirations[expirations >= today]
+        return live[0] if live.size else expirations[-1]
+
+    def expiry(self, exp_date=None):
+        """
+        Strike-indexed view of one expiration (default: the current one).
+
+        The current expiration is the earliest one on or after the date of
+        the newest quote, so expired chains still held in a snapshot are
+        skipped; if every expiration is past, the latest one is used. If
+        several rows share a strike the newest quote wins. Snapshots
+        without expiration dates (legacy input) are treated as a single
+        expiration.
+        """
+        dated = ~np.isnat(self.exp_date)
+        if not dated.any():
+            rows = np.arange(len(self))
+        else:
+            if exp_date is None:
+                exp_date = self.current_expiration()
+            rows = np.flatnonzero(self.exp_date == np.datetime64(exp_date, 'D'))
+
+        # Sort by strike, newest first within a strike, then keep the first of each strike
+        order = rows[np.lexsort((-self.timestamp[rows], self.strike[rows]))]
+        strikes = self.strike[order]
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = strikes[1:] != strikes[:-1]
+        order = order[first]
+
+        return ExpiryChain(
+            None if not dated.any() else np.datetime64(exp_date, 'D'),
+            self.strike[order],
+            self.call.take(order),
+            self.put.take(order)
+        )
+
+    def export_columns(self, sides=('call', 'put')):
+        """
+        Columns for binary export, keyed by spx_0dte_stream column name.
+
+        timestamp is int64 epoch microseconds (UTC) and exp_date is int32
+        days since the epoch; quote columns are float64 with NaN for nulls.
+        """
+        columns = {
+            'timestamp': self.timestamp,
+            'exp_date': self.exp_date.astype(np.int64).astype(np.int32),
+            'strike_price': self.strike
+        }
+        for side in sides:
+            side_columns = self.call if side == 'call' else self.put
+            for field in SIDE_FIELDS:
+                columns[f"{side}_{COLUMN_SUFFIXES[field]}"] = getattr(side_columns, field)
+        return columns
+
+    def take(self, index):
+        """Return a new snapshot holding the selected rows"""
+        return ChainSnapshot(
+            self.timestamp[index],
+            self.exp_date[index],
+            self.strike[index],
+            self.call.take(index),
+            self.put.take(index)
+        )
+
+    def _row_keys(self):
+        # One sortable float per (exp_date, strike); strikes are below 1e6
+        return self.exp_date.astype(np.int64) * 1e6 + self.strike
+
+    def upsert(self, rows):
+        """
+        Merge rows selected with chain_columns() into a snapshot ordered by
+        (exp_date, strike) with one row per key, as QuoteBook.snapshot()
+        builds.
+
+        Only the merged rows are converted. Quotes of keys already present
+        are overwritten in place in the existing column arrays (unless the
+        stored quote is newer); new keys are inserted at their sorted
+        position, which allocates new arrays. Returns (snapshot, written),
+        where snapshot is this one unless keys were inserted and written
+        is the number of quotes stored.
+        """
+        update = ChainSnapshot.from_rows(rows)
+        if not len(update):
+            return self, 0
+
+        # Newest row per key within the update
+        order = np.lexsort((update.timestamp, update.strike, update.exp_date))
+        update = update.take(order)
+        keys = update._row_keys()
+        last = np.ones(len(keys), dtype=bool)
+        last[:-1] = keys[1:] != keys[:-1]
+        update = update.take(last)
+        keys = keys[last]
+
+        stored_keys = self._row_keys()
+        position = np.searchsorted(stored_keys, keys)
+        found = position < len(stored_keys)
+        found[found] = stored_keys[position[found]] == keys[found]
+
+        target = position[found]
+        newer = update.timestamp[found] >= self.timestamp[target]
+        source = np.flatnonzero(found)[newer]
+        target = target[newer]
+        self.timestamp[target] = update.timestamp[source]
+        for side, update_side in ((self.call, update.call), (self.put, update.put)):
+            for field in SIDE_FIELDS:
+                getattr(side, field)[target] = getattr(update_side, field)[source]
+        written = len(target)
+
+        new = np.flatnonzero(~found)
+        if not new.size:
+            return self, written
+
+        at = position[new]
+
+        def insert(column, values):
+            return np.insert(column, at, values[new])
+
+        snapshot = ChainSnapshot(
+            insert(self.timestamp, update.timestamp),
+            insert(self.exp_date, update.exp_date),
+            insert(self.strike, update.strike),
+            SideColumns(**{f: insert(getattr(self.call, f), getattr(update.call, f)) for f in SIDE_FIELDS}),
+            SideColumns(**{f: insert(getattr(self.put, f), getattr(update.put, f)) for f in SIDE_FIELDS})
+        )
+        return snapshot, written + new.size
+
+    def to_legacy(self):
+        """
+        Build the legacy per-row `calls` and `puts` dict lists.
+
+        Only used by consumers that still expect dicts; the columnar
+        arrays are the source of truth.
+        """
+        if not len(self):
+            return [], []
+
+        # Rows share a handful of tick timestamps, so format each one once
+        unique_ts, inverse = np.unique(self.timestamp, return_inverse=True)
+        iso = [
+            datetime.fromtimestamp(us / 1e6, tz=timezone.utc).isoformat()
+            for us in unique_ts.tolist()
+        ]
+        timestamps = [iso[i] for i in inverse.tolist()]
+        strikes = self.strike.tolist()
+
+        result = []
+        for side, option_type in ((self.call, 'C'), (self.put, 'P')):
+            values = []
+            for field in SIDE_FIELDS:
+                column = getattr(side, field).tolist()
+                if field == 'oi':
+                    column = [None if v != v else int(v) for v in column]
+                else:
+                    column = [None if v != v else v for v in column]
+                values.append(column)
+
+            keys = [LEGACY_KEYS[f] for f in SIDE_FIELDS]
+            rows = []
+            for strike, ts, *quote in zip(strikes, timestamps, *values):
+                row = {'strike': strike}
+                row.update(zip(keys, quote))
+                row['timestamp'] = ts
+                row['daysToExpiration'] = 0
+                row['type'] = option_type
+                rows.append(row)
+            result.append(rows)
+
+        return result[0], result[1]
+
+
+class ExpiryChain:
+    """
+    One expiration of a chain, sorted by strike with one row per strike.
+
+    Strikes are looked up by value with index_of(), so wing legs and
+    position legs are found by binary search instead of list scans.
+    """
+
+    def __init__(self, exp_date, strike, call, put):
+        self.exp_date = exp_date
+        self.strike = strike
+        self.call = call
+        self.put = put
+
+    def __len__(self):
+        return len(self.strike)
+
+    def side(self, option_type):
+        """SideColumns for 'call' or 'put'"""
+        return self.call if option_type == 'call' else self.put
+
+    def index_of(self, strikes):
+        """Row index of each requested strike, -1 where the strike is not listed"""
+        strikes = np.asarray(strikes, dtype=np.float64)
+        if not len(self.strike):
+            return np.full(strikes.shape, -1, dtype=np.intp)
+        pos = np.searchsorted(self.strike, strikes)
+        pos = np.minimum(pos, len(self.strike) - 1)
+        return np.where(self.strike[pos] == strikes, pos, -1)
+
+
+class MarketData(dict):
+    """
+    Market data payload backed by a ChainSnapshot.
+
+    Behaves like the plain dict analyzers used to receive, but the legacy
+    `calls`/`puts` lists are only built the first time something reads
+    them (a template, jsonify, or a dict-based analyzer).
+    """
+
+    def __init__(self, chain, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.chain = chain
+
+    def _materialize(self):
+        if not dict.__contains__(self, 'calls'):
+            calls, puts = self.chain.to_legacy()
+            dict.__setitem__(self, 'calls', calls)
+            dict.__setitem__(self, 'puts', puts)
+
+    def __missing__(self, key):
+        if key in LEGACY_LIST_KEYS:
+            self._materialize()
+            return dict.__getitem__(self, key)
+        raise KeyError(key)
+
+    def __contains__(self, key):
+        return key in LEGACY_LIST_KEYS or dict.__contains__(self, key)
+
+    def get(self, key, default=None):
+        if key in LEGACY_LIST_KEYS:
+            self._materialize()
+        return dict.get(self, key, default)
+
+    def __iter__(self):
+        self._materialize()
+        return dict.__iter__(self)
+
+    def __len__(self):
+        self._materialize()
+        return dict.__len__(self)
+
+    def __bool__(self):
+        # Truth tests must not build the legacy lists via __len__
+        return len(self.chain) > 0 or dict.__len__(self) > 0
+
+    def keys(self):
+        self._materialize()
+        return dict.keys(self)
+
+    def values(self):
+        self._materialize()
+        return dict.values(self)
+
+    def items(self):
+        self._materialize()
+        return dict.items(self)
+
+    def copy(self):
+        return MarketData(self.chain, self.items())
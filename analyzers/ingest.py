@@ -0,0 +1,176 @@
+import logging
+import threading
+import numpy as np
+from models import db, SPXOptionStream, SPXSpot
+from analyzers.chain import ChainSnapshot, chain_columns
+from analyzers.pricing import parity_forward
+
+logger = logging.getLogger("analyzer.ingest")
+
+
+class QuoteBook:
+    """
+    Latest quote per (exp_date, strike_price).
+
+    Rows are tuples in chain_columns() order. Merging a row replaces the
+    stored quote for its key unless the stored quote is newer. Expirations
+    dated before the newest quote's date are dropped, so the book holds the
+    live chain rather than every session ever loaded.
+
+    `version` increases whenever the contents change, so callers can tell
+    a changed book from an unchanged one even when its size and newest
+    timestamp stay the same (e.g. a quote re-written in place).
+    """
+
+    def __init__(self):
+        self.version = 0
+        self._rows = {}
+        self._keys = None  # sorted keys, rebuilt only when a new key appears
+        self._snapshot = None
+        self._expired_before = None
+        self.latest_row = None
+
+    def __len__(self):
+        return len(self._rows)
+
+    def merge(self, rows):
+        """Merge rows into the book, returning how many quotes changed"""
+        changed = 0
+        for row in rows:
+            row = tuple(row)
+            key = (row[1], row[2])
+            if self._expired_before is not None and key[0] is not None and key[0] < self._expired_before:
+                continue
+            current = self._rows.get(key)
+            if current is not None and (current[0] > row[0] or current == row):
+                continue
+            if current is None:
+                self._keys = None
+            self._rows[key] = row
+            changed += 1
+            if self.latest_row is None or row[0] >= self.latest_row[0]:
+                self.latest_row = row
+
+        if changed:
+            self.version += 1
+            self._snapshot = None
+            self._drop_expired()
+        return changed
+
+    def _drop_expired(self):
+        """Remove quotes of expirations before the newest quote's date"""
+        today = self.latest_row[0].date()
+        if today == self._expired_before:
+            return
+        self._expired_before = today
+        expired = [key for key in self._rows if key[0] is not None and key[0] < today]
+        for key in expired:
+            del self._rows[key]
+        if expired:
+            self._keys = None
+            logger.info(f"Dropped {len(expired)} quotes of expirations before {today}")
+
+    def snapshot(self):
+        """ChainSnapshot of the book, ordered by (exp_date, strike_price)"""
+        if self._snapshot is None:
+            if self._keys is None:
+                self._keys = sorted(self._rows)
+            rows = [self._rows[key] for key in self._keys]
+            self._snapshot = ChainSnapshot.from_rows(rows)
+        return self._snapshot
+
+    def clear(self):
+        self.version += 1
+        self._rows.clear()
+        self._keys = None
+        self._snapshot = None
+        self._expired_before = None
+        self.latest_row = None
+
+
+class IncrementalChainLoader:
+    """
+    Incrementally loads the option chain from spx_0dte_stream.
+
+    The first load reads the whole table; after that only rows at or after
+    the last seen `timestamp` watermark are fetched and merged into the
+    in-memory QuoteBook. Re-reading the watermark tick itself picks up rows
+    that were committed late with the same timestamp, and merging them again
+    is a no-op. Refresh cost therefore depends on the tick rate, not on the
+    size of the table.
+
+    Once the schema bootstrap has installed the spx_0dte_latest trigger the
+    loader reads that table instead (use_model), so even the first load is
+    one row per strike rather than the whole history.
+    """
+
+    def __init__(self, model=SPXOptionStream):
+        self.model = model
+        self.book = QuoteBook()
+        self.watermark = None
+        self.rows_fetched = 0
+        self._lock = threading.Lock()
+
+    def load(self, session=None):
+        """Fetch new rows, merge them into the book and return its snapshot"""
+        session = session or db.session
+        with self._lock:
+            query = db.select(*chain_columns(self.model))
+            if self.watermark is not None:
+                query = query.where(self.model.timestamp >= self.watermark)
+
+            try:
+                rows = session.execute(query).all()
+            except Exception:
+                session.rollback()
+                raise
+            self.rows_fetched = len(rows)
+            if rows:
+                changed = self.book.merge(rows)
+                self.watermark = self.book.latest_row[0]
+                logger.debug(f"Fetched {len(rows)} rows, {changed} quotes changed, watermark {self.watermark}")
+
+            return self.book.snapshot()
+
+    def use_model(self, model):
+        """Read from `model` from now on, starting again from an empty book"""
+        with self._lock:
+            self.model = model
+            self.book.clear()
+            self.watermark = None
+
+    def reset(self):
+        """Drop the book and watermark; the next load reads the whole table"""
+        with self._lock:
+            self.book.clear()
+            self.watermark = None
+
+
+def spot_price(session, chain=None, as_of=None):
+    """
+    SPX price: the newest spx_0dte_spot print (at or before `as_of`), or
+    failing that the put-call parity forward of the chain's current
+    expiration. None if neither is available.
+    """
+    query = db.select(SPXSpot.price).order_by(SPXSpot.timestamp.desc()).limit(1)
+    if as_of is not None:
+        query = query.where(SPXSpot.timestamp <= as_of)
+    price = session.execute(query).scalar()
+    if price is not None or chain is None:
+        return price
+    return parity_spot(chain)
+
+
+def parity_spot(chain):
+    """Put-call parity forward of the chain's current expiration, None if it has no two-sided quotes"""
+    if not len(chain):
+        return None
+    expiry = chain.expiry()
+    forward = parity_forward(
+        np.zeros(len(expiry), dtype=np.int64), expiry.strike, expiry.call.mid, expiry.put.mid
+    )
+    forward = forward[np.isfinite(forward)]
+    return round(float(forward[0]), 2) if forward.size else None
+
+
+chain_loader = IncrementalChainLoader()
@@ -1,9 +1,13 @@
 import json
 import logging
-import uuid
 from datetime import datetime
+import numpy as np
 import pytz
 from analyzers.base import BaseAnalyzer
+from analyzers.chain import ChainSnapshot, FEED_IV_SCALE, json_float
+from analyzers.positions import position_book
+from analyzers.risk import risk_engine
+from analyzers.vol_surface import vol_surface
 
 # Configure logging
 logging.basicConfig(
@@ -16,6 +20,14 @@ logging.basicConfig(
 logger = logging.getLogger("SPX_0DTE_IronCondor_Analyzer")
 
 class IroncondorAnalyzer(BaseAnalyzer):
+    name = "iron_condor"
+    description = "SPX 0DTE Iron Condor Analyzer"
+    refresh_interval = 15  # seconds
+    delta_collections = {
+        'scored_trades': ('short_put', 'long_put', 'short_call', 'long_call'),
+        'current_positions': ('id',)
+    }
+    
     # Strategy Parameters
     STRATEGY_PARAMS = {
         'delta_range': {
@@ -23,6 +35,7 @@ class IroncondorAnalyzer(BaseAnalyzer):
             'max': 0.22
         },
         'wing_width': 20,
+        'wing_widths': [10, 15, 20, 25, 30],
         'min_premium': 0.50,
         'max_risk': 15.00,
         'scoring_weights': {
@@ -37,24 +50,22 @@ class IroncondorAnalyzer(BaseAnalyzer):
 
     def __init__(self):
         super().__init__()  # Call the constructor of BaseAnalyzer
+        # Shared book and risk engine; a replay swaps in its own
+        self.position_book = position_book
+        self.risk_engine = risk_engine
         self.current_analysis = {
             'timestamp': None,
             'spx_price': None,
-            'options_chain': None,
             'scored_trades': None,
-            'current_positions': [],
+            'condor_frontier': None,
+            'current_positions': self.position_book.positions(self.name),
+            'position_risk': None,
             'recommendations': {
                 'entries': [],
                 'exits': [],
                 'adjustments': []
             }
         }
-        initial_data = self.get_latest_results()  # Use the inherited method
-        if initial_data:
-            self.process_data_callback(initial_data)
-            logger.info("Initial data processed successfully")
-        else:
-            logger.warning("No initial data available")
     def calculate_trade_score(self, trade):
         """
         Calculate a comprehensive score for a potential iron condor trade.
@@ -101,91 +112,227 @@ class IroncondorAnalyzer(BaseAnalyzer):
             logger.error(f"Error calculating score: {e}")
             return 0
 
+    def _score_grid(self, premium, max_loss, short_call_delta, short_put_delta,
+                    call_iv, put_iv, gamma, theta, volume):
+        """
+        Vectorized calculate_trade_score over broadcastable arrays.
+        Missing inputs (NaN) score 0, as the scalar version does on errors.
+        """
+        weights = self.STRATEGY_PARAMS['scoring_weights']
+        
+        with np.errstate(divide='ignore', invalid='ignore'):
+            premium_score = np.minimum(premium / self.STRATEGY_PARAMS['min_premium'], 2.0) * 50
+            rr_score = np.minimum((premium / max_loss) / 0.3, 1.0) * 100
+            delta_diff = np.abs(np.abs(short_call_delta) - np.abs(short_put_delta))
+            delta_score = (1 - np.minimum(delta_diff / 0.05, 1.0)) * 100
+            volume_score = np.minimum(volume / 100, 1.0) * 100
+            iv_score = np.minimum((call_iv + put_iv) / 2 / 30, 2.0) * 50
+            gamma_score = np.minimum(gamma / 0.005, 1.0) * 100
+            theta_score = np.minimum(np.abs(theta) / 5, 1.0) * 100
+        
+        score = (
+            premium_score * weights['premium'] +
+            rr_score * weights['risk_reward'] +
+            delta_score * weights['delta_balance'] +
+            volume_score * weights['volume_liquidity'] +
+            iv_score * weights['volatility'] +
+            (gamma_score + theta_score) / 2 * weights['greeks']
+        )
+        score = np.clip(np.round(score, 2), 0, 100)
+        return np.where(np.isfinite(score), score, 0)
+
+    def _top_k(self, scores, k):
+        """
+        Indices of the k best scores, best first; ties keep index order.
+        Uses a partial selection so only the top candidates are sorted.
+        """
+        if scores.size > k:
+            threshold = np.partition(scores, scores.size - k)[scores.size - k]
+            candidates = np.flatnonzero(scores >= threshold)
+        else:
+            candidates = np.arange(scores.size)
+        order = np.lexsort((candidates, -scores[candidates]))
+        return candidates[order][:k]
+
+    def _short_leg_iv(self, surface, chain, side, rows):
+        """IV (feed percent) of short legs: the surface's smile, else the feed quote"""
+        feed_iv = side.iv[rows]
+        if surface is None:
+            return feed_iv
+        smile = surface.smile(chain.exp_date, chain.strike[rows]) * FEED_IV_SCALE
+        return np.where(np.isfinite(smile), smile, feed_iv)
+
+    def _condor_search(self, chain, spx_price, width_pairs, top_k, surface=None):
+        """
+        Score iron condors for several (put_width, call_width) pairs in one sweep.
+        
+        Short legs are selected once. Wing credits are computed once per
+        distinct put width and per distinct call width, and every pair is
+        then priced as one (pairs x short puts x short calls) broadcast grid.
+        Short leg IVs come from the volatility surface when one is given, so
+        the volatility score follows the smoothed smile rather than single
+        quotes. Returns one ranked trade list per width pair.
+        """
+        params = self.STRATEGY_PARAMS
+        delta_min = params['delta_range']['min']
+        delta_max = params['delta_range']['max']
+        results = [[] for _ in width_pairs]
+        
+        # Short legs by delta range: puts by descending strike, calls ascending
+        call_delta = np.abs(chain.call.delta)
+        put_delta = np.abs(chain.put.delta)
+        short_calls = np.flatnonzero((call_delta > 0) & (call_delta >= delta_min) & (call_delta <= delta_max))
+        short_puts = np.flatnonzero((put_delta > 0) & (put_delta >= delta_min) & (put_delta <= delta_max))[::-1]
+        if not short_calls.size or not short_puts.size:
+            return results
+        
+        short_call_iv = self._short_leg_iv(surface, chain, chain.call, short_calls)
+        short_put_iv = self._short_leg_iv(surface, chain, chain.put, short_puts)
+        
+        put_widths, pair_put = np.unique([w for w, _ in width_pairs], return_inverse=True)
+        call_widths, pair_call = np.unique([w for _, w in width_pairs], return_inverse=True)
+        
+        # Wings for every width at once by strike lookup (-1 = not listed)
+        call, put = chain.call, chain.put
+        long_calls = chain.index_of(chain.strike[short_calls][None, :] + call_widths[:, None])
+        long_puts = chain.index_of(chain.strike[short_puts][None, :] - put_widths[:, None])
+        call_credit = np.where(long_calls >= 0, call.bid[short_calls][None, :] - call.ask[long_calls], np.nan)
+        put_credit = np.where(long_puts >= 0, put.bid[short_puts][None, :] - put.ask[long_puts], np.nan)
+        
+        # Pair x put x call grid; risk is set by the wider wing, and the
+        # max_risk cap scales with it relative to the configured wing_width
+        premium = put_credit[pair_put][:, :, None] + call_credit[pair_call][:, None, :]
+        width = np.maximum(put_widths[pair_put], call_widths[pair_call]).astype(np.float64)
+        max_loss = width[:, None, None] - premium
+        risk_cap = params['max_risk'] * width / params['wing_width']
+        with np.errstate(invalid='ignore'):
+            eligible = (
+                (premium >= params['min_premium']) &
+                (max_loss <= risk_cap[:, None, None]) &
+                (max_loss > 0)
+            )
+        pair_pos, put_pos, call_pos = np.nonzero(eligible)
+        if not pair_pos.size:
+            return results
+        
+        call_iv = short_call_iv[call_pos]
+        put_iv = short_put_iv[put_pos]
+        sp = short_puts[put_pos]
+        lp = long_puts[pair_put[pair_pos], put_pos]
+        sc = short_calls[call_pos]
+        lc = long_calls[pair_call[pair_pos], call_pos]
+        premium = premium[pair_pos, put_pos, call_pos]
+        max_loss = max_loss[pair_pos, put_pos, call_pos]
+        gamma = (call.gamma[sc] + put.gamma[sp]) / 2
+        theta = (call.theta[sc] + put.theta[sp]) / 2
+        # The feed has no volume column, so liquidity scores as zero volume
+        volume = np.zeros(premium.shape)
+        
+        scores = self._score_grid(
+            premium, max_loss, call.delta[sc], put.delta[sp],
+            call_iv, put_iv, gamma, theta, volume
+        )
+        
+        timestamp = datetime.now().isoformat()
+        exp_date = str(chain.exp_date) if chain.exp_date is not None else None
+        for g, (put_width, call_width) in enumerate(width_pairs):
+            members = np.flatnonzero(pair_pos == g)
+            for i in members[self._top_k(scores[members], top_k)]:
+                results[g].append({
+                    'spx_price': spx_price,
+                    'exp_date': exp_date,
+                    'short_put': float(chain.strike[sp[i]]),
+                    'long_put': float(chain.strike[lp[i]]),
+                    'short_call': float(chain.strike[sc[i]]),
+                    'long_call': float(chain.strike[lc[i]]),
+                    'put_width': put_width,
+                    'call_width': call_width,
+                    'premium': round(float(premium[i]), 2),
+                    'max_loss': round(float(max_loss[i]), 2),
+                    'reward_to_risk': round(float(premium[i] / max_loss[i]), 2),
+                    'short_call_delta': json_float(call.delta[sc[i]]),
+                    'long_call_delta': json_float(call.delta[lc[i]]),
+                    'short_put_delta': json_float(put.delta[sp[i]]),
+                    'long_put_delta': json_float(put.delta[lp[i]]),
+                    'call_volume': 0,
+                    'put_volume': 0,
+                    'call_iv': json_float(call_iv[i]),
+                    'put_iv': json_float(put_iv[i]),
+                    'gamma': json_float(gamma[i]),
+                    'theta': json_float(theta[i]),
+                    'timestamp': timestamp,
+                    'score': float(scores[i])
+                })
+        
+        return results
+
     def find_iron_condor_opportunities(self, data):
         """
         Main function to find and score iron condor opportunities.
         Returns a list of scored opportunities sorted by score.
+        
+        Wing strikes are found by binary search on the strike-indexed front
+        expiration, and every short put x short call pair is priced and
+        scored at once as a broadcast grid.
         """
         if not data or 'spx_price' not in data:
             logger.error("Invalid data received")
             return []
 
-        spx_price = data['spx_price']
-        calls = sorted(data.get('calls', []), key=lambda x: x['strike'])
-        puts = sorted(data.get('puts', []), key=lambda x: x['strike'], reverse=True)
-        
-        opportunities = []
+        width = self.STRATEGY_PARAMS['wing_width']
+        chain = ChainSnapshot.from_market_data(data).expiry()
+        surface = vol_surface(data, self.surface_cache)
+        return self._condor_search(chain, data['spx_price'], [(width, width)], 5, surface)[0]
+
+    def find_iron_condor_frontier(self, data, put_widths=None, call_widths=None, symmetric=False, top_k=5):
+        """
+        Rank iron condors for many wing widths in a single vectorized pass.
         
-        # Filter options by delta range
-        short_call_candidates = [
-            c for c in calls 
-            if c.get('delta') and self.STRATEGY_PARAMS['delta_range']['min'] <= abs(c['delta']) <= self.STRATEGY_PARAMS['delta_range']['max']
-        ]
-        short_put_candidates = [
-            p for p in puts 
-            if p.get('delta') and self.STRATEGY_PARAMS['delta_range']['min'] <= abs(p['delta']) <= self.STRATEGY_PARAMS['delta_range']['max']
-        ]
+        Args:
+            data: Market data payload
+            put_widths: Put wing widths (default: STRATEGY_PARAMS['wing_widths'])
+            call_widths: Call wing widths (default: same as put_widths)
+            symmetric: Pair put_widths[i] with call_widths[i] only, instead
+                of every put width with every call width
+            top_k: Trades kept per width pair
+        Returns:
+            List of {'put_width', 'call_width', 'trades'} entries, one per
+            width pair, each with trades ranked by score
+        """
+        if not data or 'spx_price' not in data:
+            logger.error("Invalid data received")
+            return []
         
-        for short_put in short_put_candidates:
-            for short_call in short_call_candidates:
-                # Calculate wing strikes
-                long_put_strike = short_put['strike'] - self.STRATEGY_PARAMS['wing_width']
-                long_call_strike = short_call['strike'] + self.STRATEGY_PARAMS['wing_width']
-                
-                # Find long options
-                long_put = next((p for p in puts if p['strike'] == long_put_strike), None)
-                long_call = next((c for c in calls if c['strike'] == long_call_strike), None)
-                
-                if not long_put or not long_call:
-                    continue
-
-                # Calculate trade metrics
-                premium = (
-                    short_put['bid'] - long_put['ask'] +
-                    short_call['bid'] - long_call['ask']
-                )
-                max_loss = self.STRATEGY_PARAMS['wing_width'] - premium
-                
-                if premium >= self.STRATEGY_PARAMS['min_premium'] and max_loss <= self.STRATEGY_PARAMS['max_risk']:
-                    # Create trade structure
-                    trade = {
-                        'spx_price': spx_price,
-                        'short_put': short_put['strike'],
-                        'long_put': long_put['strike'],
-                        'short_call': short_call['strike'],
-                        'long_call': long_call['strike'],
-                        'premium': round(premium, 2),
-                        'max_loss': round(max_loss, 2),
-                        'reward_to_risk': round(premium / max_loss, 2),
-                        'short_call_delta': short_call.get('delta', 0),
-                        'long_call_delta': long_call.get('delta', 0),
-                        'short_put_delta': short_put.get('delta', 0),
-                        'long_put_delta': long_put.get('delta', 0),
-                        'call_volume': short_call.get('volume', 0),
-                        'put_volume': short_put.get('volume', 0),
-                        'call_iv': short_call.get('volatility', 0),
-                        'put_iv': short_put.get('volatility', 0),
-                        'gamma': (short_call.get('gamma', 0) + short_put.get('gamma', 0)) / 2,
-                        'theta': (short_call.get('theta', 0) + short_put.get('theta', 0)) / 2,
-                        'timestamp': datetime.now().isoformat()
-                    }
-                    
-                    # Calculate and add score
-                    trade['score'] = self.calculate_trade_score(trade)
-                    opportunities.append(trade)
+        put_widths = list(put_widths or self.STRATEGY_PARAMS['wing_widths'])
+        call_widths = list(call_widths or put_widths)
+        if symmetric:
+            width_pairs = list(zip(put_widths, call_widths))
+        else:
+            width_pairs = [(p, c) for p in put_widths for c in call_widths]
         
-        # Sort by score and return top opportunities
-        return sorted(opportunities, key=lambda x: -x['score'])[:5]
+        chain = ChainSnapshot.from_market_data(data).expiry()
+        ranked = self._condor_search(chain, data['spx_price'], width_pairs, top_k, vol_surface(data, self.surface_cache))
+        return [
+            {'put_width': p, 'call_width': c, 'trades': trades}
+            for (p, c), trades in zip(width_pairs, ranked)
+        ]
 
     def process_data_callback(self, data):
         """
         Callback function to process new data from the streamer.
-        Updates the global analysis state.
+        
+        Builds a new analysis dict and swaps it in as current_analysis in
+        one assignment, so readers never see a half-updated analysis and
+        dicts that were already published are never modified.
         """
         logger.info("Received data from streamer")
         if not data:
             logger.warning("No data received in callback")
             return
+        self._sync_positions()
+        if not self.is_new_snapshot(data):
+            logger.info("Snapshot unchanged since last analysis, skipping")
+            return
             
         try:
             # Update current analysis
@@ -193,13 +340,25 @@ class IroncondorAnalyzer(BaseAnalyzer):
             chicago_tz = pytz.timezone('America/Chicago')
             chicago_now = datetime.now(chicago_tz)
             
-            self.current_analysis['timestamp'] = chicago_now.isoformat()
-            self.current_analysis['spx_price'] = data['spx_price']
-            self.current_analysis['options_chain'] = data
+            # Find and score opportunities: one search over every wing
+            # width, with the scored trades taken from the configured width
+            width = self.STRATEGY_PARAMS['wing_width']
+            widths = list(self.STRATEGY_PARAMS['wing_widths'])
+            frontier = self.find_iron_condor_frontier(data, widths + [width] * (width not in widths), symmetric=True)
+            opportunities = next((entry['trades'] for entry in frontier if entry['put_width'] == width), [])
+            frontier = frontier[:len(widths)]
+            self.current_analysis = {
+                'timestamp': chicago_now.isoformat(),
+                'spx_price': data['spx_price'],
+                'scored_trades': opportunities,
+                'condor_frontier': frontier,
+                'current_positions': self.current_analysis['current_positions'],
+                # Mark this strategy's open positions to the new chain
+                'position_risk': self.risk_engine.mark(data, self.name),
+                'recommendations': self.current_analysis['recommendations']
+            }
             
-            # Find and score opportunities
-            opportunities = self.find_iron_condor_opportunities(data)
-            self.current_analysis['scored_trades'] = opportunities
+            self.snapshot_version = data.get('snapshot_version')
             
             # Log results
             if opportunities:
@@ -212,16 +371,39 @@ class IroncondorAnalyzer(BaseAnalyzer):
         except Exception as e:
             logger.error(f"Error processing data: {e}")
 
+    def stream_payload(self, results):
+        """The dashboard's status and analysis in one event"""
+        return {
+            'spx_price': results.get('spx_price'),
+            'last_analysis': results.get('timestamp'),
+            'scored_trades': results.get('scored_trades') or [],
+            'current_positions': results.get('current_positions', []),
+            'position_risk': results.get('position_risk')
+        }
+
+    def analyze(self, market_data):
+        """
+        Run the analysis on a market data snapshot.
+        Returns the current analysis after processing.
+        """
+        self.process_data_callback(market_data)
+        return self.current_analysis
+
     def analyze_market(self):
         """
         Manually trigger market analysis.
         Returns the current analysis after processing.
         """
         logger.info("Manually triggering market analysis...")
-        data = self.get_latest_results()  # Use the inherited method
+        data = self.get_market_data()  # Use the inherited method
         self.process_data_callback(data)
+        self.publish(self.current_analysis)
         return self.current_analysis
 
+    def _sync_positions(self):
+        """Swap in a copy of the analysis with current_positions refreshed from the position book"""
+        self.current_analysis = dict(self.current_analysis, current_positions=self.position_book.positions(self.name))
+
     def add_position(self, position_data):
         """
         Add a new position to the current analysis.
@@ -231,16 +413,13 @@ class IroncondorAnalyzer(BaseAnalyzer):
             Dictionary with status and position ID
         """
         try:
-            # Generate a unique ID for the position
-            position_id = str(uuid.uuid4())
+            # The position book assigns the id and timestamp and persists it
+            position_data = self.position_book.add(self.name, position_data)
+            position_id = position_data['id']
+            self._sync_positions()
             
-            # Add timestamp and ID to position data
-            position_data['id'] = position_id
-            position_data['timestamp'] = datetime.now().isoformat()
-            position_data['closed'] = False
-
-            # Add to current positions
-            self.current_analysis['current_positions'].append(position_data)
+            # New version for ETags, deltas and stream subscribers
+            self.republish(self.current_analysis)
             
             logger.info(f"Added new position: {position_id}")
             return {
@@ -255,27 +434,23 @@ class IroncondorAnalyzer(BaseAnalyzer):
                 'message': str(e)
             }
 
-    def close_position(self, position_id):
+    def close_position(self, position_id, exit_price=None):
         """
         Close an existing position.
         Args:
             position_id: ID of the position to close
+            exit_price: Optional price the position was closed at
         Returns:
             Dictionary with status and closed position details
         """
         try:
-            # Find the position
-            position = next(
-                (p for p in self.current_analysis['current_positions'] if p['id'] == position_id),
-                None
-            )
+            position = self.position_book.close(position_id, exit_price, strategy=self.name)
             
             if not position:
                 raise ValueError(f"Position {position_id} not found")
-                
-            # Mark as closed and add close timestamp
-            position['closed'] = True
-            position['close_timestamp'] = datetime.now().isoformat()
+            self._sync_positions()
+            
+            self.republish(self.current_analysis)
             
             logger.info(f"Closed position: {position_id}")
             return {
@@ -1,11 +1,12 @@
 from analyzers.base import BaseAnalyzer
 from datetime import datetime
-import requests
 
 class MacroOverlayAnalyzer(BaseAnalyzer):
     name = "macro_overlay"
     description = "Macro Economic Overlay"
     refresh_interval = 300  # 5 minutes
+    # Indicators come from outside the chain, so refresh on every cycle
+    skip_unchanged_snapshot = False
     
     def analyze(self, market_data):
         indicators = {}
@@ -30,7 +31,7 @@ class MacroOverlayAnalyzer(BaseAnalyzer):
         return {
             'timestamp': datetime.now().isoformat(),
             'indicators': indicators,
-            'spx_price': market_data['spot_price'] if market_data else None
+            'spx_price': market_data.get('spx_price', market_data.get('spot_price')) if market_data else None
         }
     
     def _fetch_treasury_yield(self):
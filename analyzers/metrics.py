@@ -0,0 +1,399 @@
+"""
+In-process metrics in the Prometheus text exposition format.
+
+Histograms are fixed-bucket and keyed by label values, so recording a
+sample is one bisect and a few integer increments under a lock. Gauges
+and counters for state owned elsewhere (scheduler stats, writer queues,
+the snapshot cache) are read only when /metrics is scraped; counts that
+only grow are exported as `*_total` counters so rate() works on them.
+"""
+import bisect
+import re
+import threading
+import time
+from contextlib import contextmanager
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Seconds; covers sub-millisecond numpy work up to slow database fetches
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+ROW_BUCKETS = (0, 10, 100, 500, 1000, 5000, 10000, 50000, 100000)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    pairs.extend(f'{n}="{_escape(v)}"' for n, v in extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    """Cumulative-bucket histogram with optional labels"""
+
+    type = 'histogram'
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        """Record one sample; labels are positional, in labelnames order"""
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                # Per-bucket counts (last slot is +Inf), sum, count
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, *labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *labels)
+
+    def samples(self):
+        with self._lock:
+            series = {labels: (list(counts), total, count) for labels, (counts, total, count) in self._series.items()}
+        for labels, (counts, total, count) in sorted(series.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                yield '_bucket', labels, (('le', _format_value(float(bound))),), cumulative
+            yield '_sum', labels, (), total
+            yield '_count', labels, (), count
+
+
+class Counter:
+    """Monotonic counter with optional labels"""
+
+    type = 'counter'
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, *labels):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for labels, value in sorted(values.items()):
+            yield '', labels, (), value
+
+
+class CallbackGauge:
+    """
+    Gauge whose values are read from `callback` at scrape time.
+
+    The callback returns a number, or a dict of {label values tuple: number}
+    for labelled gauges. None values are left out.
+    """
+
+    type = 'gauge'
+
+    def __init__(self, name, help, callback, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.callback = callback
+
+    def samples(self):
+        values = self.callback()
+        if not isinstance(values, dict):
+            values = {(): values}
+        for labels, value in sorted(values.items()):
+            if value is not None:
+                yield '', labels, (), value
+
+
+class CallbackCounter(CallbackGauge):
+    """Counter whose values are read from `callback` at scrape time (monotonic counts kept elsewhere)"""
+
+    type = 'counter'
+
+
+class MetricsRegistry:
+    """Named metrics rendered together for /metrics"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            # Re-registering a name (e.g. a second app in one process) keeps the existing metric
+            return self._metrics.setdefault(metric.name, metric)
+
+    def histogram(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, help, labelnames, buckets))
+
+    def counter(self, name, help, labelnames=()):
+        return self.register(Counter(name, help, labelnames))
+
+    def _replace(self, metric):
+        with self._lock:
+            # Callbacks are replaced so they always point at the current app
+            self._metrics[metric.name] = metric
+        return metric
+
+    def gauge(self, name, help, callback, labelnames=()):
+        return self._replace(CallbackGauge(name, help, callback, labelnames))
+
+    def callback_counter(self, name, help, callback, labelnames=()):
+        return self._replace(CallbackCounter(name, help, callback, labelnames))
+
+    def render(self):
+        """All metrics in the Prometheus text format"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            try:
+                samples = list(metric.samples())
+            except Exception:
+                # A failing gauge callback must not break the whole scrape
+                continue
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.type}')
+            for suffix, labels, extra, value in samples:
+                label_text = _format_labels(metric.labelnames, labels, extra)
+                lines.append(f'{metric.name}{suffix}{label_text} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+analyzer_stage_seconds = registry.histogram(
+    'spx_analyzer_stage_seconds',
+    'Time spent in each analyzer stage (fetch, analyze, log, publish)',
+    ('analyzer', 'stage')
+)
+analyzer_errors = registry.counter(
+    'spx_analyzer_errors_total',
+    'Analyzer stages that raised',
+    ('analyzer', 'stage')
+)
+chain_rows_fetched = registry.histogram(
+    'spx_chain_rows_fetched',
+    'Rows read from spx_0dte_latest per chain load (spx_0dte_stream until the latest table is installed)',
+    buckets=ROW_BUCKETS
+)
+query_seconds = registry.histogram(
+    'spx_db_query_seconds',
+    'Database statement duration by operation and table',
+    ('statement',)
+)
+query_rows = registry.counter(
+    'spx_db_rows_total',
+    'Rows reported by the driver for write statements',
+    ('statement',)
+)
+writer_flush_seconds = registry.histogram(
+    'spx_writer_flush_seconds',
+    'Write-behind batch flush duration (insert and commit) by table',
+    ('table',)
+)
+request_seconds = registry.histogram(
+    'spx_http_request_seconds',
+    'Request handling time by endpoint, including JSON serialization and template rendering',
+    ('endpoint', 'method', 'status')
+)
+
+
+@contextmanager
+def stage(analyzer, name):
+    """Time one stage of an analyzer cycle, counting it as an error if it raises"""
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        analyzer_errors.inc(1, analyzer, name)
+        raise
+    finally:
+        analyzer_stage_seconds.observe(time.perf_counter() - started, analyzer, name)
+
+
+_STATEMENT_PATTERN = re.compile(
+    r'^\s*(?:WITH\b.*?\)\s*)?(\w+)\b.*?\b(?:FROM|INTO|UPDATE|TABLE)\s+"?([\w.]+)"?',
+    re.IGNORECASE | re.DOTALL
+)
+_statement_labels = {}
+_MAX_STATEMENT_LABELS = 1024
+
+
+def statement_label(statement):
+    """
+    Low-cardinality label for a SQL statement, e.g. 'SELECT spx_0dte_stream'.
+
+    Labels are cached by statement text; SQLAlchemy reuses compiled
+    statements so the cache stays small.
+    """
+    label = _statement_labels.get(statement)
+    if label is None:
+        match = _STATEMENT_PATTERN.match(statement)
+        if match:
+            label = f'{match.group(1).upper()} {match.group(2).lower()}'
+        else:
+            label = (statement.split(None, 1) or ['OTHER'])[0].upper()
+        if len(_statement_labels) < _MAX_STATEMENT_LABELS:
+            _statement_labels[statement] = label
+    return label
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('metrics_query_started', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get('metrics_query_started')
+    if not started:
+        return
+    elapsed = time.perf_counter() - started.pop()
+    label = statement_label(statement)
+    query_seconds.observe(elapsed, label)
+    rowcount = getattr(cursor, 'rowcount', -1)
+    # SELECT row counts are not known until fetched; those are tracked per chain load
+    if rowcount is not None and rowcount > 0 and not label.startswith('SELECT'):
+        query_rows.inc(rowcount, label)
+
+
+def _handle_error(exception_context):
+    conn = exception_context.connection
+    if conn is not None and conn.info.get('metrics_query_started'):
+        conn.info['metrics_query_started'].pop()
+
+
+_engine_events_installed = False
+
+
+def install_engine_events():
+    """Time every statement on every engine (idempotent)"""
+    global _engine_events_installed
+    if _engine_events_installed:
+        return
+    event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+    event.listen(Engine, 'handle_error', _handle_error)
+    _engine_events_installed = True
+
+
+def _register_app_gauges(app):
+    from analyzers.ingest import chain_loader
+    from analyzers.persistence import analysis_writer
+    from analyzers.positions import position_book, position_writer
+    from analyzers.snapshot_cache import chain_cache
+    from analyzers.vol_surface import surface_cache
+
+    def snapshot_age():
+        market_data = chain_cache.peek()
+        chain = getattr(market_data, 'chain', None)
+        if chain is None or not len(chain):
+            return None
+        # Chain timestamps are microseconds since the epoch
+        return time.time() - int(chain.timestamp.max()) / 1e6
+
+    def scheduler_stat(key):
+        def read():
+            scheduler = getattr(app, 'scheduler', None)
+            if scheduler is None:
+                return {}
+            return {(name, ): stats.get(key) for name, stats in scheduler.status().items()}
+        return read
+
+    def writer_stat(key):
+        def read():
+            return {
+                ('spx_analysis', ): analysis_writer.stats().get(key),
+                ('positions', ): position_writer.stats().get(key)
+            }
+        return read
+
+    registry.gauge('spx_snapshot_age_seconds', 'Age of the newest quote in the cached chain', snapshot_age)
+    registry.gauge('spx_snapshot_version', 'Version of the cached chain snapshot', lambda: chain_cache.version)
+    registry.callback_counter('spx_snapshot_fetches_total', 'Chain loads run by the snapshot cache',
+                              lambda: chain_cache.fetch_count)
+    registry.callback_counter('spx_vol_surface_builds_total', 'Volatility surface fits run by the surface cache',
+                              lambda: surface_cache.builds)
+    registry.gauge('spx_chain_quotes', 'Quotes held in the in-memory quote book', lambda: len(chain_loader.book))
+    registry.gauge('spx_open_positions', 'Open positions in the position book',
+                   lambda: len(position_book.positions(status='open')))
+    registry.gauge(
+        'spx_analyzer_result_version', 'Published result version per analyzer',
+        lambda: {(name, ): analyzer.result_version for name, analyzer in app.analyzers.loaded().items()},
+        ('analyzer',)
+    )
+    registry.gauge(
+        'spx_stream_subscribers', 'Connected stream subscribers per analyzer',
+        lambda: {(name, ): analyzer.channel.subscribers for name, analyzer in app.analyzers.loaded().items()},
+        ('analyzer',)
+    )
+    for key, help in (
+        ('runs', 'Completed scheduler cycles'),
+        ('errors', 'Scheduler cycles that raised'),
+        ('overruns', 'Scheduler cycles longer than the refresh interval'),
+        ('skipped_cycles', 'Scheduler cycles dropped while the previous one ran')
+    ):
+        registry.callback_counter(f'spx_scheduler_{key}_total', help, scheduler_stat(key), ('analyzer',))
+    registry.gauge('spx_scheduler_last_duration', 'Duration of the last scheduler cycle in seconds',
+                   scheduler_stat('last_duration'), ('analyzer',))
+    for key, help in (
+        ('written', 'Rows written by the write-behind queue'),
+        ('dropped', 'Rows dropped because the write-behind queue was full'),
+        ('failed', 'Rows lost to failed batch writes')
+    ):
+        registry.callback_counter(f'spx_writer_{key}_total', help, writer_stat(key), ('table',))
+    for key, help in (
+        ('depth', 'Rows waiting in the write-behind queue'),
+        ('max_flush_seconds', 'Slowest write-behind flush in seconds')
+    ):
+        registry.gauge(f'spx_writer_{key}', help, writer_stat(key), ('table',))
+
+
+def init_metrics(app):
+    """Install statement timing and per-request timing for the app"""
+    install_engine_events()
+    _register_app_gauges(app)
+
+    from flask import g, request
+
+    @app.before_request
+    def _start_request_timer():
+        g.metrics_request_started = time.perf_counter()
+
+    @app.after_request
+    def _observe_request(response):
+        started = g.pop('metrics_request_started', None)
+        # Streaming responses are timed until their headers are ready
+        if started is not None:
+            request_seconds.observe(
+                time.perf_counter() - started,
+                request.endpoint or 'unmatched', request.method, str(response.status_code)
+            )
+        return response
@@ -0,0 +1,209 @@
+import atexit
+import contextlib
+import logging
+import queue
+import threading
+import time
+from models import db, SPXAnalysis
+from analyzers.metrics import writer_flush_seconds
+
+logger = logging.getLogger("analyzer.persistence")
+
+
+class WriteBehindQueue:
+    """
+    Batches rows for one model and writes them from a background thread.
+
+    Rows are flushed with one bulk INSERT and one commit per batch, when
+    `batch_size` rows are waiting or `flush_interval` seconds have passed.
+    The queue holds at most `max_pending` rows: a producer that finds it
+    full waits up to `put_timeout` seconds for room (back-pressure) and the
+    row is dropped and counted if there is still none, so a slow database
+    never stalls analysis indefinitely. Pending rows are flushed on stop()
+    and at interpreter exit; the exit hook is registered once per queue,
+    however often the queue is started.
+
+    Before start() is called rows are written synchronously, as before.
+    """
+
+    def __init__(self, model, batch_size=200, flush_interval=2.0, max_pending=5000, put_timeout=0.5):
+        self.model = model
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self.app = None
+        self.max_pending = max_pending
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._thread = None
+        self._exit_hook = False
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self.enqueued = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.flushes = 0
+        self.last_flush_seconds = None
+        self.max_flush_seconds = 0.0
+
+    def configure(self, batch_size=None, flush_interval=None, max_pending=None, put_timeout=None):
+        """
+        Change batching and back-pressure settings; None keeps a setting.
+
+        A new queue bound replaces the queue, carrying over the rows that
+        are already waiting.
+        """
+        if batch_size is not None:
+            self.batch_size = batch_size
+        if flush_interval is not None:
+            self.flush_interval = flush_interval
+        if put_timeout is not None:
+            self.put_timeout = put_timeout
+        if max_pending is not None and max_pending != self.max_pending:
+            pending = self._drain(self._queue.qsize())
+            self.max_pending = max_pending
+            self._queue = queue.Queue(maxsize=max_pending)
+            for row in pending[:max_pending]:
+                self._queue.put_nowait(row)
+            # Rows beyond a smaller bound are written now rather than dropped
+            if pending[max_pending:]:
+                self._write(pending[max_pending:])
+        return self
+
+    def start(self, app):
+        """Start the writer thread; rows are written inside app contexts"""
+        self.app = app
+        if not self._exit_hook:
+            atexit.register(self.stop)
+            self._exit_hook = True
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name=f"write-behind-{self.model.__tablename__}", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5):
+        """Stop the writer and flush whatever is still queued"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        self.flush()
+
+    def put(self, row):
+        """Queue a row (dict of column values); False if it had to be dropped"""
+        if self._thread is None:
+            self._write([row])
+            return True
+        try:
+            self._queue.put(row, timeout=self.put_timeout)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            logger.warning(f"{self.model.__tablename__} write queue full, dropping row")
+            return False
+        with self._lock:
+            self.enqueued += 1
+        return True
+
+    def flush(self):
+        """Write every queued row now, on the calling thread"""
+        while True:
+            batch = self._drain(self.batch_size)
+            if not batch:
+                return
+            self._write(batch)
+
+    def _drain(self, limit):
+        batch = []
+        while len(batch) < limit:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _next_batch(self):
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size and not self._stop.is_set():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=min(remaining, 0.5)))
+            except queue.Empty:
+                continue
+            batch.extend(self._drain(self.batch_size - len(batch)))
+        return batch
+
+    def _run(self):
+        while not self._stop.is_set():
+            batch = self._next_batch()
+            if batch:
+                self._write(batch)
+
+    def _write(self, rows):
+        started = time.perf_counter()
+        context = self.app.app_context() if self.app is not None else contextlib.nullcontext()
+        with context:
+            try:
+                written = self.write_batch(rows)
+                db.session.commit()
+                ok = True
+            except Exception as e:
+                db.session.rollback()
+                ok = False
+                logger.error(f"Failed to write {len(rows)} {self.model.__tablename__} rows: {str(e)}")
+
+        duration = time.perf_counter() - started
+        writer_flush_seconds.observe(duration, self.model.__tablename__)
+        with self._lock:
+            self.flushes += 1
+            if ok:
+                self.written += len(rows)
+            else:
+                self.failed += len(rows)
+            self.last_flush_seconds = round(duration, 4)
+            self.max_flush_seconds = max(self.max_flush_seconds, round(duration, 4))
+        if ok:
+            self.committed(written)
+
+    def write_batch(self, rows):
+        """
+        Write one batch in the current session; the caller commits. The
+        return value is handed to committed() once the commit succeeds.
+        """
+        db.session.execute(db.insert(self.model), rows)
+
+    def committed(self, written):
+        """Called with write_batch()'s return value after its batch committed"""
+
+    def stats(self):
+        """Queue depth, row counters and flush latency"""
+        with self._lock:
+            return {
+                'depth': self._queue.qsize(),
+                'enqueued': self.enqueued,
+                'written': self.written,
+                'dropped': self.dropped,
+                'failed': self.failed,
+                'flushes': self.flushes,
+                'last_flush_seconds': self.last_flush_seconds,
+                'max_flush_seconds': self.max_flush_seconds
+            }
+
+
+analysis_writer = WriteBehindQueue(SPXAnalysis)
+
+
+def init_persistence(app):
+    """Start the spx_analysis writer (which flushes it at exit)"""
+    analysis_writer.configure(
+        batch_size=app.config.get('ANALYSIS_FLUSH_SIZE'),
+        flush_interval=app.config.get('ANALYSIS_FLUSH_INTERVAL'),
+        max_pending=app.config.get('ANALYSIS_QUEUE_MAX'),
+        put_timeout=app.config.get('ANALYSIS_ENQUEUE_TIMEOUT')
+    )
+    analysis_writer.start(app)
+    return analysis_writer
@@ -0,0 +1,407 @@
+import logging
+import queue
+import threading
+import uuid
+from datetime import date, datetime
+import sqlalchemy as sa
+from models import db, Position
+from analyzers.persistence import WriteBehindQueue
+from analyzers.schema import ensure_position_schema
+
+logger = logging.getLogger("analyzer.positions")
+
+# Position dict key -> positions table strike column
+LEG_COLUMNS = {
+    'short_call': 'short_call_strike',
+    'long_call': 'long_call_strike',
+    'short_put': 'short_put_strike',
+    'long_put': 'long_put_strike'
+}
+
+def _parse_time(value):
+    if isinstance(value, str):
+        try:
+            return datetime.fromisoformat(value)
+        except ValueError:
+            return None
+    return value
+
+
+def position_expiry(position):
+    """Expiration date (ISO string) of a position: its exp_date, else its entry date (0DTE)"""
+    exp_date = position.get('exp_date')
+    if exp_date:
+        return str(exp_date)[:10]
+    entry_time = _parse_time(position.get('timestamp'))
+    return entry_time.date().isoformat() if entry_time else None
+
+
+def _row_values(strategy, position):
+    """positions table values for a position dict"""
+    closed = bool(position.get('closed'))
+    values = {
+        'position_uuid': position['id'],
+        'type': strategy,
+        'entry_price': position.get('premium'),
+        'entry_time': _parse_time(position['timestamp']),
+        'status': 'closed' if closed else 'open',
+        'exit_time': _parse_time(position.get('close_timestamp')) if closed else None,
+        'exit_price': position.get('exit_price') if closed else None,
+        'exp_date': date.fromisoformat(position['exp_date']) if position.get('exp_date') else None,
+        'legs': dict(position)
+    }
+    for key, column in LEG_COLUMNS.items():
+        values[column] = position.get(key)
+    return values
+
+
+class PositionWriter(WriteBehindQueue):
+    """
+    Write-behind queue of position inserts and close updates.
+
+    A close whose update matches no row (the insert is still queued in
+    another process, or its batch failed) is re-queued up to
+    `close_attempts` times; after that the closed position is inserted
+    from the values carried with the close, so the close is never lost
+    silently.
+
+    `on_closed`, if set, is called with the ids of the positions whose
+    closed row has been committed.
+    """
+
+    close_attempts = 5
+    on_closed = None
+
+    def write_batch(self, rows):
+        """Write a batch; returns the ids of positions written as closed"""
+        inserts = [r['values'] for r in rows if r['op'] == 'insert']
+        closed = [v['position_uuid'] for v in inserts if v['status'] == 'closed']
+        updates = [r for r in rows if r['op'] == 'update']
+        # Inserts go first so a position opened and closed within one batch is updated
+        if inserts:
+            db.session.execute(db.insert(Position), inserts)
+        if updates:
+            table = Position.__table__
+            statement = sa.update(table).where(
+                table.c.position_uuid == sa.bindparam('b_uuid')
+            ).values(
+                status=sa.bindparam('b_status'),
+                exit_time=sa.bindparam('b_exit_time'),
+                exit_price=sa.bindparam('b_exit_price'),
+                legs=sa.bindparam('b_legs')
+            )
+            connection = db.session.connection()
+            # One statement per close: executemany rowcounts are not reliable on every driver
+            for row in updates:
+                values = {k: v for k, v in row['values'].items() if k.startswith('b_')}
+                if connection.execute(statement, values).rowcount or not self._unmatched_close(row):
+                    closed.append(values['b_uuid'])
+        return closed
+
+    def committed(self, written):
+        if written and self.on_closed is not None:
+            self.on_closed(written)
+
+    def _unmatched_close(self, row):
+        """Re-queue or force-write a close that matched no row; True if it was re-queued"""
+        position_id = row['values']['b_uuid']
+        attempts = row.get('attempts', 0) + 1
+        if attempts < self.close_attempts and self._thread is not None:
+            logger.warning(f"Close of position {position_id} matched no row, retrying ({attempts})")
+            try:
+                self._queue.put_nowait(dict(row, attempts=attempts))
+                return True
+            except queue.Full:
+                pass
+
+        logger.error(f"Position {position_id} was never inserted; writing it as closed")
+        try:
+            with db.session.begin_nested():
+                db.session.execute(db.insert(Position), [row['values']['row']])
+        except sa.exc.IntegrityError:
+            # The insert landed meanwhile; close it now
+            db.session.connection().execute(
+                sa.update(Position.__table__)
+                .where(Position.__table__.c.position_uuid == position_id)
+                .values(status='closed', exit_time=row['values']['b_exit_time'],
+                        exit_price=row['values']['b_exit_price'], legs=row['values']['b_legs'])
+            )
+        return False
+
+
+class PositionBook:
+    """
+    Positions of every strategy, indexed in memory and persisted to the
+    positions table.
+
+    Positions are dicts in the shape the dashboards already use (the
+    trade fields plus `id`, `timestamp` and `closed`). They are indexed by
+    id, by strategy, by status and by (strategy, status), so lookups and
+    listings never scan the whole book. Inserts and closes are queued on
+    a PositionWriter and written in batches. load() reads every open
+    position back in one query.
+
+    Each process has its own book. refresh() picks up positions that other
+    processes (e.g. other gunicorn workers) opened or closed; the
+    PositionSyncJob runs it on the scheduler so workers agree within
+    POSITION_SYNC_INTERVAL seconds.
+
+    Closed positions stay in the book only until their closed row is
+    committed (or, when another process closed them, until refresh() sees
+    it); after that they live in the positions table alone, so the book
+    holds open positions and recent closes rather than every position
+    ever opened. close() looks a position it does not hold up in the
+    table before rejecting it.
+
+    A book without a writer (writer=None) is kept in memory only, e.g. for
+    a replay that must not touch live positions; it keeps its closed
+    positions.
+    """
+
+    def __init__(self, writer):
+        self.writer = writer
+        if writer is not None:
+            writer.on_closed = self.evict
+        self.loaded = False
+        # Increases whenever a position is opened, closed or loaded
+        self.version = 0
+        self._by_id = {}
+        # Insertion-ordered id sets (dicts with None values)
+        self._by_strategy = {}
+        self._by_status = {'open': {}, 'closed': {}}
+        self._buckets = {}
+        self._strategy_of = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._by_id)
+
+    def _index(self, strategy, position):
+        position_id = position['id']
+        status = 'closed' if position.get('closed') else 'open'
+        self._by_id[position_id] = position
+        self._strategy_of[position_id] = strategy
+        self._by_strategy.setdefault(strategy, {})[position_id] = None
+        self._by_status[status][position_id] = None
+        self._buckets.setdefault((strategy, status), {})[position_id] = None
+        self.version += 1
+
+    def _drop(self, position_id):
+        # Caller holds the lock
+        strategy = self._strategy_of.pop(position_id)
+        status = 'closed' if self._by_id.pop(position_id).get('closed') else 'open'
+        del self._by_strategy[strategy][position_id]
+        del self._by_status[status][position_id]
+        del self._buckets[(strategy, status)][position_id]
+        self.version += 1
+
+    def evict(self, position_ids):
+        """Drop closed positions (whose close is persisted) from memory; returns how many were dropped"""
+        evicted = 0
+        with self._lock:
+            for position_id in position_ids:
+                if position_id in self._by_status['closed']:
+                    self._drop(position_id)
+                    evicted += 1
+        return evicted
+
+    def add(self, strategy, position_data):
+        """Open a position for a strategy; returns the stored position dict"""
+        position = dict(position_data)
+        position['id'] = str(uuid.uuid4())
+        position['timestamp'] = datetime.now().isoformat()
+        position['closed'] = False
+        position['exp_date'] = position_expiry(position)
+
+        with self._lock:
+            self._index(strategy, position)
+
+        if self.writer is not None:
+            self.writer.put({'op': 'insert', 'values': _row_values(strategy, position)})
+        return position
+
+    def _mark_closed(self, position_id, close_timestamp, exit_price):
+        # Caller holds the lock
+        position = self._by_id[position_id]
+        position['closed'] = True
+        position['close_timestamp'] = close_timestamp
+        if exit_price is not None:
+            position['exit_price'] = exit_price
+
+        strategy = self._strategy_of[position_id]
+        del self._by_status['open'][position_id]
+        del self._buckets[(strategy, 'open')][position_id]
+        self._by_status['closed'][position_id] = None
+        self._buckets.setdefault((strategy, 'closed'), {})[position_id] = None
+        self.version += 1
+        return position
+
+    def _stored(self, position_id):
+        """A closed position read from the positions table, or None"""
+        row = db.session.execute(
+            sa.select(Position.type, Position.legs, Position.exit_time, Position.exit_price)
+            .where(Position.position_uuid == position_id, Position.status == 'closed')
+        ).first()
+        if row is None:
+            return None, None
+        position = dict(row.legs or {}, id=position_id, closed=True)
+        position.setdefault('close_timestamp', row.exit_time.isoformat() if row.exit_time else None)
+        position.setdefault('exit_price', row.exit_price)
+        return row.type, position
+
+    def close(self, position_id, exit_price=None, strategy=None):
+        """
+        Close a position by id; None if there is no such position (or it
+        belongs to another strategy than `strategy`).
+
+        A position this book does not hold may have been opened by another
+        process or already closed and evicted: the book is refreshed from
+        the positions table, and an already closed position is returned as
+        stored.
+        """
+        if position_id not in self._by_id and self.writer is not None:
+            self.refresh()
+            if position_id not in self._by_id:
+                strategy_of, position = self._stored(position_id)
+                if strategy is not None and strategy_of != strategy:
+                    return None
+                return position
+
+        with self._lock:
+            position = self._by_id.get(position_id)
+            if position is None:
+                return None
+            strategy_of = self._strategy_of[position_id]
+            if strategy is not None and strategy_of != strategy:
+                return None
+            if position.get('closed'):
+                return position
+            position = self._mark_closed(position_id, datetime.now().isoformat(), exit_price)
+
+        if self.writer is None:
+            return position
+        self.writer.put({'op': 'update', 'values': {
+            'b_uuid': position_id,
+            'b_status': 'closed',
+            'b_exit_time': _parse_time(position['close_timestamp']),
+            'b_exit_price': exit_price,
+            'b_legs': dict(position),
+            # Full row, in case the position's insert never landed
+            'row': _row_values(strategy_of, position)
+        }})
+        return position
+
+    def get(self, position_id):
+        return self._by_id.get(position_id)
+
+    def positions(self, strategy=None, status=None):
+        """Positions in the order they were opened, optionally filtered"""
+        with self._lock:
+            if strategy is not None and status is not None:
+                ids = self._buckets.get((strategy, status), {})
+            elif strategy is not None:
+                ids = self._by_strategy.get(strategy, {})
+            elif status is not None:
+                ids = self._by_status.get(status, {})
+            else:
+                ids = self._by_id
+            return [self._by_id[i] for i in ids]
+
+    def load(self):
+        """Read all open positions from the database in one query"""
+        ensure_position_schema(db.engine)
+        loaded, _ = self.refresh()
+        self.loaded = True
+        logger.info(f"Loaded {loaded} open positions")
+        return loaded
+
+    def refresh(self):
+        """
+        Bring the book in line with the positions table.
+
+        Open positions missing from the book are added, and positions open
+        in the book but closed in the table are closed here too (without
+        writing anything back) and evicted. Positions this process opened
+        that are not written yet are left alone. Returns (opened, closed).
+        """
+        rows = db.session.execute(
+            sa.select(Position.position_uuid, Position.type, Position.legs,
+                      Position.entry_time, Position.entry_price, Position.exp_date, *[getattr(Position, c) for c in LEG_COLUMNS.values()])
+            .where(Position.status == 'open')
+            .order_by(Position.entry_time, Position.id)
+        ).all()
+        open_ids = {row.position_uuid for row in rows}
+        with self._lock:
+            unknown = [i for i in self._by_status['open'] if i not in open_ids]
+        closed_rows = []
+        if unknown:
+            closed_rows = db.session.execute(
+                sa.select(Position.position_uuid, Position.exit_time, Position.exit_price)
+                .where(Position.position_uuid.in_(unknown), Position.status == 'closed')
+            ).all()
+
+        opened = closed = 0
+        with self._lock:
+            for row in closed_rows:
+                if row.position_uuid in self._by_status['open']:
+                    close_timestamp = row.exit_time.isoformat() if row.exit_time else datetime.now().isoformat()
+                    self._mark_closed(row.position_uuid, close_timestamp, row.exit_price)
+                    # Already persisted by the process that closed it
+                    self._drop(row.position_uuid)
+                    closed += 1
+            for row in rows:
+                if not row.position_uuid or row.position_uuid in self._by_id:
+                    continue
+                position = dict(row.legs or {})
+                position['id'] = row.position_uuid
+                position.setdefault('timestamp', row.entry_time.isoformat() if row.entry_time else None)
+                position.setdefault('premium', row.entry_price)
+                if not position.get('exp_date'):
+                    position['exp_date'] = row.exp_date.isoformat() if row.exp_date else position_expiry(position)
+                for key, column in LEG_COLUMNS.items():
+                    position.setdefault(key, getattr(row, column))
+                position['closed'] = False
+                self._index(row.type, position)
+                opened += 1
+        if opened or closed:
+            logger.info(f"Position refresh: {opened} opened, {closed} closed elsewhere")
+        return opened, closed
+
+
+class PositionSyncJob:
+    """
+    Refreshes the position book from the positions table on the
+    scheduler, like RollupJob, so every worker process converges on the
+    same open positions.
+    """
+
+    name = 'position_sync'
+
+    def __init__(self, book, refresh_interval=10):
+        self.book = book
+        self.refresh_interval = refresh_interval
+        self.scheduled = False
+        self.last_run = None
+
+    def run_cycle(self):
+        changes = self.book.refresh()
+        self.last_run = datetime.now()
+        return changes
+
+
+position_writer = PositionWriter(Position, batch_size=100, flush_interval=1.0)
+position_book = PositionBook(position_writer)
+
+
+def init_positions(app):
+    """
+    Start the position writer (which flushes it at exit), and register
+    the position sync job unless POSITION_SYNC_INTERVAL is 0.
+    """
+    position_writer.start(app)
+    app.jobs = getattr(app, 'jobs', {})
+    interval = app.config.get('POSITION_SYNC_INTERVAL', 10)
+    if interval:
+        job = PositionSyncJob(position_book, interval)
+        app.jobs[job.name] = job
+    return position_book
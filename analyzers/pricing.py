@@ -0,0 +1,248 @@
+import numpy as np
+from datetime import datetime, time
+import pytz
+
+SECONDS_PER_YEAR = 365.25 * 24 * 60 * 60
+
+# SPX options stop trading at 3:00 PM Central
+MARKET_CLOSE = time(15, 0)
+CENTRAL = pytz.timezone('US/Central')
+
+_INV_SQRT_2PI = 1.0 / np.sqrt(2.0 * np.pi)
+
+
+def call_flags(option_types):
+    """Boolean array, True where the option type is a call ('call' or 'C')"""
+    types = np.char.lower(np.asarray(option_types, dtype=str))
+    return (types == 'call') | (types == 'c')
+
+
+def years_to_expiration(current_time, expiration_dates, market_close=MARKET_CLOSE):
+    """
+    Time to expiration in years for an array of expiration dates.
+
+    Each distinct expiration is localized to Central time once and the
+    result is broadcast back to every row.
+
+    Parameters:
+    current_time: Current datetime
+    expiration_dates: Array-like of option expiration dates
+    market_close: Market closing time (default: 3:00 PM Central Time)
+
+    Returns:
+    float64 array of non-negative times to expiration in years
+    """
+    dates = np.asarray(expiration_dates)
+    if dates.dtype.kind == 'M':
+        dates = dates.astype('datetime64[D]')
+    if dates.size == 0:
+        return np.empty(0, dtype=np.float64)
+
+    current_time = current_time.astimezone(CENTRAL)
+    unique_dates, inverse = np.unique(dates, return_inverse=True)
+
+    years = np.empty(len(unique_dates), dtype=np.float64)
+    for i, exp_date in enumerate(unique_dates.tolist()):
+        if isinstance(exp_date, datetime):
+            exp_date = exp_date.date()
+        expiration_datetime = CENTRAL.localize(datetime.combine(exp_date, market_close))
+        years[i] = (expiration_datetime - current_time).total_seconds() / SECONDS_PER_YEAR
+
+    return np.maximum(years, 0)[inverse.reshape(dates.shape)]
+
+
+def bs_price_greeks(S, K, T, sigma, r=0.0, is_call=True):
+    """
+    Black-Scholes price and greeks for whole arrays of options in one pass.
+
+    All inputs broadcast against each other. Options at or past expiry, or
+    with zero volatility, are valued at intrinsic value with step delta and
+    zero gamma, theta and vega.
+
+    Parameters:
+    S: Underlying price
+    K: Strike price
+    T: Time to expiration (in years)
+    sigma: Volatility (decimal, e.g. 0.18)
+    r: Risk-free interest rate
+    is_call: Boolean flags, True for calls and False for puts
+
+    Returns:
+    Dictionary of float64 arrays: price, delta, gamma, theta (per year)
+    and vega (per 1.00 change in volatility)
+    """
+    S, K, T, sigma, r, is_call = np.broadcast_arrays(
+        np.asarray(S, dtype=np.float64),
+        np.asarray(K, dtype=np.float64),
+        np.asarray(T, dtype=np.float64),
+        np.asarray(sigma, dtype=np.float64),
+        np.asarray(r, dtype=np.float64),
+        np.asarray(is_call, dtype=bool)
+    )
+
+    # NaN inputs are neither live nor expired and propagate as NaN
+    expired = (T <= 0) | (sigma <= 0)
+    sqrt_t = np.sqrt(np.where(expired, 1.0, T))
+    vol_sqrt_t = np.where(expired, 1.0, sigma) * sqrt_t
+    discount = np.exp(-r * T)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        d1 = (np.log(S / K) + (r + 0.5 * sigma ** 2) * T) / vol_sqrt_t
+    d2 = d1 - vol_sqrt_t
+
+    # Imported here so importing the analyzers (and create_app) does not load scipy
+    from scipy.special import ndtr
+
+    pdf_d1 = np.exp(-0.5 * d1 ** 2) * _INV_SQRT_2PI
+    cdf_d1 = ndtr(d1)
+    cdf_d2 = ndtr(d2)
+    cdf_neg_d1 = ndtr(-d1)
+    cdf_neg_d2 = ndtr(-d2)
+
+    call_price = S * cdf_d1 - K * discount * cdf_d2
+    put_price = K * discount * cdf_neg_d2 - S * cdf_neg_d1
+
+    decay = -S * pdf_d1 * sigma / (2 * sqrt_t)
+    call_theta = decay - r * K * discount * cdf_d2
+    put_theta = decay + r * K * discount * cdf_neg_d2
+
+    price = np.where(is_call, call_price, put_price)
+    delta = np.where(is_call, cdf_d1, cdf_d1 - 1)
+    gamma = pdf_d1 / (S * vol_sqrt_t)
+    theta = np.where(is_call, call_theta, put_theta)
+    vega = S * pdf_d1 * sqrt_t
+
+    if expired.any():
+        forward_moneyness = S - K * discount
+        intrinsic = np.where(is_call, np.maximum(forward_moneyness, 0), np.maximum(-forward_moneyness, 0))
+        itm = np.where(is_call, forward_moneyness > 0, forward_moneyness < 0)
+        price = np.where(expired, intrinsic, price)
+        delta = np.where(expired, np.where(itm, np.where(is_call, 1.0, -1.0), 0.0), delta)
+        gamma = np.where(expired, 0.0, gamma)
+        theta = np.where(expired, 0.0, theta)
+        vega = np.where(expired, 0.0, vega)
+
+    return {
+        'price': price,
+        'delta': delta,
+        'gamma': gamma,
+        'theta': theta,
+        'vega': vega
+    }
+
+
+def implied_volatility(price, S, K, T, r=0.0, is_call=True, initial_guess=None,
+                       tol=1e-6, max_iter=50, lower=1e-4, upper=5.0):
+    """
+    Implied volatility for whole arrays of option prices at once.
+
+    Safeguarded Newton iteration: each option keeps a [lower, upper]
+    bracket on sigma that shrinks every step, and any Newton step that
+    leaves the bracket (or has negligible vega) is replaced by bisection.
+    Only options that have not converged are re-priced on each iteration.
+
+    Parameters:
+    price: Option prices to invert (e.g. bid/ask mids)
+    S, K, T, r, is_call: As for bs_price_greeks
+    initial_guess: Optional starting sigmas, e.g. the previous tick's
+        solution; NaN entries fall back to an ATM approximation
+    tol: Absolute price tolerance
+    max_iter: Maximum Newton/bisection steps
+
+    Returns:
+    float64 array of implied volatilities, NaN where the price is outside
+    the no-arbitrage bounds or the option has expired
+    """
+    price, S, K, T, r, is_call = [
+        a.copy() for a in np.broadcast_arrays(
+            np.asarray(price, dtype=np.float64),
+            np.asarray(S, dtype=np.float64),
+            np.asarray(K, dtype=np.float64),
+            np.asarray(T, dtype=np.float64),
+            np.asarray(r, dtype=np.float64),
+            np.asarray(is_call, dtype=bool)
+        )
+    ]
+    shape = price.shape
+    price, S, K, T, r, is_call = [a.ravel() for a in (price, S, K, T, r, is_call)]
+    sigma_out = np.full(price.shape, np.nan)
+
+    # Prices must lie strictly between intrinsic value and the upper bound
+    discount = np.exp(-r * T)
+    lower_bound = np.where(is_call, np.maximum(S - K * discount, 0), np.maximum(K * discount - S, 0))
+    upper_bound = np.where(is_call, S, K * discount)
+    valid = (T > 0) & (price > lower_bound) & (price < upper_bound) & (S > 0) & (K > 0)
+
+    active = np.flatnonzero(valid)
+    if not active.size:
+        return sigma_out.reshape(shape)
+
+    # Brenner-Subrahmanyam ATM approximation as the default start
+    sigma = np.sqrt(2 * np.pi / T[active]) * price[active] / S[active]
+    if initial_guess is not None:
+        guess = np.broadcast_to(np.asarray(initial_guess, dtype=np.float64), shape).ravel()[active]
+        sigma = np.where(np.isfinite(guess) & (guess > 0), guess, sigma)
+    sigma = np.clip(sigma, lower, upper)
+    lo = np.full(active.size, lower)
+    hi = np.full(active.size, upper)
+
+    for _ in range(max_iter):
+        greeks = bs_price_greeks(S[active], K[active], T[active], sigma, r[active], is_call[active])
+        diff = greeks['price'] - price[active]
+
+        done = np.abs(diff) < tol
+        if done.any():
+            sigma_out[active[done]] = sigma[done]
+            keep = ~done
+            active, sigma, lo, hi = active[keep], sigma[keep], lo[keep], hi[keep]
+            diff, vega = diff[keep], greeks['vega'][keep]
+            if not active.size:
+                break
+        else:
+            vega = greeks['vega']
+
+        # Price is increasing in sigma, so the sign of diff tightens the bracket
+        too_high = diff > 0
+        hi = np.where(too_high, sigma, hi)
+        lo = np.where(too_high, lo, sigma)
+
+        with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+            newton = sigma - diff / vega
+        bisect = (lo + hi) / 2
+        use_newton = np.isfinite(newton) & (newton > lo) & (newton < hi)
+        sigma = np.where(use_newton, newton, bisect)
+
+        # Bracket has collapsed without meeting the price tolerance
+        collapsed = (hi - lo) < 1e-10
+        if collapsed.any():
+            sigma_out[active[collapsed]] = sigma[collapsed]
+            keep = ~collapsed
+            active, sigma, lo, hi = active[keep], sigma[keep], lo[keep], hi[keep]
+            if not active.size:
+                break
+
+    return sigma_out.reshape(shape)
+
+
+def parity_forward(exp_dates, strikes, call_mid, put_mid):
+    """
+    Implied forward per expiration from put-call parity.
+
+    For each expiration the strike where call and put mids are closest is
+    used: F = K + C - P (zero rates). Returns one forward per row.
+    """
+    exp_dates = np.asarray(exp_dates)
+    forward = np.full(exp_dates.shape, np.nan)
+    if not exp_dates.size:
+        return forward
+
+    spread = call_mid - put_mid
+    unique_dates, inverse = np.unique(exp_dates, return_inverse=True)
+    for i in range(len(unique_dates)):
+        rows = np.flatnonzero(inverse == i)
+        usable = rows[np.isfinite(spread[rows])]
+        if not usable.size:
+            continue
+        atm = usable[np.argmin(np.abs(spread[usable]))]
+        forward[rows] = strikes[atm] + spread[atm]
+    return forward
@@ -0,0 +1,211 @@
+"""
+Historical replay of spx_0dte_stream through analyzers.
+
+Usage:
+    python -m analyzers.replay --date 2024-05-01 --analyzers iron_condor short_vertical
+    python -m analyzers.replay --date 2024-05-01 --speed 60 --output replay.ndjson
+"""
+import argparse
+import itertools
+import json
+import logging
+import time
+from collections.abc import Mapping
+from datetime import date, datetime, timedelta
+import numpy as np
+import pytz
+from models import db, SPXOptionStream, SPXSpot
+from analyzers import create_analyzer
+from analyzers.chain import ChainSnapshot, MarketData, _epoch_us, chain_columns
+from analyzers.ingest import parity_spot
+from analyzers.positions import PositionBook
+from analyzers.risk import PositionRiskEngine
+from analyzers.vol_surface import VolSurfaceCache
+
+logger = logging.getLogger("analyzer.replay")
+
+
+class ReplayEngine:
+    """
+    Streams one past session of spx_0dte_stream through analyzers.
+
+    Rows are read in timestamp order with `yield_per`, so the driver uses a
+    server-side cursor and only `batch_size` rows are held at a time. Each
+    distinct timestamp is one tick: its rows are upserted into one chain
+    snapshot (only the tick's rows are converted and written into the
+    existing column arrays) and the chain is handed to every analyzer's
+    analyze(), just as the live loader would see it. The snapshot is
+    updated in place from tick to tick; take() a copy to keep one. Spot
+    prices come from spx_0dte_spot, read once per day, with the parity
+    forward as a fallback. Ticks are replayed as fast as the CPU allows,
+    or at `speed` times real time.
+
+    `analyzers` is a list of registry names, or a mapping of names to
+    analyzers whose classes are used. The engine always drives its own,
+    fresh instances (self.analyzers), so live analyzers are never touched.
+    They are driven directly (no publish, stream or database writes), fit
+    volatility surfaces on the replay's own VolSurfaceCache, and those
+    that track positions get a replay-only, in-memory book and risk
+    engine, so a replay never sees or changes live state.
+    """
+
+    def __init__(self, analyzers, model=SPXOptionStream, batch_size=5000, timezone='America/New_York'):
+        self.model = model
+        self.batch_size = batch_size
+        self.timezone = pytz.timezone(timezone)
+        self.position_book = PositionBook(None)
+        self.surface_cache = VolSurfaceCache()
+        if not isinstance(analyzers, Mapping):
+            analyzers = dict.fromkeys(analyzers)
+        self.analyzers = {name: self._replay_analyzer(name, analyzer) for name, analyzer in analyzers.items()}
+
+    def _replay_analyzer(self, name, analyzer=None):
+        # A new instance wired to the replay's book, risk engine and surface cache
+        analyzer = create_analyzer(name) if analyzer is None else type(analyzer)()
+        analyzer.persist_results = False
+        analyzer.surface_cache = self.surface_cache
+        if hasattr(analyzer, 'position_book'):
+            analyzer.position_book = self.position_book
+            analyzer.risk_engine = PositionRiskEngine(book=self.position_book, surface_cache=self.surface_cache)
+        return analyzer
+
+    def _session_bounds(self, day):
+        start = self.timezone.localize(datetime.combine(day, datetime.min.time()))
+        return start, start + timedelta(days=1)
+
+    def _spot_series(self, session, start, end):
+        # Epoch-microsecond times and prices of the day's spot prints, plus the last print before it
+        before = session.execute(
+            db.select(SPXSpot.timestamp, SPXSpot.price)
+            .where(SPXSpot.timestamp < start)
+            .order_by(SPXSpot.timestamp.desc()).limit(1)
+        ).all()
+        rows = before + session.execute(
+            db.select(SPXSpot.timestamp, SPXSpot.price)
+            .where(SPXSpot.timestamp >= start, SPXSpot.timestamp < end)
+            .order_by(SPXSpot.timestamp)
+        ).all()
+        times = np.array([_epoch_us(ts) for ts, _ in rows], dtype=np.float64)
+        prices = np.array([price for _, price in rows], dtype=np.float64)
+        return times, prices
+
+    def ticks(self, day, session=None):
+        """Yield (timestamp, rows merged, MarketData) for every tick of a day"""
+        session = session or db.session
+        start, end = self._session_bounds(day)
+        spot_times, spot_prices = self._spot_series(session, start, end)
+        query = (
+            db.select(*chain_columns(self.model))
+            .where(self.model.timestamp >= start, self.model.timestamp < end)
+            .order_by(self.model.timestamp, self.model.exp_date, self.model.strike_price)
+            .execution_options(yield_per=self.batch_size)
+        )
+
+        chain = ChainSnapshot.empty()
+        result = session.execute(query)
+        rows = itertools.chain.from_iterable(result.partitions())
+        for version, (timestamp, tick_rows) in enumerate(itertools.groupby(rows, key=lambda r: r[0]), 1):
+            tick_rows = list(tick_rows)
+            chain, _ = chain.upsert(tick_rows)
+            market_data = MarketData(
+                chain,
+                timestamp=timestamp.isoformat(),
+                spx_price=self._spot_at(spot_times, spot_prices, timestamp, chain),
+                snapshot_version=version
+            )
+            yield timestamp, len(tick_rows), market_data
+
+    @staticmethod
+    def _spot_at(spot_times, spot_prices, timestamp, chain):
+        # Newest spot print at or before the tick, as the live loader would have read it
+        i = np.searchsorted(spot_times, _epoch_us(timestamp), side='right') - 1
+        if i >= 0:
+            return float(spot_prices[i])
+        return parity_spot(chain)
+
+    def run(self, day, session=None, speed=None, on_result=None):
+        """
+        Replay a day and return a throughput report.
+
+        speed: None or 0 replays as fast as possible; otherwise the gap
+            between ticks is slept for, divided by `speed`.
+        on_result: Optional callback(name, timestamp, results) per analyzer
+            per tick.
+        """
+        report = {
+            'date': day.isoformat(),
+            'ticks': 0,
+            'rows': 0,
+            'errors': 0,
+            'analyzers': {name: {'seconds': 0.0, 'errors': 0} for name in self.analyzers}
+        }
+        started = time.perf_counter()
+        analyze_seconds = 0.0
+        previous_tick = None
+
+        for timestamp, row_count, market_data in self.ticks(day, session):
+            if speed and previous_tick is not None:
+                time.sleep(max(0.0, (timestamp - previous_tick).total_seconds() / speed))
+            previous_tick = timestamp
+
+            for name, analyzer in self.analyzers.items():
+                analyzer_started = time.perf_counter()
+                try:
+                    results = analyzer.analyze(market_data)
+                except Exception as e:
+                    report['errors'] += 1
+                    report['analyzers'][name]['errors'] += 1
+                    logger.error(f"{name} failed at {timestamp}: {str(e)}")
+                    results = None
+                elapsed = time.perf_counter() - analyzer_started
+                report['analyzers'][name]['seconds'] += elapsed
+                analyze_seconds += elapsed
+                if on_result is not None and results is not None:
+                    on_result(name, timestamp, results)
+
+            report['ticks'] += 1
+            report['rows'] += row_count
+
+        elapsed = time.perf_counter() - started
+        report['seconds'] = round(elapsed, 4)
+        report['load_seconds'] = round(elapsed - analyze_seconds, 4)
+        report['ticks_per_second'] = round(report['ticks'] / elapsed, 2) if elapsed else None
+        report['rows_per_second'] = round(report['rows'] / elapsed, 2) if elapsed else None
+        for stats in report['analyzers'].values():
+            stats['ms_per_tick'] = round(stats['seconds'] * 1e3 / report['ticks'], 3) if report['ticks'] else None
+            stats['seconds'] = round(stats['seconds'], 4)
+        return report
+
+
+def _result_line(name, timestamp, results):
+    return json.dumps({'analyzer': name, 'tick': timestamp.isoformat(), 'results': results}, default=str)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--date', required=True, type=date.fromisoformat, help="Session date (YYYY-MM-DD)")
+    parser.add_argument('--analyzers', nargs='+', default=['iron_condor', 'short_vertical'])
+    parser.add_argument('--speed', type=float, default=0, help="Multiple of real time; 0 replays as fast as possible")
+    parser.add_argument('--batch-size', type=int, default=5000)
+    parser.add_argument('--output', help="Write every analyzer result as NDJSON to this file")
+    args = parser.parse_args()
+
+    from flaskdashboard import create_app
+
+    app = create_app()
+    engine = ReplayEngine(args.analyzers, batch_size=args.batch_size, timezone=app.config.get('TIMEZONE', 'America/New_York'))
+
+    output = open(args.output, 'w') if args.output else None
+    on_result = (lambda name, ts, results: output.write(_result_line(name, ts, results) + '\n')) if output else None
+    try:
+        with app.app_context():
+            report = engine.run(args.date, speed=args.speed, on_result=on_result)
+    finally:
+        if output:
+            output.close()
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
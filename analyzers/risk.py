@@ -0,0 +1,179 @@
+import numpy as np
+from analyzers.chain import ChainSnapshot, json_float
+from analyzers.positions import position_book, position_expiry
+from analyzers.vol_surface import vol_surface
+
+# Position dict key -> (option side, sign); short legs are -1, long legs +1
+LEG_KEYS = (
+    ('short_call', 'call', -1.0),
+    ('long_call', 'call', 1.0),
+    ('short_put', 'put', -1.0),
+    ('long_put', 'put', 1.0)
+)
+
+RISK_FIELDS = ('delta', 'gamma', 'theta', 'vega')
+
+
+class PositionRiskEngine:
+    """
+    Marks every open position in the position book to the live chain.
+
+    The legs of all open positions are flattened into arrays once per
+    change of the book. On each tick every leg is found in the chain with
+    one strike lookup, its quote and greeks are gathered in one indexing
+    step, and legs are summed per position with bincount. The per-tick cost
+    is a handful of array operations regardless of how many positions are
+    open. Legs whose strike the chain does not quote are priced off the
+    shared volatility surface.
+
+    Values are in option points times `multiplier` (1 keeps the units of
+    `premium`; use 100 for SPX dollars). P&L is the entry credit plus the
+    current value of the legs, so a credit position that could be closed
+    for less than it was opened for shows a profit.
+    """
+
+    def __init__(self, book=position_book, multiplier=1.0, surface_cache=None):
+        self.book = book
+        self.multiplier = multiplier
+        # None prices unquoted legs on the shared surface cache
+        self.surface_cache = surface_cache
+        self._legs = {}
+
+    def _flatten(self, strategy):
+        key = (self.book.version, strategy)
+        cached = self._legs.get(strategy)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+
+        positions = self.book.positions(strategy, 'open')
+        owner, exp_date, strike, is_call, weight = [], [], [], [], []
+        credit = np.zeros(len(positions))
+        for i, position in enumerate(positions):
+            quantity = float(position.get('quantity') or 1)
+            credit[i] = float(position.get('premium') or 0.0) * quantity
+            for leg_key, side, sign in LEG_KEYS:
+                leg_strike = position.get(leg_key)
+                if leg_strike is None:
+                    continue
+                owner.append(i)
+                exp_date.append(position_expiry(position) or 'NaT')
+                strike.append(float(leg_strike))
+                is_call.append(side == 'call')
+                weight.append(sign * quantity)
+
+        legs = {
+            'positions': positions,
+            'credit': credit,
+            'owner': np.array(owner, dtype=np.intp),
+            'exp_date': np.array(exp_date, dtype='datetime64[D]'),
+            'strike': np.array(strike, dtype=np.float64),
+            'is_call': np.array(is_call, dtype=bool),
+            'weight': np.array(weight, dtype=np.float64)
+        }
+        self._legs[strategy] = (key, legs)
+        return legs
+
+    def mark(self, chain, strategy=None):
+        """
+        Mark open positions (optionally of one strategy) against a chain.
+
+        chain may be a ChainSnapshot, an ExpiryChain or a market data
+        payload. Legs are gathered by (expiration, strike): each distinct
+        leg expiration is looked up once and its legs are found with one
+        strike lookup. Positions without a stored expiration are taken to
+        expire on their entry date (0DTE).
+
+        Returns {'positions': [...], 'aggregate': {...}} with P&L, value,
+        delta, gamma, theta and vega per position and in total. Legs missing
+        from a listed expiration are valued on the volatility surface of a
+        market data payload (`modelled: True`). A position whose expiration
+        the chain does not list (e.g. one left open from an earlier
+        session), or with a leg that cannot be valued, has
+        `complete: False` and is left out of the aggregate.
+        """
+        payload = chain
+        if hasattr(chain, 'index_of'):
+            # One expiration; undated (legacy) chains match every leg
+            listed = None if chain.exp_date is None else np.array([chain.exp_date], dtype='datetime64[D]')
+            expiry_chain = lambda exp_date: chain
+        else:
+            if not isinstance(chain, ChainSnapshot):
+                chain = ChainSnapshot.from_market_data(chain)
+            listed = chain.expirations() if len(chain) and chain.expirations().size else None
+            expiry_chain = chain.expiry
+
+        legs = self._flatten(strategy)
+        positions = legs['positions']
+        n = len(positions)
+        owner, is_call, weight = legs['owner'], legs['is_call'], legs['weight']
+        leg_exp = legs['exp_date']
+
+        leg_values = {field: np.full(len(owner), np.nan) for field in ('value',) + RISK_FIELDS}
+        unquoted = np.zeros(len(owner), dtype=bool)
+        surface = None
+        for exp_date in np.unique(leg_exp):
+            members = np.flatnonzero(np.isnat(leg_exp) if np.isnat(exp_date) else leg_exp == exp_date)
+            if listed is not None and not (listed == exp_date).any():
+                continue
+            expiry = expiry_chain(None if listed is None or np.isnat(exp_date) else exp_date)
+            if not len(expiry):
+                continue
+
+            rows = expiry.index_of(legs['strike'][members])
+            found = rows >= 0
+            safe_rows = np.where(found, rows, 0)
+            # One gather per column: each leg reads its call or put quote
+            for field in leg_values:
+                if field == 'value':
+                    call_column, put_column = expiry.call.mid, expiry.put.mid
+                else:
+                    call_column, put_column = getattr(expiry.call, field), getattr(expiry.put, field)
+                leg_values[field][members] = np.where(
+                    found,
+                    np.where(is_call[members], call_column[safe_rows], put_column[safe_rows]),
+                    np.nan
+                )
+
+            # Unquoted legs of a listed expiration take the surface's model value and greeks
+            missing = members[~np.isfinite(leg_values['value'][members])]
+            if not missing.size or not hasattr(payload, 'get'):
+                continue
+            surface = surface or vol_surface(payload, self.surface_cache)
+            model = surface.quotes(expiry.exp_date, legs['strike'][missing], is_call[missing]) if surface else None
+            if model is not None:
+                for field in leg_values:
+                    leg_values[field][missing] = model[field]
+                unquoted[missing] = True
+        modelled = np.bincount(owner, weights=unquoted & np.isfinite(leg_values['value']), minlength=n) > 0
+
+        # A position is complete when every leg has a quote or a model value
+        priced = np.isfinite(leg_values['value'])
+        missing = np.bincount(owner, weights=~priced, minlength=n) > 0
+
+        totals = {}
+        for field, values in leg_values.items():
+            contribution = np.where(np.isfinite(values), values * weight, 0.0)
+            totals[field] = np.bincount(owner, weights=contribution, minlength=n) * self.multiplier
+        totals['pnl'] = legs['credit'] * self.multiplier + totals['value']
+
+        complete = ~missing
+        result = []
+        for i, position in enumerate(positions):
+            entry = {
+                'id': position['id'],
+                'exp_date': position_expiry(position),
+                'complete': bool(complete[i]),
+                'modelled': bool(modelled[i])
+            }
+            for field in ('pnl', 'value') + RISK_FIELDS:
+                entry[field] = json_float(totals[field][i]) if complete[i] else None
+            result.append(entry)
+
+        aggregate = {field: json_float(totals[field][complete].sum()) for field in ('pnl', 'value') + RISK_FIELDS}
+        aggregate['positions'] = n
+        aggregate['unpriced'] = int(missing.sum())
+        aggregate['modelled'] = int((modelled & complete).sum())
+        return {'positions': result, 'aggregate': aggregate}
+
+
+risk_engine = PositionRiskEngine()
@@ -0,0 +1,365 @@
+"""
+Intraday rollups of spx_0dte_stream for history views.
+
+    spx_0dte_bars_1m   open/high/low/close of each strike's mark per minute
+    spread_data        credit of short verticals per minute, bucketed by
+                       the short leg's delta and the spread width
+
+Both are computed over columnar chains with NumPy and written with bulk
+inserts, so charts read a few rows per minute instead of raw ticks.
+
+Usage:
+    python -m analyzers.rollup            # roll up everything not yet rolled up
+"""
+import argparse
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+import numpy as np
+from models import db, OptionBar, SPXOptionStream, SpreadData
+from analyzers.chain import ChainSnapshot, chain_columns
+
+logger = logging.getLogger("analyzer.rollup")
+
+US_PER_MINUTE = 60_000_000
+# Strikes are below this, so (tick, strike) pairs pack into one sortable float key
+STRIKE_KEY_SCALE = 1e6
+
+
+def _minute_datetime(minutes):
+    return [datetime.fromtimestamp(m * 60, tz=timezone.utc) for m in minutes.tolist()]
+
+
+def _exp_dates(days):
+    return days.astype('datetime64[D]').astype(object).tolist()
+
+
+def _nullable(values, digits=None):
+    if digits is not None:
+        values = np.round(values, digits)
+    return [None if v != v else v for v in values.tolist()]
+
+
+def mark_price(side):
+    """Mid of a two-sided quote, else the last trade, else NaN"""
+    two_sided = (side.bid > 0) & (side.ask > 0) & (side.ask >= side.bid)
+    last = np.where(side.last > 0, side.last, np.nan)
+    return np.where(two_sided, side.mid, last)
+
+
+def minute_bars(chain):
+    """
+    One-minute bar records per (minute, exp_date, strike_price).
+
+    Rows are sorted once by (minute, expiry, strike, timestamp); bars are
+    then cut at group boundaries with reduceat, so the cost is one sort
+    however many strikes and ticks there are.
+    """
+    if not len(chain):
+        return []
+
+    minute = chain.timestamp // US_PER_MINUTE
+    exp = chain.exp_date.astype(np.int64)
+    order = np.lexsort((chain.timestamp, chain.strike, exp, minute))
+    m, e, k = minute[order], exp[order], chain.strike[order]
+
+    boundary = np.ones(len(order), dtype=bool)
+    boundary[1:] = (m[1:] != m[:-1]) | (e[1:] != e[:-1]) | (k[1:] != k[:-1])
+    first = np.flatnonzero(boundary)
+    last = np.append(first[1:], len(order)) - 1
+
+    columns = {
+        'minute': _minute_datetime(m[first]),
+        'exp_date': _exp_dates(e[first]),
+        'strike_price': k[first].tolist(),
+        'ticks': (last - first + 1).tolist()
+    }
+    for name in ('call', 'put'):
+        side = getattr(chain, name)
+        mark = mark_price(side)[order]
+        with np.errstate(invalid='ignore'):
+            columns[f'{name}_open'] = _nullable(mark[first], 4)
+            columns[f'{name}_high'] = _nullable(np.fmax.reduceat(mark, first), 4)
+            columns[f'{name}_low'] = _nullable(np.fmin.reduceat(mark, first), 4)
+        columns[f'{name}_close'] = _nullable(mark[last], 4)
+        columns[f'{name}_iv'] = _nullable(side.iv[order][last])
+        columns[f'{name}_delta'] = _nullable(side.delta[order][last])
+
+    names = list(columns)
+    return [dict(zip(names, values)) for values in zip(*columns.values())]
+
+
+def vertical_credit_grid(keys, side, widths, direction):
+    """
+    Credits of short verticals for every row x width, as (widths x rows)
+    arrays.
+
+    keys: sorted float keys locating each row's strike (the strike itself
+        for one expiration, or tick * STRIKE_KEY_SCALE + strike across
+        ticks); the long leg is at key + direction * width.
+    side: SideColumns of the rows (calls with direction 1, puts with -1).
+
+    Returns (credit, long_rows, valid). Valid entries have both legs
+    quoted, a positive credit and a short-leg delta strictly inside (0, 1).
+    """
+    widths = np.asarray(widths, dtype=np.float64)
+    target = keys[None, :] + direction * widths[:, None]
+    long_rows = np.minimum(np.searchsorted(keys, target), max(len(keys) - 1, 0))
+    abs_delta = np.abs(side.delta)
+    with np.errstate(invalid='ignore'):
+        long_ask = side.ask[long_rows]
+        credit = side.bid[None, :] - long_ask
+        valid = (
+            (keys[long_rows] == target) & (side.bid > 0)[None, :] & (long_ask > 0) &
+            (credit > 0) & ((abs_delta > 0) & (abs_delta < 1))[None, :]
+        )
+    return credit, long_rows, valid
+
+
+def delta_buckets(abs_delta, bucket_size):
+    """Index of the delta bucket each |delta| falls in (bucket value = index * bucket_size)"""
+    return np.floor(abs_delta / bucket_size + 1e-9).astype(np.int64)
+
+
+def grouped_credit_stats(group_columns, values):
+    """
+    Average, high and low of `values` per distinct row of `group_columns`.
+
+    Returns (groups, avg, high, low) with one row per group.
+    """
+    groups, inverse = np.unique(np.column_stack(group_columns), axis=0, return_inverse=True)
+    inverse = inverse.ravel()
+    count = np.bincount(inverse, minlength=len(groups))
+    avg = np.bincount(inverse, weights=values, minlength=len(groups)) / count
+    high = np.full(len(groups), -np.inf)
+    low = np.full(len(groups), np.inf)
+    np.maximum.at(high, inverse, values)
+    np.minimum.at(low, inverse, values)
+    return groups, avg, high, low
+
+
+def spread_stats(chain, widths=(5, 10, 15, 20, 25), bucket_size=0.05):
+    """
+    Credit statistics of short verticals per (minute, option_type,
+    delta_bucket, point_spread), as spread_data records.
+
+    Every strike of the front expiration at every tick is a candidate
+    short leg; the long leg is `width` points further out of the money
+    (higher for calls, lower for puts). Credit is short bid minus long
+    ask; only positive credits with both legs quoted count. All ticks,
+    strikes and widths are evaluated as one (widths x rows) grid.
+    """
+    if not len(chain):
+        return []
+
+    exp = chain.exp_date.astype(np.int64)
+    order = np.lexsort((chain.strike, exp, chain.timestamp))
+    ts, exp = chain.timestamp[order], exp[order]
+
+    # Keep the front expiration of each tick (the first row after sorting)
+    new_tick = np.ones(len(order), dtype=bool)
+    new_tick[1:] = ts[1:] != ts[:-1]
+    tick = np.cumsum(new_tick) - 1
+    front = exp[np.flatnonzero(new_tick)][tick]
+    keep = exp == front
+    order, tick = order[keep], tick[keep]
+
+    minute = chain.timestamp[order] // US_PER_MINUTE
+    keys = tick * STRIKE_KEY_SCALE + chain.strike[order]
+    widths = np.asarray(widths, dtype=np.float64)
+
+    records = []
+    for name, direction in (('call', 1), ('put', -1)):
+        side = getattr(chain, name).take(order)
+        credit, _, valid = vertical_credit_grid(keys, side, widths, direction)
+        if not valid.any():
+            continue
+
+        width_index, row = np.nonzero(valid)
+        bucket = delta_buckets(np.abs(side.delta[row]), bucket_size)
+        groups, avg, high, low = grouped_credit_stats(
+            [minute[row], bucket, width_index], credit[width_index, row]
+        )
+
+        for minute_at, delta_bucket, point_spread, a, h, l in zip(
+            _minute_datetime(groups[:, 0]),
+            np.round(groups[:, 1] * bucket_size, 2).tolist(),
+            widths[groups[:, 2]].astype(int).tolist(),
+            np.round(avg, 4).tolist(), np.round(high, 4).tolist(), np.round(low, 4).tolist()
+        ):
+            records.append({
+                'timestamp': minute_at,
+                'option_type': name,
+                'delta_bucket': delta_bucket,
+                'point_spread': point_spread,
+                'avg_credit': a,
+                'high_credit': h,
+                'low_credit': l
+            })
+    return records
+
+
+def _floor_minute(ts):
+    return ts.replace(second=0, microsecond=0)
+
+
+class RollupJob:
+    """
+    Incrementally rolls completed minutes of spx_0dte_stream up into
+    spx_0dte_bars_1m and spread_data.
+
+    A minute is complete once the stream has a row in a later minute. The
+    watermark (the first minute not rolled up yet) is re-read from the
+    newest bar on every run, so the job resumes where any worker stopped.
+    A run rolls up everything complete, committing every `max_minutes`
+    minutes, so a backfill after a long gap catches up in one run.
+
+    Rows committed late for a minute that was already rolled up are picked
+    up by re-rolling the last `revise_minutes` rolled-up minutes on every
+    run: their bars and spread rows are deleted and rebuilt in the same
+    transaction.
+
+    Only one worker rolls up at a time: on PostgreSQL each transaction
+    takes a transaction-level advisory lock and a worker that cannot get
+    it skips the run. Other databases serialize the writes themselves.
+
+    Has a name, refresh_interval and run_cycle() like an analyzer, so the
+    background scheduler runs it on its own thread.
+    """
+
+    name = 'rollup'
+    # pg_try_advisory_xact_lock key held while a worker rolls up
+    lock_key = 0x5350_5852
+
+    def __init__(self, model=SPXOptionStream, refresh_interval=60, widths=(5, 10, 15, 20, 25),
+                 delta_bucket=0.05, max_minutes=60, revise_minutes=5):
+        self.model = model
+        self.refresh_interval = refresh_interval
+        self.widths = tuple(widths)
+        self.delta_bucket = delta_bucket
+        self.max_minutes = max_minutes
+        self.revise_minutes = revise_minutes
+        self.watermark = None
+        self.scheduled = False
+        self.last_run = None
+        self.stats = {'minutes': 0, 'rows': 0, 'bars': 0, 'spread_rows': 0, 'skipped': 0, 'last_duration': None}
+
+    def _try_lock(self, session):
+        if session.get_bind().dialect.name != 'postgresql':
+            return True
+        return session.scalar(db.select(db.func.pg_try_advisory_xact_lock(self.lock_key)))
+
+    def run_cycle(self, session=None):
+        """Roll up every completed minute; returns how many new minutes were written"""
+        session = session or db.session
+        started = time.perf_counter()
+        total = 0
+        while True:
+            minutes = self._roll_up(session, revise=total == 0)
+            if minutes is None:
+                self.stats['skipped'] += 1
+                break
+            total += minutes
+            if minutes < self.max_minutes:
+                break
+
+        self.last_run = datetime.now()
+        self.stats['last_duration'] = round(time.perf_counter() - started, 4)
+        return total
+
+    def _roll_up(self, session, revise=True):
+        """
+        Roll up at most max_minutes new minutes in one transaction, plus
+        (if `revise`) the revision window before them. Returns the new
+        minutes written, or None if another worker holds the lock.
+        """
+        try:
+            if not self._try_lock(session):
+                session.rollback()
+                return None
+            newest_bar = session.scalar(db.select(db.func.max(OptionBar.minute)))
+            if newest_bar is not None:
+                start = newest_bar + timedelta(minutes=1)
+                revise_from = start - timedelta(minutes=self.revise_minutes if revise else 0)
+            else:
+                oldest = session.scalar(db.select(db.func.min(self.model.timestamp)))
+                if oldest is None:
+                    session.rollback()
+                    return 0
+                start = revise_from = _floor_minute(oldest)
+
+            # Skip stretches without rows (nights, feed outages)
+            first = session.scalar(db.select(db.func.min(self.model.timestamp)).where(self.model.timestamp >= start))
+            if first is not None:
+                start = max(start, _floor_minute(first))
+            newest = session.scalar(
+                db.select(db.func.max(self.model.timestamp)).where(self.model.timestamp >= start)
+            )
+            end = start if newest is None else min(_floor_minute(newest), start + timedelta(minutes=self.max_minutes))
+            if end <= revise_from:
+                session.rollback()
+                return 0
+
+            rows = session.execute(
+                db.select(*chain_columns(self.model))
+                .where(self.model.timestamp >= revise_from, self.model.timestamp < end)
+            ).all()
+            chain = ChainSnapshot.from_rows(rows)
+            bars = minute_bars(chain)
+            spreads = spread_stats(chain, self.widths, self.delta_bucket)
+            session.execute(db.delete(OptionBar).where(OptionBar.minute >= revise_from, OptionBar.minute < end))
+            session.execute(db.delete(SpreadData).where(SpreadData.timestamp >= revise_from, SpreadData.timestamp < end))
+            if bars:
+                session.execute(db.insert(OptionBar), bars)
+            if spreads:
+                session.execute(db.insert(SpreadData), spreads)
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+
+        minutes = int((end - start).total_seconds() // 60)
+        self.watermark = end
+        self.stats['minutes'] += minutes
+        self.stats['rows'] += len(rows)
+        self.stats['bars'] += len(bars)
+        self.stats['spread_rows'] += len(spreads)
+        if minutes:
+            logger.info(f"Rolled up {minutes} minutes ({len(rows)} rows) into {len(bars)} bars and {len(spreads)} spread rows")
+        return minutes
+
+
+def init_rollup(app):
+    """Register the rollup job for the scheduler if ROLLUP_ENABLED is set"""
+    app.jobs = getattr(app, 'jobs', {})
+    if not app.config.get('ROLLUP_ENABLED', True):
+        return None
+    job = RollupJob(
+        refresh_interval=app.config.get('ROLLUP_INTERVAL', 60),
+        widths=app.config.get('ROLLUP_SPREAD_WIDTHS', (5, 10, 15, 20, 25)),
+        delta_bucket=app.config.get('ROLLUP_DELTA_BUCKET', 0.05),
+        max_minutes=app.config.get('ROLLUP_MAX_MINUTES', 60),
+        revise_minutes=app.config.get('ROLLUP_REVISE_MINUTES', 5)
+    )
+    app.jobs[job.name] = job
+    return job
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--max-minutes', type=int, default=240, help="Minutes rolled up per transaction")
+    args = parser.parse_args()
+
+    from flaskdashboard import create_app
+    from analyzers.schema import ensure_schema
+
+    app = create_app()
+    job = RollupJob(max_minutes=args.max_minutes)
+    with app.app_context():
+        ensure_schema(db.engine)
+        job.run_cycle()
+    print(job.stats)
+
+
+if __name__ == '__main__':
+    main()
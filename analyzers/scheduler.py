@@ -0,0 +1,213 @@
+import logging
+import socket
+from collections import ChainMap
+import threading
+import time
+from models import db, SPXOptionLatest
+from analyzers.ingest import chain_loader
+from analyzers.positions import position_book
+from analyzers.schema import ensure_schema
+
+logger = logging.getLogger("analyzer.scheduler")
+
+
+class AnalyzerScheduler:
+    """
+    Runs every analyzer on its own refresh_interval in a background thread.
+
+    Each cycle runs `analyzer.run_cycle()` inside a fresh app context, so
+    the database session is released between cycles. Routes then only read
+    the last published result instead of fetching and scoring inside the
+    request.
+
+    Per-analyzer stats:
+        runs            completed cycles
+        errors          cycles that raised
+        overruns        cycles that took longer than refresh_interval
+        skipped_cycles  scheduled cycles that were dropped because the
+                        previous one was still running
+    """
+
+    def __init__(self, app, analyzers=None):
+        self.app = app
+        self.analyzers = analyzers if analyzers is not None else app.analyzers
+        self.stats = {}
+        self._threads = {}
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Start one worker thread per analyzer"""
+        self._stop.clear()
+        for name in list(self.analyzers.keys()):
+            if name in self._threads and self._threads[name].is_alive():
+                continue
+            analyzer = self.analyzers[name]
+            analyzer.scheduled = True
+            self.stats[name] = {
+                'refresh_interval': analyzer.refresh_interval,
+                'runs': 0,
+                'errors': 0,
+                'overruns': 0,
+                'skipped_cycles': 0,
+                'last_duration': None,
+                'last_run': None
+            }
+            thread = threading.Thread(
+                target=self._run, args=(name, analyzer),
+                name=f"analyzer-{name}", daemon=True
+            )
+            self._threads[name] = thread
+            thread.start()
+        logger.info(f"Scheduler started for {len(self._threads)} analyzers")
+
+    def stop(self, timeout=5):
+        """Signal all workers to stop and wait for them"""
+        self._stop.set()
+        for name, thread in self._threads.items():
+            thread.join(timeout)
+            self.analyzers[name].scheduled = False
+        self._threads.clear()
+
+    def _run(self, name, analyzer):
+        interval = analyzer.refresh_interval
+        stats = self.stats[name]
+        next_run = time.monotonic()
+
+        while not self._stop.is_set():
+            started = time.monotonic()
+            try:
+                with self.app.app_context():
+                    analyzer.run_cycle()
+                with self._lock:
+                    stats['runs'] += 1
+            except Exception as e:
+                with self._lock:
+                    stats['errors'] += 1
+                logger.error(f"Analyzer {name} cycle failed: {str(e)}")
+
+            finished = time.monotonic()
+            duration = finished - started
+            next_run += interval
+            with self._lock:
+                stats['last_duration'] = round(duration, 4)
+                stats['last_run'] = time.time()
+                if duration > interval:
+                    stats['overruns'] += 1
+                # Drop the cycles we missed instead of running them back to back
+                if finished > next_run:
+                    missed = int((finished - next_run) // interval) + 1
+                    stats['skipped_cycles'] += missed
+                    next_run += missed * interval
+            if duration > interval:
+                logger.warning(f"Analyzer {name} overran its {interval}s interval ({duration:.2f}s)")
+
+            self._stop.wait(max(0.0, next_run - time.monotonic()))
+
+    def status(self):
+        """Copy of the per-analyzer stats plus whether each worker is alive"""
+        with self._lock:
+            return {
+                name: dict(stats, alive=self._threads.get(name) is not None and self._threads[name].is_alive())
+                for name, stats in self.stats.items()
+            }
+
+
+def init_scheduler(app):
+    """
+    Start the background scheduler if SCHEDULER_ENABLED is set.
+
+    Background jobs registered in app.jobs (e.g. the rollup) run next to
+    the analyzers.
+    """
+    app.scheduler = None
+    if not app.config.get('SCHEDULER_ENABLED', False):
+        return None
+    app.scheduler = AnalyzerScheduler(app, ChainMap(getattr(app, 'jobs', {}), app.analyzers))
+    app.scheduler.start()
+    return app.scheduler
+
+
+_warm_up_lock = threading.Lock()
+
+
+def warm_up(app):
+    """
+    Bring the schema up to date, load open positions, construct every
+    analyzer and publish its first result.
+
+    With the scheduler enabled this just starts it (each worker runs its
+    first cycle immediately); otherwise one cycle is run here. Runs once
+    per app; later calls return straight away.
+    """
+    with _warm_up_lock:
+        if app.startup_timings.get('warm_up_started'):
+            return
+        app.startup_timings['warm_up_started'] = time.time()
+
+    started = time.perf_counter()
+    with app.app_context():
+        try:
+            if ensure_schema(db.engine)['latest_chain']:
+                chain_loader.use_model(SPXOptionLatest)
+        except Exception as e:
+            logger.error(f"Schema bootstrap failed: {str(e)}")
+        try:
+            position_book.load()
+        except Exception as e:
+            logger.error(f"Failed to load open positions: {str(e)}")
+
+    for name in app.analyzers:
+        try:
+            app.analyzers[name]
+        except Exception as e:
+            logger.error(f"Failed to construct analyzer {name}: {str(e)}")
+
+    if init_scheduler(app) is None:
+        with app.app_context():
+            for name, analyzer in app.analyzers.loaded().items():
+                try:
+                    analyzer.run_cycle()
+                except Exception as e:
+                    logger.error(f"Warm-up cycle for {name} failed: {str(e)}")
+
+    app.startup_timings['warm_up'] = round(time.perf_counter() - started, 4)
+    logger.info(f"Analyzers warmed up in {app.startup_timings['warm_up']:.3f}s")
+
+
+def _wait_for_port(host, port, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection((host, port), timeout=1):
+                return True
+        except OSError:
+            time.sleep(0.1)
+    return False
+
+
+def start_warm_up(app, host='127.0.0.1', port=None, timeout=30):
+    """
+    Warm up in a background thread.
+
+    If `port` is given the thread first waits until the server accepts
+    connections there, so warm-up never delays the server coming up.
+    """
+    def run():
+        if port is not None and not _wait_for_port(host, port, timeout):
+            logger.warning(f"Server not listening on {host}:{port} after {timeout}s, warming up anyway")
+        warm_up(app)
+
+    thread = threading.Thread(target=run, name="analyzer-warm-up", daemon=True)
+    thread.start()
+    return thread
+
+
+def init_warm_up(app):
+    """Warm up in the background when the first request arrives"""
+    app.scheduler = None
+
+    @app.before_request
+    def _warm_up_on_first_request():
+        if not app.startup_timings.get('warm_up_started'):
+            start_warm_up(app)
@@ -0,0 +1,229 @@
+"""
+Schema bootstrap for the tables the analyzers read and write.
+
+Creates missing tables and the indexes declared on the models, and keeps
+spx_0dte_latest (the newest quote per exp_date and strike_price) current
+with a trigger on spx_0dte_stream, so the chain loader reads one row per
+strike instead of the whole history. Everything is idempotent and safe to
+run on every start. PostgreSQL is the production target; SQLite works as
+a local stand-in.
+
+Usage:
+    python -m analyzers.schema
+    python -m analyzers.schema --rebuild-latest
+"""
+import argparse
+import logging
+import sqlalchemy as sa
+from models import db, OptionBar, Position, SPXAnalysis, SPXOptionLatest, SPXOptionStream, SpreadData
+
+logger = logging.getLogger("analyzer.schema")
+
+# Columns the position book added to the original positions table
+BOOK_COLUMNS = ('position_uuid', 'status', 'exit_time', 'exit_price', 'exp_date', 'legs')
+
+LATEST_TRIGGER = 'spx_0dte_latest_upsert'
+
+
+def ensure_position_schema(engine):
+    """Create the positions table, or add the position book columns and indexes to it"""
+    inspector = sa.inspect(engine)
+    table = Position.__table__
+    if not inspector.has_table(table.name):
+        table.create(engine)
+        return
+
+    existing = {c['name'] for c in inspector.get_columns(table.name)}
+    with engine.begin() as conn:
+        for name in BOOK_COLUMNS:
+            if name not in existing:
+                column_type = table.c[name].type.compile(dialect=engine.dialect)
+                conn.execute(sa.text(f"ALTER TABLE {table.name} ADD COLUMN {name} {column_type}"))
+                logger.info(f"Added column {table.name}.{name}")
+    for index in table.indexes:
+        index.create(engine, checkfirst=True)
+
+
+def ensure_indexes(engine, models=(SPXOptionStream, SPXOptionLatest, SPXAnalysis, OptionBar, SpreadData)):
+    """Create missing tables and every index declared on them"""
+    for model in models:
+        table = model.__table__
+        table.create(engine, checkfirst=True)
+        for index in table.indexes:
+            index.create(engine, checkfirst=True)
+
+
+def _quote_columns():
+    return [c.name for c in SPXOptionLatest.__table__.columns]
+
+
+def _postgresql_trigger_ddl():
+    columns = _quote_columns()
+    names = ', '.join(columns)
+    updates = ', '.join(f"{c} = EXCLUDED.{c}" for c in columns if c not in ('exp_date', 'strike_price'))
+    latest = SPXOptionLatest.__tablename__
+    stream = SPXOptionStream.__tablename__
+    # Statement-level triggers see a whole chain insert as one transition
+    # table; DISTINCT ON keeps one row per key so the upsert touches each
+    # latest row at most once.
+    function = f"""
+        CREATE OR REPLACE FUNCTION {LATEST_TRIGGER}() RETURNS trigger AS $$
+        BEGIN
+            INSERT INTO {latest} ({names})
+            SELECT DISTINCT ON (exp_date, strike_price) {names}
+            FROM new_rows
+            ORDER BY exp_date, strike_price, timestamp DESC
+            ON CONFLICT (exp_date, strike_price) DO UPDATE SET {updates}
+            WHERE {latest}.timestamp IS NULL OR {latest}.timestamp <= EXCLUDED.timestamp;
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+    """
+    # Transition tables allow one event per trigger
+    triggers = [
+        f"""
+        CREATE TRIGGER {LATEST_TRIGGER}_{event.lower()}
+        AFTER {event} ON {stream}
+        REFERENCING NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION {LATEST_TRIGGER}()
+        """
+        for event in ('INSERT', 'UPDATE')
+    ]
+    return function, triggers
+
+
+def _sqlite_trigger_ddl():
+    columns = _quote_columns()
+    names = ', '.join(columns)
+    values = ', '.join(f"NEW.{c}" for c in columns)
+    updates = ', '.join(f"{c} = excluded.{c}" for c in columns if c not in ('exp_date', 'strike_price'))
+    latest = SPXOptionLatest.__tablename__
+    stream = SPXOptionStream.__tablename__
+    return [
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {LATEST_TRIGGER}_{event.lower()}
+        AFTER {event} ON {stream}
+        BEGIN
+            INSERT INTO {latest} ({names}) VALUES ({values})
+            ON CONFLICT (exp_date, strike_price) DO UPDATE SET {updates}
+            WHERE {latest}.timestamp IS NULL OR {latest}.timestamp <= excluded.timestamp;
+        END
+        """
+        for event in ('INSERT', 'UPDATE')
+    ]
+
+
+def latest_trigger_installed(engine):
+    """Whether the spx_0dte_latest triggers exist on spx_0dte_stream"""
+    dialect = engine.dialect.name
+    with engine.connect() as conn:
+        if dialect == 'postgresql':
+            query = "SELECT count(*) FROM pg_trigger WHERE tgname LIKE :name AND NOT tgisinternal"
+        elif dialect == 'sqlite':
+            query = "SELECT count(*) FROM sqlite_master WHERE type = 'trigger' AND name LIKE :name"
+        else:
+            return False
+        return conn.execute(sa.text(query), {'name': f"{LATEST_TRIGGER}_%"}).scalar() >= 2
+
+
+def _has_rows(engine, table):
+    with engine.connect() as conn:
+        return conn.execute(sa.select(sa.literal(1)).select_from(table).limit(1)).first() is not None
+
+
+def install_latest_trigger(engine):
+    """
+    Install the trigger that upserts spx_0dte_stream writes into
+    spx_0dte_latest. Returns False on databases without support.
+    """
+    dialect = engine.dialect.name
+    if dialect in ('postgresql', 'sqlite') and latest_trigger_installed(engine):
+        return True
+    with engine.begin() as conn:
+        if dialect == 'postgresql':
+            function, triggers = _postgresql_trigger_ddl()
+            conn.execute(sa.text(function))
+            for event in ('insert', 'update'):
+                conn.execute(sa.text(
+                    f"DROP TRIGGER IF EXISTS {LATEST_TRIGGER}_{event} ON {SPXOptionStream.__tablename__}"
+                ))
+            for ddl in triggers:
+                conn.execute(sa.text(ddl))
+        elif dialect == 'sqlite':
+            for ddl in _sqlite_trigger_ddl():
+                conn.execute(sa.text(ddl))
+        else:
+            logger.warning(f"No {LATEST_TRIGGER} trigger for {dialect}; the loader reads {SPXOptionStream.__tablename__}")
+            return False
+    return True
+
+
+def rebuild_latest(engine):
+    """Refill spx_0dte_latest from the newest row per key in spx_0dte_stream"""
+    stream = SPXOptionStream.__table__
+    latest = SPXOptionLatest.__table__
+    newest = (
+        sa.select(stream.c.exp_date, stream.c.strike_price, sa.func.max(stream.c.timestamp).label('timestamp'))
+        .group_by(stream.c.exp_date, stream.c.strike_price)
+        .subquery()
+    )
+    columns = _quote_columns()
+    select = sa.select(*[stream.c[c] for c in columns]).join(
+        newest,
+        (stream.c.exp_date == newest.c.exp_date) &
+        (stream.c.strike_price == newest.c.strike_price) &
+        (stream.c.timestamp == newest.c.timestamp)
+    )
+    with engine.begin() as conn:
+        conn.execute(sa.delete(latest))
+        count = conn.execute(sa.insert(latest).from_select(columns, select)).rowcount
+    logger.info(f"Rebuilt {latest.name} with {count} quotes")
+    return count
+
+
+def ensure_schema(engine):
+    """
+    Bring the schema up to date.
+
+    spx_0dte_latest is backfilled from spx_0dte_stream whenever the
+    trigger is newly installed (rows written before it existed were never
+    copied), or when it is empty while spx_0dte_stream has rows. Once the
+    trigger exists the table stays current.
+
+    Returns {'latest_chain': bool}: whether spx_0dte_latest is maintained
+    and can be read instead of spx_0dte_stream.
+    """
+    ensure_indexes(engine)
+    ensure_position_schema(engine)
+    try:
+        had_trigger = latest_trigger_installed(engine)
+        latest_chain = install_latest_trigger(engine)
+    except Exception as e:
+        logger.error(f"Failed to install the {LATEST_TRIGGER} trigger: {str(e)}")
+        latest_chain = False
+
+    if latest_chain:
+        stale = not had_trigger or (
+            not _has_rows(engine, SPXOptionLatest.__table__) and _has_rows(engine, SPXOptionStream.__table__)
+        )
+        if stale:
+            rebuild_latest(engine)
+    return {'latest_chain': latest_chain}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rebuild-latest', action='store_true', help="Refill spx_0dte_latest from spx_0dte_stream")
+    args = parser.parse_args()
+
+    from flaskdashboard import create_app
+
+    app = create_app()
+    with app.app_context():
+        print(ensure_schema(db.engine))
+        if args.rebuild_latest:
+            rebuild_latest(db.engine)
+
+
+if __name__ == '__main__':
+    main()
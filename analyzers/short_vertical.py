@@ -1,9 +1,12 @@
 import json
 import logging
-import uuid
 from datetime import datetime
+import numpy as np
 import pytz
 from analyzers.base import BaseAnalyzer
+from analyzers.chain import ChainSnapshot, json_float
+from analyzers.positions import position_book
+from analyzers.risk import risk_engine
 
 # Configure logging
 logging.basicConfig(
@@ -16,6 +19,10 @@ logging.basicConfig(
 logger = logging.getLogger("SPX_0DTE_ShortVertical_Analyzer")
 
 class ShortverticalAnalyzer(BaseAnalyzer):
+    name = "short_vertical"
+    description = "SPX 0DTE Short Vertical Analyzer"
+    delta_collections = {'current_positions': ('id',)}
+    
     # Strategy Parameters
     STRATEGY_PARAMS = {
         'aggressive': {
@@ -46,16 +53,18 @@ class ShortverticalAnalyzer(BaseAnalyzer):
 
     def __init__(self, options_type='call'):
         super().__init__()  # Call the constructor of BaseAnalyzer
+        # Shared book and risk engine; a replay swaps in its own
+        self.position_book = position_book
+        self.risk_engine = risk_engine
         self.current_analysis = {
             'timestamp': None,
             'spx_price': None,
-            'options_chain': None,
-            'trade_opportunities': {
-                'aggressive': None,
-                'moderate': None,
-                'conservative': None
-            },
-            'current_positions': [],
+            # Best short call vertical per profile, as before puts were added
+            'trade_opportunities': dict.fromkeys(self.STRATEGY_PARAMS),
+            # Best short put vertical per profile
+            'put_trade_opportunities': dict.fromkeys(self.STRATEGY_PARAMS),
+            'current_positions': self.position_book.positions(self.name),
+            'position_risk': None,
             'recommendations': {
                 'entries': [],
                 'exits': [],
@@ -63,114 +72,163 @@ class ShortverticalAnalyzer(BaseAnalyzer):
             }
         }
         self.options_type = options_type
-        initial_data = self.get_latest_results()  # Use the inherited method
-        if initial_data:
-            self.process_data_callback(initial_data)
-            logger.info("Initial data processed successfully")
-        else:
-            logger.warning("No initial data available")
+        # (market data, snapshot version, results) of the last two-sided search
+        self._verticals = None
 
 
-    def find_short_call_vertical_opportunities(self, data, strategy_type):
+    def find_vertical_opportunities(self, data):
         """
-        Find short call vertical spread opportunities based on strategy type.
-        Returns the best opportunity (highest premium) within the specified parameters.
+        Find the best short vertical for every strategy profile, for both
+        call and put verticals, in one pass.
+        
+        The front expiration is sorted and strike-indexed once. For each side
+        the long legs of every profile are found with one strike lookup and
+        all candidate premiums are evaluated as a (profiles x strikes) grid.
+        The best opportunity per profile is the one with the highest premium.
+        
+        Returns:
+            {'call': {profile: trade or None}, 'put': {profile: trade or None}}
         """
+        profiles = list(self.STRATEGY_PARAMS)
+        results = {side: dict.fromkeys(profiles) for side in ('call', 'put')}
         if not data or 'spx_price' not in data:
             logger.error("Invalid data received")
-            return None
+            return results
 
         spx_price = data['spx_price']
-        calls = sorted(data.get('calls', []), key=lambda x: x['strike'])
-        
-        params = self.STRATEGY_PARAMS[strategy_type]
-        opportunities = []
+        chain = ChainSnapshot.from_market_data(data).expiry()
         
-        # Filter call options by delta range for short leg
-        short_call_candidates = [
-            c for c in calls 
-            if c.get('delta') and params['delta_range']['min'] <= abs(c['delta']) <= params['delta_range']['max']
-        ]
+        params = [self.STRATEGY_PARAMS[p] for p in profiles]
+        delta_min = np.array([p['delta_range']['min'] for p in params])[:, None]
+        delta_max = np.array([p['delta_range']['max'] for p in params])[:, None]
+        widths = np.array([p['wing_width'] for p in params], dtype=np.float64)[:, None]
+        min_premium = np.array([p['min_premium'] for p in params])[:, None]
+        timestamp = datetime.now().isoformat()
+        exp_date = str(chain.exp_date) if chain.exp_date is not None else None
         
-        for short_call in short_call_candidates:
-            # Calculate long call strike
-            long_call_strike = short_call['strike'] + params['wing_width']
-            
-            # Find matching long call
-            long_call = next((c for c in calls if c['strike'] == long_call_strike), None)
+        # Call verticals sell the lower strike and buy the higher one; put
+        # verticals sell the higher strike. Puts are scanned from the top
+        # strike down so ties resolve to the strike nearest the money.
+        for side, direction in (('call', 1), ('put', -1)):
+            columns = chain.side(side)
+            rows = np.arange(len(chain)) if direction > 0 else np.arange(len(chain))[::-1]
+            abs_delta = np.abs(columns.delta[rows])[None, :]
             
-            if not long_call:
-                continue
-
-            # Calculate trade metrics
-            premium = short_call['bid'] - long_call['ask']
-            max_loss = params['wing_width'] - premium
+            long_rows = chain.index_of(chain.strike[rows][None, :] + direction * widths)
+            with np.errstate(invalid='ignore'):
+                premium = np.where(
+                    long_rows >= 0,
+                    columns.bid[rows][None, :] - columns.ask[long_rows],
+                    np.nan
+                )
+                max_loss = widths - premium
+                eligible = (
+                    (abs_delta > 0) & (abs_delta >= delta_min) & (abs_delta <= delta_max) &
+                    (premium >= min_premium) & (max_loss > 0)
+                )
+            ranked = np.where(eligible, np.round(premium, 2), -np.inf)
+            best = np.argmax(ranked, axis=1)
             
-            if premium >= params['min_premium']:
-                # Create trade structure
-                trade = {
-                    'strategy_type': strategy_type,
+            for i, profile in enumerate(profiles):
+                if not eligible[i, best[i]]:
+                    continue
+                short_row = rows[best[i]]
+                long_row = long_rows[i, best[i]]
+                trade_premium = float(premium[i, best[i]])
+                trade_loss = float(max_loss[i, best[i]])
+                results[side][profile] = {
+                    'strategy_type': profile,
+                    'option_type': side,
                     'spx_price': spx_price,
-                    'short_call': short_call['strike'],
-                    'long_call': long_call['strike'],
-                    'premium': round(premium, 2),
-                    'max_loss': round(max_loss, 2),
-                    'reward_to_risk': round(premium / max_loss, 2),
-                    'short_call_delta': short_call.get('delta', 0),
-                    'long_call_delta': long_call.get('delta', 0),
-                    'call_volume': short_call.get('volume', 0),
-                    'call_iv': short_call.get('volatility', 0),
-                    'gamma': short_call.get('gamma', 0),
-                    'theta': short_call.get('theta', 0),
-                    'timestamp': datetime.now().isoformat()
+                    'exp_date': exp_date,
+                    f'short_{side}': float(chain.strike[short_row]),
+                    f'long_{side}': float(chain.strike[long_row]),
+                    'premium': round(trade_premium, 2),
+                    'max_loss': round(trade_loss, 2),
+                    'reward_to_risk': round(trade_premium / trade_loss, 2),
+                    f'short_{side}_delta': json_float(columns.delta[short_row]),
+                    f'long_{side}_delta': json_float(columns.delta[long_row]),
+                    # The feed has no volume column
+                    f'{side}_volume': 0,
+                    f'{side}_iv': json_float(columns.iv[short_row]),
+                    'gamma': json_float(columns.gamma[short_row]),
+                    'theta': json_float(columns.theta[short_row]),
+                    'timestamp': timestamp
                 }
-                opportunities.append(trade)
         
-        # Sort by premium and return the best one
-        if opportunities:
-            return sorted(opportunities, key=lambda x: -x['premium'])[0]
-        return None
+        return results
+
+    def vertical_opportunities(self, data):
+        """
+        find_vertical_opportunities() for a payload, run once per snapshot:
+        later calls with the same payload and snapshot version reuse it.
+        """
+        cached = self._verticals
+        if cached is not None and cached[0] is data and cached[1] == data.get('snapshot_version'):
+            return cached[2]
+        results = self.find_vertical_opportunities(data)
+        if data:
+            self._verticals = (data, data.get('snapshot_version'), results)
+        return results
+
+    def find_short_call_vertical_opportunities(self, data, strategy_type):
+        """
+        Find short call vertical spread opportunities based on strategy type.
+        Returns the best opportunity (highest premium) within the specified parameters.
+        """
+        return self.vertical_opportunities(data)['call'][strategy_type]
+
+    def find_short_put_vertical_opportunities(self, data, strategy_type):
+        """
+        Find short put vertical spread opportunities based on strategy type.
+        Returns the best opportunity (highest premium) within the specified parameters.
+        """
+        return self.vertical_opportunities(data)['put'][strategy_type]
 
     def process_data_callback(self, data):
         """
         Callback function to process new data from the streamer.
-        Updates the global analysis state.
+        
+        Builds a new analysis dict and swaps it in as current_analysis in
+        one assignment, so readers never see a half-updated analysis and
+        dicts that were already published are never modified.
         """
         logger.info("Received data from streamer")
         if not data:
             logger.warning("No data received in callback")
             return
+        self._sync_positions()
+        if not self.is_new_snapshot(data):
+            logger.info("Snapshot unchanged since last analysis, skipping")
+            return
             
-        # Debug: Check data structure
-        logger.info(f"Data keys: {data.keys()}")
-        logger.info(f"SPX price: {data.get('spx_price')}")
-        calls_count = len(data.get('calls', []))
-        puts_count = len(data.get('puts', []))
-        logger.info(f"Calls count: {calls_count}, Puts count: {puts_count}")
-        
-        if calls_count > 0:
-            sample_call = data['calls'][0]
-            logger.info(f"Sample call: {sample_call}")
-        
         try:
             # Update current analysis
             # Time now in Chicago    
             chicago_tz = pytz.timezone('America/Chicago')
             chicago_now = datetime.now(chicago_tz)
             
-            self.current_analysis['timestamp'] = chicago_now.isoformat()
-            self.current_analysis['spx_price'] = data['spx_price']
-            self.current_analysis['options_chain'] = data
+            # Find opportunities for every strategy type and side at once
+            opportunities = self.vertical_opportunities(data)
             
-            # Find opportunities for each strategy type
-            for strategy_type in ['aggressive', 'moderate', 'conservative']:
-                opportunity = self.find_short_call_vertical_opportunities(data, strategy_type)
-                self.current_analysis['trade_opportunities'][strategy_type] = opportunity
-                
-                if opportunity:
-                    logger.info(f"{strategy_type.capitalize()} opportunity found: {opportunity}")
-                else:
-                    logger.info(f"No {strategy_type} opportunities found")
+            for side, by_profile in opportunities.items():
+                for strategy_type, opportunity in by_profile.items():
+                    if opportunity:
+                        logger.info(f"{strategy_type.capitalize()} {side} opportunity found: {opportunity}")
+                    else:
+                        logger.info(f"No {strategy_type} {side} opportunities found")
+            
+            self.current_analysis = dict(
+                self.current_analysis,
+                timestamp=chicago_now.isoformat(),
+                spx_price=data['spx_price'],
+                trade_opportunities=opportunities['call'],
+                put_trade_opportunities=opportunities['put'],
+                # Mark this strategy's open positions to the new chain
+                position_risk=self.risk_engine.mark(data, self.name)
+            )
+            
+            self.snapshot_version = data.get('snapshot_version')
             
             # Save analysis to database
             # save_analysis(self.current_analysis)
@@ -182,27 +240,55 @@ class ShortverticalAnalyzer(BaseAnalyzer):
         except Exception as e:
             logger.error(f"Error processing data: {e}")
             
-    def get_analyzer_status(self):
-        """Return the current status of the analyzer."""
-        return {
+    def get_analyzer_status(self, results=None):
+        """Return the status of the analyzer for a published result (default: the last one)."""
+        results = results or self.published[1] or {}
+        calls = results.get('trade_opportunities') or {}
+        puts = results.get('put_trade_opportunities') or {}
+        status = {
             'status': 'running',
-            'last_analysis': self.current_analysis['timestamp'],
-            'spx_price': self.current_analysis['spx_price'],
-            'aggressive_found': 1 if self.current_analysis['trade_opportunities']['aggressive'] else 0,
-            'moderate_found': 1 if self.current_analysis['trade_opportunities']['moderate'] else 0,
-            'conservative_found': 1 if self.current_analysis['trade_opportunities']['conservative'] else 0,
-            'positions_count': len(self.current_analysis['current_positions'])
+            'last_analysis': results.get('timestamp'),
+            'spx_price': results.get('spx_price'),
+            'positions_count': len(results.get('current_positions') or [])
+        }
+        # <profile>_found counts call verticals, as before; puts are counted separately
+        for strategy_type in self.STRATEGY_PARAMS:
+            status[f'{strategy_type}_found'] = 1 if calls.get(strategy_type) else 0
+            status[f'{strategy_type}_put_found'] = 1 if puts.get(strategy_type) else 0
+        return status
+    def stream_payload(self, results):
+        """The dashboard's status and analysis in one event"""
+        return {
+            'status': self.get_analyzer_status(results),
+            'trade_opportunities': results.get('trade_opportunities', {}),
+            'put_trade_opportunities': results.get('put_trade_opportunities', {}),
+            'current_positions': results.get('current_positions', []),
+            'position_risk': results.get('position_risk')
         }
+
+    def analyze(self, market_data):
+        """
+        Run the analysis on a market data snapshot.
+        Returns the current analysis after processing.
+        """
+        self.process_data_callback(market_data)
+        return self.current_analysis
+
     def analyze_market(self):
         """
         Manually trigger market analysis.
         Returns the current analysis after processing.
         """
         logger.info("Manually triggering market analysis...")
-        data = self.get_latest_results()  # Use the inherited method
+        data = self.get_market_data()  # Use the inherited method
         self.process_data_callback(data)
+        self.publish(self.current_analysis)
         return self.current_analysis
 
+    def _sync_positions(self):
+        """Swap in a copy of the analysis with current_positions refreshed from the position book"""
+        self.current_analysis = dict(self.current_analysis, current_positions=self.position_book.positions(self.name))
+
     def add_position(self, position_data):
         """
         Add a new position to the current analysis.
@@ -212,16 +298,13 @@ class ShortverticalAnalyzer(BaseAnalyzer):
             Dictionary with status and position ID
         """
         try:
-            # Generate a unique ID for the position
-            position_id = str(uuid.uuid4())
+            # The position book assigns the id and timestamp and persists it
+            position_data = self.position_book.add(self.name, position_data)
+            position_id = position_data['id']
+            self._sync_positions()
             
-            # Add timestamp and ID to position data
-            position_data['id'] = position_id
-            position_data['timestamp'] = datetime.now().isoformat()
-            position_data['closed'] = False
-
-            # Add to current positions
-            self.current_analysis['current_positions'].append(position_data)
+            # New version for ETags, deltas and stream subscribers
+            self.republish(self.current_analysis)
             
             logger.info(f"Added new position: {position_id}")
             return {
@@ -236,27 +319,23 @@ class ShortverticalAnalyzer(BaseAnalyzer):
                 'message': str(e)
             }
 
-    def close_position(self, position_id):
+    def close_position(self, position_id, exit_price=None):
         """
         Close an existing position.
         Args:
             position_id: ID of the position to close
+            exit_price: Optional price the position was closed at
         Returns:
             Dictionary with status and closed position details
         """
         try:
-            # Find the position
-            position = next(
-                (p for p in self.current_analysis['current_positions'] if p['id'] == position_id),
-                None
-            )
+            position = self.position_book.close(position_id, exit_price, strategy=self.name)
             
             if not position:
                 raise ValueError(f"Position {position_id} not found")
-                
-            # Mark as closed and add close timestamp
-            position['closed'] = True
-            position['close_timestamp'] = datetime.now().isoformat()
+            self._sync_positions()
+            
+            self.republish(self.current_analysis)
             
             logger.info(f"Closed position: {position_id}")
             return {
@@ -1,49 +1,119 @@
 from analyzers.base import BaseAnalyzer
 from datetime import datetime
 import numpy as np
-from scipy.stats import linregress
+from analyzers.chain import ChainSnapshot, FEED_IV_SCALE
+
+
+def segment_slopes(x, y, valid, starts):
+    """
+    Least-squares slope of y on x within each segment, for all segments
+    at once.
+
+    Segments are the contiguous runs of rows beginning at `starts`; rows
+    where `valid` is False are left out. Each sum is one np.add.reduceat
+    over the whole array, and x and y are centred on their segment means
+    first so large strikes do not lose precision.
+
+    Returns (slope, count) per segment. The slope is 0 where a segment has
+    fewer than two valid points or no spread in x.
+    """
+    if not len(starts):
+        return np.empty(0), np.empty(0, dtype=np.int64)
+
+    weight = valid.astype(np.float64)
+    x = np.where(valid, x, 0.0)
+    y = np.where(valid, y, 0.0)
+    count = np.add.reduceat(weight, starts)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean_x = np.where(count > 0, np.add.reduceat(x, starts) / count, 0.0)
+        mean_y = np.where(count > 0, np.add.reduceat(y, starts) / count, 0.0)
+
+    segment = np.repeat(np.arange(len(starts)), np.diff(np.append(starts, len(x))))
+    dx = (x - mean_x[segment]) * weight
+    dy = y - mean_y[segment]
+    sxy = np.add.reduceat(dx * dy, starts)
+    sxx = np.add.reduceat(dx * dx, starts)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        slope = np.where((count >= 2) & (sxx > 0), sxy / sxx, 0.0)
+    return slope, count.astype(np.int64)
+
 
 class SkewAnalyzer(BaseAnalyzer):
     name = "skew"
     description = "IV Skew Analyzer"
     refresh_interval = 120  # seconds
+    # Also report slopes against log-moneyness ln(K / spot), which are
+    # comparable across spot levels
+    moneyness_slopes = True
 
     def analyze(self, market_data):
-        if not market_data or not market_data.get('expirations'):
+        """
+        Put and call IV skew (slope of IV against strike) of every
+        expiration in the chain.
+
+        The chain is sorted by (exp_date, strike) once, so every
+        expiration is a contiguous segment; all slopes for both sides come
+        from one batched least-squares pass, with no per-expiry loop. IV
+        is taken as a decimal (0.185), so slopes are IV per strike point
+        and, with moneyness_slopes, IV per unit of log-moneyness.
+        """
+        chain = ChainSnapshot.from_market_data(market_data) if market_data else None
+        if chain is None or not len(chain) or not np.any(~np.isnat(chain.exp_date)):
             return {
                 'timestamp': datetime.now().isoformat(),
                 'error': 'No market data available',
                 'skew_data': {}
             }
 
-        skew_results = {}
-        for expiry, data in market_data['expirations'].items():
-            puts = [o for o in data['puts'] if o.get('iv')]
-            calls = [o for o in data['calls'] if o.get('iv')]
-            
-            if not puts or not calls:
-                continue
+        dated = np.flatnonzero(~np.isnat(chain.exp_date))
+        order = dated[np.lexsort((chain.strike[dated], chain.exp_date[dated]))]
+        exp_date = chain.exp_date[order]
+        strike = chain.strike[order]
+        starts = np.flatnonzero(np.append(True, exp_date[1:] != exp_date[:-1]))
 
-            # Calculate put skew (slope of IV vs. strike)
-            put_strikes = [o['strike'] for o in puts]
-            put_ivs = [o['iv'] for o in puts]
-            put_slope = linregress(put_strikes, put_ivs).slope if len(put_strikes) > 1 else 0
+        spot = market_data.get('spx_price') or market_data.get('spot_price')
+        log_moneyness = None
+        if self.moneyness_slopes and spot and spot > 0:
+            with np.errstate(divide='ignore', invalid='ignore'):
+                log_moneyness = np.log(strike / spot)
 
-            # Calculate call skew
-            call_strikes = [o['strike'] for o in calls]
-            call_ivs = [o['iv'] for o in calls]
-            call_slope = linregress(call_strikes, call_ivs).slope if len(call_strikes) > 1 else 0
+        sides = {}
+        for side in ('put', 'call'):
+            iv = getattr(chain, side).iv[order] / FEED_IV_SCALE
+            with np.errstate(invalid='ignore'):
+                valid = np.isfinite(iv) & (iv > 0)
+            slope, count = segment_slopes(strike, iv, valid, starts)
+            sides[side] = {'slope': slope, 'count': count}
+            if log_moneyness is not None:
+                sides[side]['moneyness_slope'], _ = segment_slopes(
+                    log_moneyness, iv, valid & np.isfinite(log_moneyness), starts
+                )
 
+        skew_results = {}
+        expiries = exp_date[starts].astype(str).tolist()
+        for i, expiry in enumerate(expiries):
+            put_count = int(sides['put']['count'][i])
+            call_count = int(sides['call']['count'][i])
+            if not put_count or not call_count:
+                continue
+            put_slope = float(sides['put']['slope'][i])
+            call_slope = float(sides['call']['slope'][i])
             skew_results[expiry] = {
                 'put_slope': put_slope,
                 'call_slope': call_slope,
-                'skew_ratio': put_slope / call_slope if call_slope else float('inf'),
-                'put_count': len(puts),
-                'call_count': len(calls)
+                # None rather than infinity, which JSON cannot carry
+                'skew_ratio': put_slope / call_slope if call_slope else None,
+                'put_count': put_count,
+                'call_count': call_count
             }
+            if log_moneyness is not None:
+                skew_results[expiry]['put_slope_moneyness'] = float(sides['put']['moneyness_slope'][i])
+                skew_results[expiry]['call_slope_moneyness'] = float(sides['call']['moneyness_slope'][i])
 
+        current = chain.current_expiration()
+        primary = str(current) if current is not None and str(current) in skew_results else None
         return {
             'timestamp': datetime.now().isoformat(),
             'skew_data': skew_results,
-            'primary_expiry': market_data['primary_expiry']
-        }
\ No newline at end of file
+            'primary_expiry': primary or next(iter(skew_results), None)
+        }
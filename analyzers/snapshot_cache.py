@@ -0,0 +1,94 @@
+import logging
+import threading
+import time
+from config import CHAIN_REFRESH_INTERVAL
+
+logger = logging.getLogger("analyzer.snapshot_cache")
+
+
+def _fingerprint(market_data):
+    """
+    Cheap identity of a market data payload, used to detect new data.
+
+    Payloads from the chain loader carry the QuoteBook's `chain_version`,
+    which changes on every merged quote, including late rows re-read at
+    the watermark that leave the size and newest timestamp unchanged.
+    """
+    chain = getattr(market_data, 'chain', None)
+    if chain is None or not len(chain):
+        return ('empty', market_data.get('error'))
+    chain_version = market_data.get('chain_version')
+    if chain_version is not None:
+        return ('book', chain_version, market_data.get('spx_price'))
+    return (len(chain), int(chain.timestamp.max()), market_data.get('spx_price'))
+
+
+class SnapshotCache:
+    """
+    Process-wide cache of the latest market data snapshot.
+
+    Every analyzer reads through the same cache, so the chain is fetched at
+    most once per `ttl` seconds no matter how many analyzers or concurrent
+    requests ask for it. Only one caller runs the loader at a time; others
+    wait for it and reuse its result.
+
+    `version` increases by one each time a fetch returns data that differs
+    from the previous snapshot. The version is also stored on the payload as
+    `snapshot_version` so analyzers can skip work when nothing changed.
+    """
+
+    def __init__(self, ttl=CHAIN_REFRESH_INTERVAL):
+        self.ttl = ttl
+        self.version = 0
+        self.fetch_count = 0
+        self._data = None
+        self._fingerprint = None
+        self._fetched_at = None
+        self._fetch_lock = threading.Lock()
+
+    def _fresh(self):
+        if self._data is None or self._fetched_at is None:
+            return None
+        if time.monotonic() - self._fetched_at > self.ttl:
+            return None
+        return self._data
+
+    def get(self, loader):
+        """Return the cached snapshot, calling `loader` if it is stale"""
+        data = self._fresh()
+        if data is not None:
+            return data
+
+        with self._fetch_lock:
+            # Another caller may have refreshed while we waited for the lock
+            data = self._fresh()
+            if data is not None:
+                return data
+
+            data = loader()
+            self.fetch_count += 1
+            if data is None:
+                # Fetch failed; serve the last good snapshot if there is one
+                return self._data
+
+            fingerprint = _fingerprint(data)
+            if fingerprint != self._fingerprint or self._data is None:
+                self.version += 1
+                self._fingerprint = fingerprint
+                data['snapshot_version'] = self.version
+                self._data = data
+                logger.debug(f"Snapshot version {self.version} loaded")
+
+            self._fetched_at = time.monotonic()
+            return self._data
+
+    def peek(self):
+        """The last loaded snapshot, without fetching (None before the first load)"""
+        return self._data
+
+    def invalidate(self):
+        """Force the next get() to call the loader"""
+        self._fetched_at = None
+
+
+chain_cache = SnapshotCache()
@@ -1,49 +1,150 @@
 from .base import BaseAnalyzer
 from datetime import datetime
+import numpy as np
+from analyzers.chain import ChainSnapshot
+from analyzers.rollup import delta_buckets, grouped_credit_stats, vertical_credit_grid
 
 class SpreadAnalyzer(BaseAnalyzer):
     name = "spread"
     description = "SPX Credit Spread Analyzer"
     refresh_interval = 15  # seconds
-    
+    delta_collections = {
+        'put_spreads': ('strike', 'width'),
+        'call_spreads': ('strike', 'width')
+    }
+    # Point distance between the short and long strike
+    spread_widths = (5, 10, 15, 20, 25)
+    # Short legs up to this |delta| (at or out of the money) are listed
+    max_short_delta = 0.5
+    # Width of the delta buckets, as in spread_data
+    delta_bucket_size = 0.05
+
     def analyze(self, market_data):
         """Calculate spread metrics"""
-        put_spreads = self._calculate_put_spreads(market_data['puts'])
-        call_spreads = self._calculate_call_spreads(market_data['calls'])
-        
+        if not market_data or market_data.get('error'):
+            return self._empty_results(
+                (market_data or {}).get('error', 'No market data available')
+            )
+
+        chain = ChainSnapshot.from_market_data(market_data).expiry()
+        put_spreads, put_buckets = self._calculate_put_spreads(chain)
+        call_spreads, call_buckets = self._calculate_call_spreads(chain)
+
         results = {
             'timestamp': datetime.now().isoformat(),
+            'spot_price': market_data.get('spx_price'),
             'put_spreads': put_spreads,
             'call_spreads': call_spreads,
+            'delta_buckets': put_buckets + call_buckets,
             'summary': self._generate_summary(put_spreads, call_spreads)
         }
-        
+
         self._log_results(results)
         return results
-        
-    def _calculate_put_spreads(self, puts):
-        """Calculate put spread metrics"""
-        # Implementation would go here
-        return [
+
+    def _empty_results(self, error):
+        return {
+            'timestamp': datetime.now().isoformat(),
+            'spot_price': None,
+            'put_spreads': [],
+            'call_spreads': [],
+            'delta_buckets': [],
+            'summary': self._generate_summary([], []),
+            'error': error
+        }
+
+    def _calculate_put_spreads(self, chain):
+        """Put credit spreads: sell a put, buy the put `width` points lower"""
+        return self._calculate_spreads(chain, 'put', -1)
+
+    def _calculate_call_spreads(self, chain):
+        """Call credit spreads: sell a call, buy the call `width` points higher"""
+        return self._calculate_spreads(chain, 'call', 1)
+
+    def _calculate_spreads(self, chain, option_type, direction):
+        """
+        Every short strike x width credit spread of one side, and its
+        delta-bucket aggregates.
+
+        The whole (widths x strikes) grid is evaluated at once on the
+        strike-sorted expiration: long legs are found with one binary
+        search, then credit, max loss, probability OTM (1 - |short delta|)
+        and risk/reward (credit per point of max loss) are array
+        operations.
+
+        Returns (spreads, buckets): spreads sorted by strike then width,
+        and per (delta_bucket, point_spread) credit stats in the shape of
+        spread_data rows.
+        """
+        if not len(chain):
+            return [], []
+
+        side = chain.side(option_type)
+        widths = np.asarray(self.spread_widths, dtype=np.float64)
+        credit, long_rows, valid = vertical_credit_grid(chain.strike, side, widths, direction)
+        abs_delta = np.abs(side.delta)
+        with np.errstate(invalid='ignore'):
+            max_loss = widths[:, None] - credit
+            valid &= (max_loss > 0) & (abs_delta <= self.max_short_delta)[None, :]
+        if not valid.any():
+            return [], []
+
+        # Strike-major order, so a strike's widths are listed together
+        row, width_index = np.nonzero(valid.T)
+        credit = credit[width_index, row]
+        max_loss = max_loss[width_index, row]
+        short_delta = side.delta[row]
+
+        columns = {
+            'strike': chain.strike[row].tolist(),
+            'long_strike': chain.strike[long_rows[width_index, row]].tolist(),
+            'width': widths[width_index].astype(int).tolist(),
+            'credit': np.round(credit, 2).tolist(),
+            'max_loss': np.round(max_loss, 2).tolist(),
+            'probability': np.round(1 - np.abs(short_delta), 4).tolist(),
+            'risk_reward': np.round(credit / max_loss, 4).tolist(),
+            'delta': np.round(short_delta, 4).tolist()
+        }
+        names = list(columns)
+        spreads = [dict(zip(names, values)) for values in zip(*columns.values())]
+
+        bucket = delta_buckets(np.abs(short_delta), self.delta_bucket_size)
+        groups, avg, high, low = grouped_credit_stats([bucket, width_index], credit)
+        buckets = [
             {
-                'strike': 4200,
-                'credit': 1.25,
-                'probability': 0.68,
-                'risk_reward': 2.5
-            },
-            # More spreads...
+                'option_type': option_type,
+                'delta_bucket': delta_bucket,
+                'point_spread': point_spread,
+                'avg_credit': a,
+                'high_credit': h,
+                'low_credit': l
+            }
+            for delta_bucket, point_spread, a, h, l in zip(
+                np.round(groups[:, 0] * self.delta_bucket_size, 2).tolist(),
+                widths[groups[:, 1]].astype(int).tolist(),
+                np.round(avg, 4).tolist(), np.round(high, 4).tolist(), np.round(low, 4).tolist()
+            )
         ]
-        
-    def _calculate_call_spreads(self, calls):
-        """Calculate call spread metrics"""
-        # Similar to put spreads
-        return []
-        
+        return spreads, buckets
+
     def _generate_summary(self, put_spreads, call_spreads):
         """Generate summary statistics"""
-        avg_credit = sum(s['credit'] for s in put_spreads) / len(put_spreads) if put_spreads else 0
+        spreads = put_spreads + call_spreads
+        if not spreads:
+            return {
+                'avg_credit': 0,
+                'best_risk_reward': 0,
+                'avg_probability': 0,
+                'total_spreads': 0,
+                'put_spreads': 0,
+                'call_spreads': 0
+            }
+        credits = np.array([s['credit'] for s in spreads])
         return {
-            'avg_credit': avg_credit,
-            'best_risk_reward': max(s['risk_reward'] for s in put_spreads) if put_spreads else 0,
-            'total_spreads': len(put_spreads) + len(call_spreads)
-        }
\ No newline at end of file
+            'avg_credit': round(float(credits.mean()), 4),
+            'best_risk_reward': max(s['risk_reward'] for s in spreads),
+            'avg_probability': round(float(np.mean([s['probability'] for s in spreads])), 4),
+            'total_spreads': len(spreads),
+            'put_spreads': len(put_spreads),
+            'call_spreads': len(call_spreads)
+        }
@@ -0,0 +1,274 @@
+"""
+Implied volatility surface shared by every analyzer.
+
+Each expiration's smile is a least-squares polynomial in standardized
+log-moneyness, fitted to out-of-the-money feed IVs (puts below the
+forward, calls above). Smiles are flat beyond the strikes they were
+fitted on. Between expirations total variance (iv^2 * T) is interpolated
+linearly in T at the same forward moneyness.
+
+The surface is built at most once per chain snapshot: vol_surface()
+returns the cached fit while the snapshot is unchanged, so any number of
+consumers per tick share one fit.
+"""
+import threading
+import numpy as np
+from analyzers.chain import ChainSnapshot, FEED_IV_SCALE
+from analyzers.pricing import bs_price_greeks, parity_forward, years_to_expiration
+
+# Keeps the normal equations solvable when an expiry has fewer points than coefficients
+RIDGE = 1e-6
+
+
+class VolSurface:
+    """
+    Fitted smiles for every live expiration of one snapshot.
+
+    Arrays are per expiration, sorted by time to expiry: exp_date, T
+    (years), forward, coef (expirations x degree+1, lowest power first),
+    center and scale of the log-moneyness standardization, and the z
+    range the smile was fitted on.
+    """
+
+    def __init__(self, exp_date, T, forward, coef, center, scale, z_min, z_max, valuation_time=None):
+        self.exp_date = exp_date
+        self.T = T
+        self.forward = forward
+        self.coef = coef
+        self.center = center
+        self.scale = scale
+        self.z_min = z_min
+        self.z_max = z_max
+        self.valuation_time = valuation_time
+
+    def __len__(self):
+        return len(self.T)
+
+    @classmethod
+    def from_chain(cls, chain, spot=None, degree=2, valuation_time=None):
+        """
+        Fit every expiration's smile in one batched least-squares solve.
+
+        valuation_time defaults to the newest quote in the chain, so a
+        replayed snapshot is valued at its own time. Expirations without
+        any usable IV or already expired are left out; `spot` stands in for
+        the forward where put-call parity has no two-sided pair.
+        """
+        if not isinstance(chain, ChainSnapshot):
+            chain = ChainSnapshot.from_market_data(chain)
+        dated = np.flatnonzero(~np.isnat(chain.exp_date)) if len(chain) else np.empty(0, dtype=np.intp)
+        if not dated.size:
+            return cls.empty()
+
+        if valuation_time is None:
+            valuation_time = chain.quote_time()
+
+        order = dated[np.lexsort((chain.strike[dated], chain.exp_date[dated]))]
+        exp_date = chain.exp_date[order]
+        strike = chain.strike[order]
+        forward = parity_forward(exp_date, strike, chain.call.mid[order], chain.put.mid[order])
+        if spot:
+            forward = np.where(np.isfinite(forward), forward, spot)
+
+        # Out-of-the-money side of each strike
+        otm_call = strike >= forward
+        iv = np.where(otm_call, chain.call.iv[order], chain.put.iv[order]) / FEED_IV_SCALE
+        T_rows = years_to_expiration(valuation_time, exp_date)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            k = np.log(strike / forward)
+            valid = np.isfinite(iv) & (iv > 0) & np.isfinite(k) & (T_rows > 0)
+
+        starts = np.flatnonzero(np.append(True, exp_date[1:] != exp_date[:-1]))
+        segment = np.repeat(np.arange(len(starts)), np.diff(np.append(starts, len(order))))
+        weight = valid.astype(np.float64)
+        k = np.where(valid, k, 0.0)
+        iv = np.where(valid, iv, 0.0)
+
+        count = np.add.reduceat(weight, starts)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            center = np.where(count > 0, np.add.reduceat(k * weight, starts) / count, 0.0)
+            spread = np.add.reduceat((k - center[segment]) ** 2 * weight, starts) / count
+        scale = np.where((count > 1) & (spread > 0), np.sqrt(spread), 1.0)
+        z = (k - center[segment]) / scale[segment]
+
+        # Normal equations for all expirations at once: A[e] = sum w z^(p+q), b[e] = sum w z^p iv
+        powers = np.arange(2 * degree + 1)
+        z_powers = z[:, None] ** powers[None, :] * weight[:, None]
+        moments = np.add.reduceat(z_powers, starts, axis=0)
+        rhs = np.add.reduceat(z_powers[:, :degree + 1] * iv[:, None], starts, axis=0)
+        index = np.arange(degree + 1)
+        A = moments[:, index[:, None] + index[None, :]]
+        A = A + RIDGE * np.diag(np.r_[0.0, np.ones(degree)])[None, :, :] * np.maximum(count, 1)[:, None, None]
+        live = count > 0
+        coef = np.zeros((len(starts), degree + 1))
+        if live.any():
+            coef[live] = np.linalg.solve(A[live], rhs[live][:, :, None])[:, :, 0]
+
+        masked = np.where(valid, z, np.nan)
+        with np.errstate(invalid='ignore'):
+            z_min = np.fmin.reduceat(masked, starts)
+            z_max = np.fmax.reduceat(masked, starts)
+
+        keep = live & (T_rows[starts] > 0)
+        by_expiry = np.argsort(T_rows[starts][keep], kind='stable')
+        pick = np.flatnonzero(keep)[by_expiry]
+        return cls(
+            exp_date[starts][pick], T_rows[starts][pick], forward[starts][pick], coef[pick],
+            center[pick], scale[pick], z_min[pick], z_max[pick], valuation_time
+        )
+
+    @classmethod
+    def empty(cls):
+        return cls(
+            np.empty(0, dtype='datetime64[D]'), np.empty(0), np.empty(0), np.empty((0, 1)),
+            np.empty(0), np.empty(0), np.empty(0), np.empty(0)
+        )
+
+    def _smile(self, expiry, k):
+        """
+        IV of expirations `expiry` (index array) at log-moneyness k, flat
+        beyond the fitted range. expiry only has to broadcast against k.
+        """
+        z = np.clip((k - self.center[expiry]) / self.scale[expiry], self.z_min[expiry], self.z_max[expiry])
+        coef = self.coef[expiry]
+        iv = np.zeros(np.shape(z)) + coef[..., -1]
+        for p in range(coef.shape[-1] - 2, -1, -1):
+            iv = iv * z + coef[..., p]
+        return np.maximum(iv, 0.0)
+
+    def iv(self, strikes, T):
+        """
+        Implied volatility (decimal) at any strikes and times to expiry
+        (years); inputs broadcast against each other.
+
+        Times before the first or after the last expiration use that
+        expiration's smile. NaN where the surface is empty.
+        """
+        strikes = np.asarray(strikes, dtype=np.float64)
+        T = np.asarray(T, dtype=np.float64)
+        if not len(self):
+            return np.full(np.broadcast_shapes(strikes.shape, T.shape), np.nan)
+
+        # Brackets are found on T's own shape and broadcast against strikes afterwards
+        hi = np.clip(np.searchsorted(self.T, T), 0, len(self) - 1)
+        lo = np.clip(hi - 1, 0, len(self) - 1)
+        # Outside the expirations both brackets are the nearest one
+        lo = np.where(T <= self.T[lo], hi, lo)
+        lo = np.where(T >= self.T[-1], hi, lo)
+        span = self.T[hi] - self.T[lo]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            alpha = np.where(span > 0, np.clip((T - self.T[lo]) / span, 0.0, 1.0), 0.0)
+            forward = self.forward[lo] + alpha * (self.forward[hi] - self.forward[lo])
+            k = np.log(strikes / forward)
+
+        iv_lo = self._smile(lo, k)
+        iv_hi = self._smile(hi, k)
+        variance = iv_lo ** 2 * self.T[lo] + alpha * (iv_hi ** 2 * self.T[hi] - iv_lo ** 2 * self.T[lo])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            between = np.sqrt(np.maximum(variance, 0.0) / T)
+        return np.where((span > 0) & (T > 0), between, iv_lo)
+
+    def expiry_index(self, exp_date):
+        """Index of an expiration on the surface, or None"""
+        matches = np.flatnonzero(self.exp_date == np.datetime64(exp_date, 'D'))
+        return int(matches[0]) if matches.size else None
+
+    def smile(self, exp_date, strikes):
+        """IV (decimal) of one expiration's fitted smile at `strikes` (default: the nearest expiration)"""
+        if exp_date is None:
+            exp_date = self.exp_date[0] if len(self) else np.datetime64('NaT', 'D')
+        strikes = np.asarray(strikes, dtype=np.float64)
+        return self.expiry_iv(np.full(strikes.shape, np.datetime64(exp_date, 'D')), strikes)
+
+    def expiry_iv(self, exp_dates, strikes):
+        """IV (decimal) of each (expiration, strike) pair on its own smile; NaN off the surface"""
+        exp_dates = np.asarray(exp_dates, dtype='datetime64[D]')
+        strikes = np.asarray(strikes, dtype=np.float64)
+        if not len(self):
+            return np.full(strikes.shape, np.nan)
+        # Expirations are sorted by T, which is date order
+        expiry = np.minimum(np.searchsorted(self.exp_date, exp_dates), len(self) - 1)
+        on_surface = self.exp_date[expiry] == exp_dates
+        with np.errstate(divide='ignore', invalid='ignore'):
+            k = np.log(strikes / self.forward[expiry])
+        return np.where(on_surface, self._smile(expiry, k), np.nan)
+
+    def quotes(self, exp_date, strikes, is_call):
+        """
+        Model value and greeks of options on one expiration, priced at the
+        smile's IV and the expiration's forward.
+
+        Greeks are in the feed's units (theta per day, vega per vol point),
+        so they can stand in for quotes of strikes the chain does not list.
+        Returns None if the expiration is not on the surface.
+        """
+        i = self.expiry_index(exp_date) if exp_date is not None else (0 if len(self) else None)
+        if i is None:
+            return None
+        strikes = np.asarray(strikes, dtype=np.float64)
+        iv = self.smile(self.exp_date[i], strikes)
+        greeks = bs_price_greeks(S=self.forward[i], K=strikes, T=self.T[i], sigma=iv, is_call=is_call)
+        return {
+            'value': greeks['price'],
+            'delta': greeks['delta'],
+            'gamma': greeks['gamma'],
+            'theta': greeks['theta'] / 365.0,
+            'vega': greeks['vega'] / 100.0,
+            'iv': iv
+        }
+
+    def atm_iv(self):
+        """At-the-forward IV per expiration"""
+        if not len(self):
+            return np.empty(0)
+        return self._smile(np.arange(len(self)), np.zeros(len(self)))
+
+
+class VolSurfaceCache:
+    """
+    The surface of the latest snapshot, rebuilt only when the snapshot
+    changes.
+
+    A snapshot is identified by its chain object and snapshot_version, so
+    the shared snapshot cache's payload is fitted once per version. The
+    fit runs under a lock, so concurrent analyzers wait for one build
+    instead of each fitting.
+    """
+
+    def __init__(self, degree=2):
+        self.degree = degree
+        self.builds = 0
+        self._key = None
+        self._chain = None
+        self._surface = None
+        self._lock = threading.Lock()
+
+    def get(self, market_data):
+        chain = getattr(market_data, 'chain', None)
+        if chain is None and market_data:
+            chain = ChainSnapshot.from_market_data(market_data)
+        if chain is None or not len(chain):
+            return None
+        key = market_data.get('snapshot_version')
+        with self._lock:
+            if self._chain is not chain or self._key != key:
+                spot = market_data.get('spx_price') or market_data.get('spot_price')
+                self._surface = VolSurface.from_chain(chain, spot=spot, degree=self.degree)
+                self._chain = chain
+                self._key = key
+                self.builds += 1
+            return self._surface
+
+    def peek(self):
+        return self._surface
+
+
+surface_cache = VolSurfaceCache()
+
+
+def vol_surface(market_data, cache=None):
+    """
+    The VolSurface for a market data payload (None without a chain), from
+    `cache` or by default the shared surface_cache
+    """
+    return (cache or surface_cache).get(market_data)
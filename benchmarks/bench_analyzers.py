@@ -0,0 +1,173 @@
+"""
+Benchmark: analyzer hot paths on synthetic chains of increasing size.
+
+Times, per strike count:
+    fetch_postprocess       rows -> QuoteBook -> ChainSnapshot -> MarketData
+                            (what _fetch_market_data does after the query)
+    legacy_materialize      building the legacy calls/puts dict lists
+    iron_condor             IroncondorAnalyzer.find_iron_condor_opportunities
+    short_call_vertical     ShortverticalAnalyzer.find_short_call_vertical_opportunities
+    bs_process_option_data  BSDeviationAnalyzer.process_option_data
+    skew_analyze            SkewAnalyzer.analyze
+    spread_grid             SpreadAnalyzer.analyze (every strike x width credit spread)
+    vol_surface_build       VolSurface.from_chain (every expiration's smile fit)
+    vol_surface_query       VolSurface.iv on a 100 x strikes (T x strike) grid
+
+Results are saved as JSON for regression comparison.
+
+Usage:
+    python -m benchmarks.bench_analyzers --strikes 100 250 500 1000
+    python -m benchmarks.bench_analyzers --save baseline
+    python -m benchmarks.bench_analyzers --compare benchmarks/results/baseline.json
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import time as timer
+from datetime import datetime
+import numpy as np
+from analyzers.chain import MarketData
+from analyzers.ingest import QuoteBook
+from benchmarks.synthetic import DEFAULT_START, synthetic_rows
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+
+def measure(fn, repeat=5, min_time=0.02):
+    """Best and median seconds per call; each sample loops until min_time has passed"""
+    start = timer.perf_counter()
+    fn()
+    single = timer.perf_counter() - start
+    number = max(1, int(min_time / single)) if single > 0 else 1000
+
+    samples = []
+    for _ in range(repeat):
+        start = timer.perf_counter()
+        for _ in range(number):
+            fn()
+        samples.append((timer.perf_counter() - start) / number)
+    return min(samples), statistics.median(samples)
+
+
+def build_cases(strikes, expirations=1):
+    """(name, callable) pairs for one chain size"""
+    from analyzers.bs_deviation import BSDeviationAnalyzer
+    from analyzers.iron_condor import IroncondorAnalyzer
+    from analyzers.short_vertical import ShortverticalAnalyzer
+    from analyzers.skew import SkewAnalyzer
+    from analyzers.spread import SpreadAnalyzer
+    from analyzers.vol_surface import VolSurface
+
+    rows, spots = synthetic_rows(strikes=strikes, expirations=expirations)
+    spx_price = round(float(spots[-1]), 2)
+
+    def fetch_postprocess():
+        book = QuoteBook()
+        book.merge(rows)
+        return MarketData(book.snapshot(), timestamp=DEFAULT_START.isoformat(), spx_price=spx_price)
+
+    market_data = fetch_postprocess()
+    market_data['snapshot_version'] = 1
+
+    def legacy_materialize():
+        return market_data.chain.to_legacy()
+
+    condor = IroncondorAnalyzer()
+    vertical = ShortverticalAnalyzer()
+    bs = BSDeviationAnalyzer()
+    frame = bs.chain_to_frame(market_data.chain)
+    frame = frame.assign(IV=frame['feed_iv'])
+    skew = SkewAnalyzer()
+    spread = SpreadAnalyzer()
+    spread.persist_results = False
+    surface = VolSurface.from_chain(market_data.chain, spot=spx_price)
+    query_strikes = market_data.chain.strike
+    query_T = np.linspace(0.0, 30 / 365, 100)[:, None]
+
+    return [
+        ('fetch_postprocess', fetch_postprocess),
+        ('legacy_materialize', legacy_materialize),
+        ('iron_condor', lambda: condor.find_iron_condor_opportunities(market_data)),
+        ('short_call_vertical', lambda: vertical.find_short_call_vertical_opportunities(market_data, 'moderate')),
+        ('bs_process_option_data', lambda: bs.process_option_data(frame.copy(), DEFAULT_START)),
+        ('skew_analyze', lambda: skew.analyze(market_data)),
+        ('spread_grid', lambda: spread.analyze(market_data)),
+        ('vol_surface_build', lambda: VolSurface.from_chain(market_data.chain, spot=spx_price)),
+        ('vol_surface_query', lambda: surface.iv(query_strikes, query_T))
+    ]
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline, threshold):
+    print(f"\n{'case':<24} {'strikes':>8} {'baseline (ms)':>14} {'now (ms)':>10} {'ratio':>7}")
+    regressions = 0
+    for case, by_size in results['results'].items():
+        for size, stats in by_size.items():
+            before = baseline.get('results', {}).get(case, {}).get(size)
+            if not before:
+                continue
+            ratio = stats['best'] / before['best']
+            flag = '  REGRESSION' if ratio > threshold else ''
+            regressions += bool(flag)
+            print(f"{case:<24} {size:>8} {before['best'] * 1e3:>14.3f} {stats['best'] * 1e3:>10.3f} {ratio:>6.2f}x{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--strikes', type=int, nargs='+', default=[100, 250, 500, 1000])
+    parser.add_argument('--expirations', type=int, default=1, help="Expirations per chain (strikes are per expiration)")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--save', help="Name of the results file written to benchmarks/results/")
+    parser.add_argument('--compare', help="Results file to compare against")
+    parser.add_argument('--threshold', type=float, default=1.25, help="Ratio above which a case counts as a regression")
+    args = parser.parse_args()
+
+    results = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(),
+            'git_revision': git_revision(),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'machine': platform.machine(),
+            'repeat': args.repeat,
+            'expirations': args.expirations
+        },
+        'results': {}
+    }
+
+    print(f"{'case':<24} {'strikes':>8} {'best (ms)':>10} {'median (ms)':>12}")
+    for strikes in args.strikes:
+        for name, fn in build_cases(strikes, args.expirations):
+            best, median = measure(fn, args.repeat)
+            results['results'].setdefault(name, {})[str(strikes)] = {'best': best, 'median': median}
+            print(f"{name:<24} {strikes:>8} {best * 1e3:>10.3f} {median * 1e3:>12.3f}")
+
+    if args.save:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        path = os.path.join(RESULTS_DIR, f"{args.save}.json")
+        with open(path, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nSaved {path}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            raise SystemExit(f"{regressions} case(s) slower than {args.threshold}x baseline")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""
+Benchmark: vectorized Black-Scholes pricing vs the old row-wise apply path.
+
+Usage:
+    python -m benchmarks.bench_bs_pricing --rows 500 2000 5000
+"""
+import argparse
+import time as timer
+from datetime import date, datetime, time, timedelta
+import numpy as np
+import pandas as pd
+import pytz
+from analyzers.bs_deviation import BSDeviationAnalyzer
+
+
+def make_option_frame(rows, seed=0):
+    """Random option frame shaped like the bs_stream table"""
+    rng = np.random.default_rng(seed)
+    today = date(2024, 5, 1)
+    spot = 5000.0
+    return pd.DataFrame({
+        'underlying_price': np.full(rows, spot),
+        'strike': spot + rng.integers(-60, 61, rows) * 5.0,
+        'expiration_date': [today + timedelta(days=int(d)) for d in rng.integers(0, 3, rows)],
+        'IV': rng.uniform(0.08, 0.45, rows),
+        'option_type': rng.choice(['call', 'put'], rows)
+    })
+
+
+def apply_path(analyzer, option_data, current_time):
+    """The original per-row DataFrame.apply implementation"""
+    market_close = time(15, 0)
+    return option_data.apply(
+        lambda row: analyzer.black_scholes(
+            S=row['underlying_price'],
+            K=row['strike'],
+            T=analyzer.calculate_time_to_expiration(current_time, row['expiration_date'], market_close),
+            r=0,
+            sigma=row['IV'],
+            option_type=row['option_type']
+        ), axis=1
+    ).to_numpy()
+
+
+def best_of(fn, repeat):
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = timer.perf_counter()
+        result = fn()
+        best = min(best, timer.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[500, 2000, 5000])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    analyzer = BSDeviationAnalyzer()
+    current_time = pytz.timezone('US/Central').localize(datetime(2024, 5, 1, 10, 30))
+
+    print(f"{'rows':>8} {'apply (ms)':>12} {'vectorized (ms)':>16} {'speedup':>9} {'max |diff|':>12}")
+    for rows in args.rows:
+        frame = make_option_frame(rows)
+        apply_time, expected = best_of(lambda: apply_path(analyzer, frame, current_time), args.repeat)
+        vector_time, priced = best_of(
+            lambda: analyzer.process_option_data(frame.copy(), current_time), args.repeat
+        )
+        diff = np.nanmax(np.abs(priced['BS_Price'].to_numpy() - expected))
+        print(f"{rows:>8} {apply_time * 1e3:>12.2f} {vector_time * 1e3:>16.2f} "
+              f"{apply_time / vector_time:>8.1f}x {diff:>12.2e}")
+
+
+if __name__ == '__main__':
+    main()
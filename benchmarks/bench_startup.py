@@ -0,0 +1,60 @@
+"""
+Benchmark: app factory time in a fresh interpreter.
+
+Each run starts a new Python process, imports flaskdashboard and calls
+create_app(), so module import cost is included. Also reports which heavy
+modules were imported by the factory (they should load during warm-up).
+
+Usage:
+    python -m benchmarks.bench_startup --runs 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+HEAVY_MODULES = ('pandas', 'scipy', 'requests')
+
+PROBE = f"""
+import json, sys, time
+started = time.perf_counter()
+import flaskdashboard
+app = flaskdashboard.create_app()
+total = time.perf_counter() - started
+print(json.dumps({{
+    'total': total,
+    'create_app': app.startup_timings['create_app'],
+    'heavy_loaded': [m for m in {HEAVY_MODULES!r} if m in sys.modules],
+    'analyzers_loaded': sorted(app.analyzers.loaded())
+}}))
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, SCHEDULER_ENABLED='False')
+
+    results = []
+    for _ in range(args.runs):
+        out = subprocess.run(
+            [sys.executable, '-c', PROBE], cwd=root, env=env,
+            capture_output=True, text=True, check=True
+        )
+        results.append(json.loads(out.stdout.strip().splitlines()[-1]))
+
+    totals = [r['total'] * 1e3 for r in results]
+    factory = [r['create_app'] * 1e3 for r in results]
+    print(f"{'runs':>6} {'import+factory (ms)':>20} {'create_app (ms)':>16}")
+    print(f"{args.runs:>6} {statistics.median(totals):>20.1f} {statistics.median(factory):>16.1f}")
+    print(f"heavy modules loaded: {results[-1]['heavy_loaded'] or 'none'}")
+    print(f"analyzers constructed: {results[-1]['analyzers_loaded'] or 'none'}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+"""
+Deterministic synthetic SPX 0DTE chains shaped like spx_0dte_stream.
+
+Quotes come from Black-Scholes on a skewed volatility smile with tick-sized
+bid/ask spreads, so analyzers see realistic deltas, premiums and IVs
+without a database. The same arguments always produce the same rows.
+"""
+from datetime import datetime, timedelta, timezone
+import numpy as np
+from analyzers.chain import ChainSnapshot, MarketData, SIDE_FIELDS, COLUMN_SUFFIXES, FEED_IV_SCALE
+from analyzers.pricing import SECONDS_PER_YEAR, bs_price_greeks, years_to_expiration
+
+# 9:30 AM Central on the default session date
+DEFAULT_START = datetime(2024, 5, 1, 14, 30, tzinfo=timezone.utc)
+TICK_SIZE = 0.05
+
+
+def smile_iv(strikes, spot, atm_iv=0.15, skew=-0.8, smile=2.0, floor=0.05):
+    """Quadratic smile in log-moneyness with downside skew"""
+    x = np.log(strikes / spot)
+    return np.maximum(atm_iv + skew * x + smile * x ** 2, floor)
+
+
+def _quote(price):
+    """Tick-rounded bid/ask around a theoretical price"""
+    half_spread = np.maximum(TICK_SIZE, 0.02 * price)
+    bid = np.floor((price - half_spread) / TICK_SIZE) * TICK_SIZE
+    ask = np.ceil((price + half_spread) / TICK_SIZE) * TICK_SIZE
+    return np.maximum(bid, 0.0), np.maximum(ask, TICK_SIZE)
+
+
+def spot_path(ticks, spot=5000.0, vol=0.15, tick_seconds=15, seed=0):
+    """Seeded geometric Brownian motion for the underlying, one value per tick"""
+    rng = np.random.default_rng(seed)
+    dt = tick_seconds / SECONDS_PER_YEAR
+    steps = rng.standard_normal(ticks - 1) * vol * np.sqrt(dt) - 0.5 * vol ** 2 * dt
+    return spot * np.exp(np.concatenate([[0.0], np.cumsum(steps)]))
+
+
+def synthetic_rows(strikes=200, ticks=1, spot=5000.0, strike_step=5.0, expirations=1,
+                   exp_date=None, start=DEFAULT_START, tick_seconds=15,
+                   atm_iv=0.15, skew=-0.8, smile=2.0, seed=0):
+    """
+    Rows in chain_columns() order for `ticks` ticks of a chain.
+
+    Strikes are centred on the opening spot. Each tick quotes every strike
+    of every expiration, like a full chain refresh. IV is in percent and
+    theta per day, as in the feed.
+
+    Returns (rows, spots) where spots is the underlying at each tick.
+    """
+    exp_date = exp_date or start.date()
+    rng = np.random.default_rng(seed + 1)
+    centre = round(spot / strike_step) * strike_step
+    strike_grid = centre + (np.arange(strikes) - strikes // 2) * strike_step
+    exp_dates = [exp_date + timedelta(days=i) for i in range(expirations)]
+    spots = spot_path(ticks, spot, atm_iv, tick_seconds, seed)
+    open_interest = {
+        (side, e): rng.integers(0, 5000, strikes).astype(float)
+        for side in ('call', 'put') for e in range(expirations)
+    }
+
+    rows = []
+    for t in range(ticks):
+        timestamp = start + timedelta(seconds=tick_seconds * t)
+        S = spots[t]
+        for e, expiry in enumerate(exp_dates):
+            T = years_to_expiration(timestamp, [expiry])[0]
+            sigma = smile_iv(strike_grid, S, atm_iv, skew, smile)
+            sides = {}
+            for side in ('call', 'put'):
+                greeks = bs_price_greeks(S, strike_grid, T, sigma, 0.0, side == 'call')
+                bid, ask = _quote(greeks['price'])
+                sides[side] = {
+                    'bid': bid,
+                    'ask': ask,
+                    'last': np.round(greeks['price'], 2),
+                    'iv': sigma * FEED_IV_SCALE,
+                    'delta': greeks['delta'],
+                    'gamma': greeks['gamma'],
+                    'theta': greeks['theta'] / 365.0,
+                    'vega': greeks['vega'] / 100.0,
+                    'oi': open_interest[(side, e)],
+                    'net_chg': np.round(rng.normal(0, 0.5, strikes), 2)
+                }
+            columns = [strike_grid.tolist()]
+            for side in ('call', 'put'):
+                columns.extend(sides[side][f].tolist() for f in SIDE_FIELDS)
+            for strike, *quote in zip(*columns):
+                rows.append((timestamp, expiry, strike, *quote))
+
+    return rows, spots
+
+
+def rows_to_records(rows):
+    """Dicts keyed by spx_0dte_stream column name, e.g. for db.insert(SPXOptionStream)"""
+    names = ['timestamp', 'exp_date', 'strike_price']
+    for side in ('call', 'put'):
+        names.extend(f"{side}_{COLUMN_SUFFIXES[f]}" for f in SIDE_FIELDS)
+    records = [dict(zip(names, row)) for row in rows]
+    for record in records:
+        for side in ('call', 'put'):
+            record[f'{side}_open_int'] = int(record[f'{side}_open_int'])
+    return records
+
+
+def synthetic_market_data(strikes=200, **kwargs):
+    """MarketData for the last tick of a synthetic chain, as analyzers receive it"""
+    rows, spots = synthetic_rows(strikes=strikes, **kwargs)
+    chain = ChainSnapshot.from_rows(rows)
+    latest = chain.take(np.flatnonzero(chain.timestamp == chain.timestamp.max()))
+    return MarketData(
+        latest,
+        timestamp=rows[-1][0].isoformat(),
+        spx_price=round(float(spots[-1]), 2),
+        snapshot_version=1
+    )
@@ -11,7 +11,9 @@ DB_NAME = os.getenv('DB_NAME', 'trader')
 DB_USER = os.getenv('DB_USER', 'postgres')
 DB_PASSWORD = os.getenv('DB_PASSWORD', 'root')
 
-SQLALCHEMY_DATABASE_URI = f'postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}'
+SQLALCHEMY_DATABASE_URI = os.getenv(
+    'DATABASE_URL', f'postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}'
+)
 SQLALCHEMY_TRACK_MODIFICATIONS = False
 
 # Analyzer settings
@@ -19,4 +21,34 @@ DEFAULT_REFRESH_INTERVAL = 30  # seconds
 MAX_LOG_ENTRIES = 1000
 
 # Timezone
-TIMEZONE = 'America/New_York'
\ No newline at end of file
+TIMEZONE = 'America/New_York'
+
+# Shared chain snapshot cache: all analyzers read one fetch per interval
+CHAIN_REFRESH_INTERVAL = 15  # seconds
+
+# Run analyzers in background threads; routes read the last published result
+SCHEDULER_ENABLED = os.getenv('SCHEDULER_ENABLED', 'True') == 'True'
+
+# Seconds between keep-alive comments on idle server-sent event streams
+SSE_HEARTBEAT_INTERVAL = 15
+
+# Rows fetched per batch when streaming chain exports from /api/options/stream
+EXPORT_BATCH_SIZE = 5000
+
+# Write-behind batching for spx_analysis records
+ANALYSIS_FLUSH_SIZE = 200        # rows per bulk insert
+ANALYSIS_FLUSH_INTERVAL = 2.0    # seconds before a partial batch is written
+ANALYSIS_QUEUE_MAX = 5000        # pending rows before producers are held back
+ANALYSIS_ENQUEUE_TIMEOUT = 0.5   # seconds a producer waits for room before dropping
+
+# Seconds between refreshes of the position book from the positions table,
+# so gunicorn workers agree on open positions (0 turns the sync off)
+POSITION_SYNC_INTERVAL = 10
+
+# Rollup of spx_0dte_stream into 1-minute bars and spread_data credit stats
+ROLLUP_ENABLED = os.getenv('ROLLUP_ENABLED', 'True') == 'True'
+ROLLUP_INTERVAL = 60                      # seconds between rollup runs
+ROLLUP_MAX_MINUTES = 60                   # minutes rolled up per transaction (a backfill commits in chunks)
+ROLLUP_REVISE_MINUTES = 5                 # rolled-up minutes rebuilt on every run to take in late rows
+ROLLUP_SPREAD_WIDTHS = (5, 10, 15, 20, 25)
+ROLLUP_DELTA_BUCKET = 0.05
@@ -1,8 +1,19 @@
+import logging
+import os
+import time
 from flask import Flask
 from models import db
 from analyzers import init_analyzers
+from analyzers.metrics import init_metrics
+from analyzers.persistence import init_persistence
+from analyzers.positions import init_positions
+from analyzers.rollup import init_rollup
+from analyzers.scheduler import init_warm_up, start_warm_up
+
+logger = logging.getLogger("flaskdashboard")
 
 def create_app():
+    started = time.perf_counter()
     app = Flask(__name__)
     
     # Load configuration
@@ -11,15 +22,34 @@ def create_app():
     # Initialize database
     db.init_app(app)
     
-    # Initialize analyzers first
+    # Write analysis records in batches from a background thread
+    init_persistence(app)
+    init_positions(app)
+    
+    # Stage, statement and request timings for /metrics
+    init_metrics(app)
+    
+    # Register analyzers; each one is built on first use or during warm-up
     init_analyzers(app)
     
+    # Minute bars and spread statistics, rolled up by the scheduler
+    init_rollup(app)
+    
     # Initialize routes after analyzers
     from routes import init_routes
     init_routes(app)
     
+    # Construct analyzers and start the scheduler once the server is serving
+    init_warm_up(app)
+    
+    app.startup_timings = {'create_app': round(time.perf_counter() - started, 4)}
+    logger.info(f"App factory finished in {app.startup_timings['create_app']:.3f}s")
+    
     return app
 
 if __name__ == '__main__':
     app = create_app()
-    app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
+    # With the reloader on, only the child process that serves requests warms up
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_warm_up(app, port=5000)
+    app.run(host='0.0.0.0', port=5000, debug=True)
@@ -23,10 +23,10 @@ class SPXSpot(db.Model):
     timestamp = db.Column(db.DateTime(timezone=True), primary_key=True)
     price = db.Column(db.Float)
 
-class SPXOptionStream(db.Model):
-    __tablename__ = 'spx_0dte_stream'
+class OptionQuoteColumns:
+    """Quote columns shared by spx_0dte_stream and spx_0dte_latest"""
     
-    timestamp = db.Column(db.DateTime(timezone=True), primary_key=True)
+    timestamp = db.Column(db.DateTime(timezone=True))
     call_net_chg = db.Column(db.Float)
     call_iv = db.Column(db.Float)
     call_open_int = db.Column(db.Integer)
@@ -37,8 +37,6 @@ class SPXOptionStream(db.Model):
     call_last = db.Column(db.Float)
     call_ask = db.Column(db.Float)
     call_bid = db.Column(db.Float)
-    exp_date = db.Column(db.Date, primary_key=True)
-    strike_price = db.Column(db.Float, primary_key=True)
     put_bid = db.Column(db.Float)
     put_ask = db.Column(db.Float)
     put_last = db.Column(db.Float)
@@ -50,8 +48,59 @@ class SPXOptionStream(db.Model):
     put_iv = db.Column(db.Float)
     put_net_chg = db.Column(db.Float)
 
+class SPXOptionStream(OptionQuoteColumns, db.Model):
+    __tablename__ = 'spx_0dte_stream'
+    
+    timestamp = db.Column(db.DateTime(timezone=True), primary_key=True)
+    exp_date = db.Column(db.Date, primary_key=True)
+    strike_price = db.Column(db.Float, primary_key=True)
+
+# Per-expiration chain reads, newest first. The primary key
+# (timestamp, exp_date, strike_price) already serves timestamp ranges.
+db.Index(
+    'ix_spx_0dte_stream_exp_ts_strike',
+    SPXOptionStream.exp_date, SPXOptionStream.timestamp.desc(), SPXOptionStream.strike_price
+)
+
+class SPXOptionLatest(OptionQuoteColumns, db.Model):
+    """Newest spx_0dte_stream quote per (exp_date, strike_price), kept current by a trigger"""
+    __tablename__ = 'spx_0dte_latest'
+    __table_args__ = (
+        db.Index('ix_spx_0dte_latest_timestamp', 'timestamp'),
+    )
+    
+    exp_date = db.Column(db.Date, primary_key=True)
+    strike_price = db.Column(db.Float, primary_key=True)
+
+class OptionBar(db.Model):
+    """One-minute bars of the mark (mid, or last without a two-sided quote) per strike"""
+    __tablename__ = 'spx_0dte_bars_1m'
+    __table_args__ = (
+        db.Index('ix_spx_0dte_bars_1m_strike_minute', 'exp_date', 'strike_price', 'minute'),
+    )
+    
+    minute = db.Column(db.DateTime(timezone=True), primary_key=True)
+    exp_date = db.Column(db.Date, primary_key=True)
+    strike_price = db.Column(db.Float, primary_key=True)
+    ticks = db.Column(db.Integer)
+    call_open = db.Column(db.Float)
+    call_high = db.Column(db.Float)
+    call_low = db.Column(db.Float)
+    call_close = db.Column(db.Float)
+    call_iv = db.Column(db.Float)
+    call_delta = db.Column(db.Float)
+    put_open = db.Column(db.Float)
+    put_high = db.Column(db.Float)
+    put_low = db.Column(db.Float)
+    put_close = db.Column(db.Float)
+    put_iv = db.Column(db.Float)
+    put_delta = db.Column(db.Float)
+
 class Position(db.Model):
     __tablename__ = 'positions'
+    __table_args__ = (
+        db.Index('ix_positions_type_status', 'type', 'status'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     type = db.Column(db.String(20))
@@ -61,9 +110,18 @@ class Position(db.Model):
     long_put_strike = db.Column(db.Float)
     entry_price = db.Column(db.Float)
     entry_time = db.Column(db.DateTime(timezone=True))
+    position_uuid = db.Column(db.String(36), unique=True, index=True)
+    status = db.Column(db.String(10), default='open')
+    exit_time = db.Column(db.DateTime(timezone=True))
+    exit_price = db.Column(db.Float)
+    exp_date = db.Column(db.Date)
+    legs = db.Column(JSONB)
 
 class SPXAnalysis(db.Model):
     __tablename__ = 'spx_analysis'
+    __table_args__ = (
+        db.Index('ix_spx_analysis_timestamp', 'timestamp'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     timestamp = db.Column(db.DateTime(timezone=True))
@@ -72,6 +130,9 @@ class SPXAnalysis(db.Model):
     
 class SpreadData(db.Model):
     __tablename__ = 'spread_data'
+    __table_args__ = (
+        db.Index('ix_spread_data_type_timestamp', 'option_type', 'timestamp'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     timestamp = db.Column(db.DateTime(timezone=True))
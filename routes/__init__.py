@@ -1,4 +1,7 @@
-from flask import Blueprint, render_template
+from flask import Blueprint, Response, render_template, current_app, jsonify
+from analyzers import metrics
+from analyzers.persistence import analysis_writer
+from analyzers.positions import position_writer
 
 def create_blueprint():
     bp = Blueprint('main', __name__)
@@ -12,6 +15,22 @@ def create_blueprint():
     def analyzer_workspace():
         return render_template('analyzer_workspace.html')
 
+    @bp.route('/scheduler/status')
+    def scheduler_status():
+        scheduler = getattr(current_app, 'scheduler', None)
+        status = {
+            'running': scheduler is not None,
+            'analyzers': scheduler.status() if scheduler is not None else {},
+            'startup': getattr(current_app, 'startup_timings', {}),
+            'persistence': analysis_writer.stats(),
+            'position_writes': position_writer.stats()
+        }
+        return jsonify(status)
+
+    @bp.route('/metrics')
+    def metrics_endpoint():
+        return Response(metrics.registry.render(), content_type=metrics.CONTENT_TYPE)
+
     return bp
 
 def init_routes(app):
@@ -24,9 +43,13 @@ def init_routes(app):
     from .skew import bp as skew_bp
     from .macro_overlay import bp as macro_overlay_bp
     from .iron_condor import bp as iron_condor_bp
+    from .short_vertical import bp as short_vertical_bp
+    from .api import bp as api_bp
     
     app.register_blueprint(spread_bp, url_prefix='/spread')
     app.register_blueprint(bs_deviation_bp, url_prefix='/bs-deviation')
     app.register_blueprint(skew_bp, url_prefix='/skew')
     app.register_blueprint(macro_overlay_bp, url_prefix='/macro-overlay')
     app.register_blueprint(iron_condor_bp, url_prefix='/iron-condor')
+    app.register_blueprint(short_vertical_bp, url_prefix='/short-vertical')
+    app.register_blueprint(api_bp, url_prefix='/api')
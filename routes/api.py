@@ -1,63 +1,244 @@
-from flask import Blueprint, request, jsonify
-from models import SPXAnalysis, SPXOptionStream, SPXSpot, Position
-from datetime import datetime, timedelta
+import json
+from flask import Blueprint, Response, current_app, request, jsonify, stream_with_context
+from models import db, OptionBar, SPXAnalysis, SPXOptionStream, SPXSpot, SpreadData, Position
+from datetime import datetime, timedelta, timezone
 from analyzers.base import BaseAnalyzer
+from analyzers.chain import ChainSnapshot, chain_columns
+from analyzers.risk import risk_engine
+from analyzers.snapshot_cache import chain_cache
+from routes.streaming import NDJSON_MIMETYPE, ndjson_response
+from routes.columnar import (
+    ARROW_MIMETYPE, COLUMNS_MIMETYPE, arrow_available, arrow_stream, columns_stream
+)
 
 bp = Blueprint('api', __name__)
 
 @bp.route('/analyzer/<name>/results')
 def analyzer_results(name):
-    """Get latest results for specific analyzer"""
+    """
+    Get recent results for a specific analyzer.
+    
+    `?format=ndjson` (or Accept: application/x-ndjson) streams one result
+    per line from a server-side cursor; `limit` is then optional.
+    """
     hours = request.args.get('hours', default=24, type=int)
-    limit = request.args.get('limit', default=100, type=int)
+    streaming = _export_format() == 'ndjson'
+    limit = request.args.get('limit', default=None if streaming else 100, type=int)
     
     cutoff = datetime.now() - timedelta(hours=hours)
     
-    results = SPXAnalysis.query.filter(
-        SPXAnalysis.analyzer_name == name,
+    query = db.select(SPXAnalysis.opportunity).where(
+        SPXAnalysis.opportunity['analyzer'].as_string() == name,
         SPXAnalysis.timestamp >= cutoff
-    ).order_by(SPXAnalysis.timestamp.desc()).limit(limit).all()
+    ).order_by(SPXAnalysis.timestamp.desc())
+    if limit:
+        query = query.limit(limit)
     
-    return jsonify([r.data for r in results])
+    if streaming:
+        batch_size = current_app.config.get('EXPORT_BATCH_SIZE', 5000)
+        result = db.session.execute(query.execution_options(yield_per=batch_size))
+        return ndjson_response(
+            [(row.opportunity or {}).get('data') for row in rows]
+            for rows in result.partitions()
+        )
+    
+    rows = db.session.execute(query).all()
+    return jsonify([(row.opportunity or {}).get('data') for row in rows])
+
+def _export_format():
+    """'json', 'ndjson', 'columns' or 'arrow', from ?format= or the Accept header"""
+    requested = request.args.get('format')
+    if requested:
+        return requested.lower()
+    best = request.accept_mimetypes.best_match(
+        ['application/json', NDJSON_MIMETYPE, COLUMNS_MIMETYPE, ARROW_MIMETYPE], default='application/json'
+    )
+    return {NDJSON_MIMETYPE: 'ndjson', COLUMNS_MIMETYPE: 'columns', ARROW_MIMETYPE: 'arrow'}.get(best, 'json')
+
+def _chain_batches(query, batch_size):
+    """ChainSnapshots of at most batch_size rows, streamed from the query result"""
+    result = db.session.execute(query.execution_options(yield_per=batch_size))
+    empty = True
+    for rows in result.partitions():
+        empty = False
+        yield ChainSnapshot.from_rows(rows)
+    if empty:
+        # Binary readers still need the column layout
+        yield ChainSnapshot.empty()
+
+def _json_rows(snapshot, sides):
+    """One JSON object per row and side, in the original response shape"""
+    timestamps = [
+        datetime.fromtimestamp(us / 1e6, tz=timezone.utc).isoformat()
+        for us in snapshot.timestamp.tolist()
+    ]
+    expiries = [str(d) for d in snapshot.exp_date.tolist()]
+    strikes = snapshot.strike.tolist()
+    rows = []
+    for side in sides:
+        columns = snapshot.call if side == 'call' else snapshot.put
+        values = zip(*(
+            [None if v != v else v for v in getattr(columns, f).tolist()]
+            for f in ('iv', 'delta', 'gamma', 'bid', 'ask', 'oi')
+        ))
+        for strike, expiry, ts, (iv, delta, gamma, bid, ask, oi) in zip(strikes, expiries, timestamps, values):
+            rows.append({
+                'strike': strike,
+                'type': side,
+                'expiry': expiry,
+                'iv': iv,
+                'delta': delta,
+                'gamma': gamma,
+                'bid': bid,
+                'ask': ask,
+                # The feed has no volume column
+                'volume': None,
+                'oi': None if oi is None else int(oi),
+                'timestamp': ts
+            })
+    return rows
 
 @bp.route('/options/stream')
 def options_stream():
-    """Get recent options chain data"""
+    """
+    Get recent options chain data.
+    
+    JSON by default. `?format=ndjson` (or Accept: application/x-ndjson)
+    returns one option per line. `?format=columns` (or Accept:
+    application/x-spx-columns) returns NumPy column frames and
+    `?format=arrow` (or Accept: application/vnd.apache.arrow.stream) an
+    Arrow IPC stream; both use epoch timestamps. Every format is streamed
+    batch by batch from the query.
+    """
     minutes = request.args.get('minutes', default=5, type=int)
     strike_min = request.args.get('strike_min', type=float)
     strike_max = request.args.get('strike_max', type=float)
     option_type = request.args.get('type')
+    export_format = _export_format()
+    
+    if option_type:
+        side = 'call' if option_type.lower() in ('call', 'c') else 'put' if option_type.lower() in ('put', 'p') else None
+        if side is None:
+            return jsonify({'error': f"Unknown option type {option_type}"}), 400
+        sides = (side,)
+    else:
+        sides = ('call', 'put')
+    
+    if export_format not in ('json', 'ndjson', 'columns', 'arrow'):
+        return jsonify({'error': f"Unknown format {export_format}"}), 400
+    if export_format == 'arrow' and not arrow_available():
+        return jsonify({'error': 'Arrow export requires pyarrow'}), 406
     
     cutoff = datetime.now() - timedelta(minutes=minutes)
-    query = SPXOptionStream.query.filter(
-        SPXOptionStream.timestamp >= cutoff
+    query = db.select(*chain_columns()).where(SPXOptionStream.timestamp >= cutoff)
+    
+    if strike_min is not None:
+        query = query.where(SPXOptionStream.strike_price >= strike_min)
+    if strike_max is not None:
+        query = query.where(SPXOptionStream.strike_price <= strike_max)
+    
+    query = query.order_by(
+        SPXOptionStream.timestamp,
+        SPXOptionStream.exp_date,
+        SPXOptionStream.strike_price
     )
+    batch_size = current_app.config.get('EXPORT_BATCH_SIZE', 5000)
+    batches = _chain_batches(query, batch_size)
     
-    if strike_min:
-        query = query.filter(SPXOptionStream.strike >= strike_min)
-    if strike_max:
-        query = query.filter(SPXOptionStream.strike <= strike_max)
-    if option_type:
-        query = query.filter(SPXOptionStream.option_type == option_type)
+    if export_format == 'columns':
+        body = columns_stream(b.export_columns(sides) for b in batches)
+        return Response(stream_with_context(body), mimetype=COLUMNS_MIMETYPE)
+    if export_format == 'arrow':
+        body = arrow_stream(b.export_columns(sides) for b in batches)
+        return Response(stream_with_context(body), mimetype=ARROW_MIMETYPE)
+    if export_format == 'ndjson':
+        return ndjson_response(_json_rows(b, sides) for b in batches)
+    
+    def generate():
+        yield '['
+        first = True
+        for batch in batches:
+            rows = _json_rows(batch, sides)
+            if not rows:
+                continue
+            chunk = json.dumps(rows)[1:-1]
+            yield chunk if first else ',' + chunk
+            first = False
+        yield ']'
+    
+    return Response(stream_with_context(generate()), mimetype='application/json')
+
+@bp.route('/bars')
+def option_bars():
+    """
+    One-minute bars for one strike from spx_0dte_bars_1m.
+    
+    `strike` is required; `exp_date` defaults to the nearest expiration
+    with bars and `hours` (default 8) limits how far back to read.
+    """
+    strike = request.args.get('strike', type=float)
+    if strike is None:
+        return jsonify({'error': 'strike is required'}), 400
+    hours = request.args.get('hours', default=8, type=int)
+    cutoff = datetime.now(timezone.utc) - timedelta(hours=hours)
+    
+    query = db.select(OptionBar).where(OptionBar.strike_price == strike, OptionBar.minute >= cutoff)
+    exp_date = request.args.get('exp_date')
+    if exp_date:
+        query = query.where(OptionBar.exp_date == exp_date)
+    else:
+        nearest = db.select(db.func.min(OptionBar.exp_date)).where(
+            OptionBar.strike_price == strike, OptionBar.minute >= cutoff
+        ).scalar_subquery()
+        query = query.where(OptionBar.exp_date == nearest)
     
-    options = query.order_by(
-        SPXOptionStream.option_type,
-        SPXOptionStream.strike
-    ).all()
+    bars = db.session.execute(query.order_by(OptionBar.minute)).scalars().all()
+    return jsonify([{
+        'minute': bar.minute.isoformat(),
+        'exp_date': bar.exp_date.isoformat(),
+        'ticks': bar.ticks,
+        'call': {'open': bar.call_open, 'high': bar.call_high, 'low': bar.call_low,
+                 'close': bar.call_close, 'iv': bar.call_iv, 'delta': bar.call_delta},
+        'put': {'open': bar.put_open, 'high': bar.put_high, 'low': bar.put_low,
+                'close': bar.put_close, 'iv': bar.put_iv, 'delta': bar.put_delta}
+    } for bar in bars])
+
+@bp.route('/spread-stats')
+def spread_stats():
+    """
+    Per-minute credit statistics from spread_data.
+    
+    Optional filters: option_type (call/put), point_spread, delta_bucket
+    and hours (default 8).
+    """
+    hours = request.args.get('hours', default=8, type=int)
+    cutoff = datetime.now(timezone.utc) - timedelta(hours=hours)
     
+    query = db.select(SpreadData).where(SpreadData.timestamp >= cutoff)
+    option_type = request.args.get('option_type')
+    if option_type:
+        query = query.where(SpreadData.option_type == option_type.lower())
+    point_spread = request.args.get('point_spread', type=int)
+    if point_spread is not None:
+        query = query.where(SpreadData.point_spread == point_spread)
+    delta_bucket = request.args.get('delta_bucket', type=float)
+    if delta_bucket is not None:
+        query = query.where(SpreadData.delta_bucket == delta_bucket)
+    
+    rows = db.session.execute(
+        query.order_by(SpreadData.timestamp, SpreadData.option_type, SpreadData.delta_bucket, SpreadData.point_spread)
+    ).scalars().all()
+    # spread_data's Float(precision, scale) columns come back as Decimals
+    as_float = lambda value: None if value is None else float(value)
     return jsonify([{
-        'strike': o.strike,
-        'type': o.option_type,
-        'expiry': o.expiry_date.isoformat(),
-        'iv': o.iv,
-        'delta': o.delta,
-        'gamma': o.gamma,
-        'bid': o.bid,
-        'ask': o.ask,
-        'volume': o.volume,
-        'oi': o.open_interest,
-        'timestamp': o.timestamp.isoformat()
-    } for o in options])
+        'timestamp': row.timestamp.isoformat(),
+        'option_type': row.option_type,
+        'delta_bucket': as_float(row.delta_bucket),
+        'point_spread': row.point_spread,
+        'avg_credit': as_float(row.avg_credit),
+        'high_credit': as_float(row.high_credit),
+        'low_credit': as_float(row.low_credit)
+    } for row in rows])
 
 @bp.route('/spot')
 def spot_price():
@@ -79,15 +260,29 @@ def get_positions():
     ).order_by(Position.entry_time.desc()).limit(limit).all()
     
     return jsonify([{
-        'id': p.id,
-        'symbol': p.symbol,
-        'type': p.position_type,
-        'entry_time': p.entry_time.isoformat(),
+        'id': p.position_uuid or p.id,
+        'type': p.type,
+        'entry_time': p.entry_time.isoformat() if p.entry_time else None,
         'entry_price': p.entry_price,
         'exit_time': p.exit_time.isoformat() if p.exit_time else None,
         'exit_price': p.exit_price,
-        'quantity': p.quantity,
         'status': p.status,
-        'analyzer': p.analyzer_source,
+        'strikes': {
+            'short_call': p.short_call_strike,
+            'long_call': p.long_call_strike,
+            'short_put': p.short_put_strike,
+            'long_put': p.long_put_strike
+        },
         'legs': p.legs
-    } for p in positions])
\ No newline at end of file
+    } for p in positions])
+
+@bp.route('/positions/risk')
+def positions_risk():
+    """Mark-to-market P&L and greeks of open positions against the latest chain"""
+    strategy = request.args.get('strategy')
+    market_data = chain_cache.peek()
+    if market_data is None:
+        return jsonify({'error': 'No market data loaded yet'}), 503
+    risk = risk_engine.mark(market_data, strategy)
+    risk['snapshot_version'] = market_data.get('snapshot_version')
+    return jsonify(risk)
@@ -0,0 +1,113 @@
+"""
+Columnar binary encodings for chain exports.
+
+Two formats are supported:
+
+- `application/x-spx-columns`: dependency-free NumPy column frames.
+  The stream starts with the 4-byte magic b'SPXC' and a one-byte format
+  version. It is followed by one frame per batch of rows. Each frame is a
+  little-endian uint32 header length, a JSON header
+  ({"rows": n, "columns": [{"name", "dtype", "nbytes"}]}), then the raw
+  column buffers in header order. read_columns() decodes it.
+- `application/vnd.apache.arrow.stream`: Arrow IPC stream, available
+  when pyarrow is installed.
+"""
+import json
+import struct
+import numpy as np
+
+COLUMNS_MIMETYPE = 'application/x-spx-columns'
+ARROW_MIMETYPE = 'application/vnd.apache.arrow.stream'
+
+MAGIC = b'SPXC'
+FORMAT_VERSION = 1
+
+# End-of-stream marker of the Arrow IPC streaming format
+_ARROW_EOS = b'\xff\xff\xff\xff\x00\x00\x00\x00'
+
+
+def _little_endian(array):
+    array = np.ascontiguousarray(array)
+    if array.dtype.byteorder == '>':
+        array = array.astype(array.dtype.newbyteorder('<'))
+    return array
+
+
+def encode_frame(columns):
+    """One frame holding equal-length 1-D arrays, keyed by column name"""
+    arrays = {name: _little_endian(array) for name, array in columns.items()}
+    rows = len(next(iter(arrays.values()))) if arrays else 0
+    header = json.dumps({
+        'rows': rows,
+        'columns': [
+            {'name': name, 'dtype': array.dtype.str, 'nbytes': array.nbytes}
+            for name, array in arrays.items()
+        ]
+    }).encode()
+    return struct.pack('<I', len(header)) + header + b''.join(a.tobytes() for a in arrays.values())
+
+
+def columns_stream(batches):
+    """Yield the x-spx-columns encoding of an iterable of column dicts"""
+    yield MAGIC + bytes([FORMAT_VERSION])
+    for columns in batches:
+        yield encode_frame(columns)
+
+
+def read_columns(data):
+    """Decode x-spx-columns bytes into a dict of concatenated NumPy arrays"""
+    view = memoryview(data)
+    if bytes(view[:4]) != MAGIC:
+        raise ValueError("Not an SPX columns stream")
+    if view[4] != FORMAT_VERSION:
+        raise ValueError(f"Unsupported SPX columns version {view[4]}")
+
+    offset = 5
+    parts = {}
+    while offset < len(view):
+        (header_len,) = struct.unpack_from('<I', view, offset)
+        offset += 4
+        header = json.loads(bytes(view[offset:offset + header_len]))
+        offset += header_len
+        for column in header['columns']:
+            array = np.frombuffer(view[offset:offset + column['nbytes']], dtype=column['dtype'])
+            parts.setdefault(column['name'], []).append(array)
+            offset += column['nbytes']
+    return {name: np.concatenate(arrays) for name, arrays in parts.items()}
+
+
+def arrow_available():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def arrow_stream(batches):
+    """
+    Yield an Arrow IPC stream of an iterable of column dicts.
+
+    `timestamp` is typed as timestamp[us, UTC] and `exp_date` as date32;
+    both keep their epoch integer values.
+    """
+    import pyarrow as pa
+
+    schema = None
+    for columns in batches:
+        arrays, names = [], []
+        for name, array in columns.items():
+            if name == 'timestamp':
+                arrays.append(pa.array(array, type=pa.int64()).cast(pa.timestamp('us', tz='UTC')))
+            elif name == 'exp_date':
+                arrays.append(pa.array(array, type=pa.int32()).cast(pa.date32()))
+            else:
+                arrays.append(pa.array(array))
+            names.append(name)
+        batch = pa.RecordBatch.from_arrays(arrays, names=names)
+        if schema is None:
+            schema = batch.schema
+            yield schema.serialize().to_pybytes()
+        yield batch.serialize().to_pybytes()
+    if schema is not None:
+        yield _ARROW_EOS
@@ -1,4 +1,6 @@
 from flask import Blueprint, render_template, current_app, jsonify, request
+from routes.streaming import stream_results
+from routes.versioning import versioned_json
 from datetime import datetime, timedelta
 from models import SPXOptionStream
 
@@ -20,19 +22,24 @@ def iron_condor_dashboard():
 @bp.route('/status')
 def get_status():
     analyzer = current_app.analyzers.get('iron_condor')
-    return jsonify({
-        'spx_price': analyzer.current_analysis.get('spx_price'),
-        'last_analysis': analyzer.current_analysis.get('timestamp')
+    return versioned_json(analyzer, 'status', lambda results: {
+        'spx_price': results.get('spx_price'),
+        'last_analysis': results.get('timestamp')
     })
 
 @bp.route('/analysis')
 def get_analysis():
     analyzer = current_app.analyzers.get('iron_condor')
-    return jsonify({
-        'scored_trades': analyzer.current_analysis.get('scored_trades', []),
-        'current_positions': analyzer.current_analysis.get('current_positions', [])
+    return versioned_json(analyzer, 'analysis', lambda results: {
+        'scored_trades': results.get('scored_trades') or [],
+        'current_positions': results.get('current_positions', [])
     })
 
+@bp.route('/stream')
+def stream():
+    analyzer = current_app.analyzers.get('iron_condor')
+    return stream_results(analyzer)
+
 @bp.route('/analyze', methods=['POST'])
 def analyze_now():
     analyzer = current_app.analyzers.get('iron_condor')
@@ -48,4 +55,5 @@ def add_position():
 @bp.route('/position/<position_id>/close', methods=['POST'])
 def close_position(position_id):
     analyzer = current_app.analyzers.get('iron_condor')
-    return jsonify(analyzer.close_position(position_id))
\ No newline at end of file
+    exit_price = (request.get_json(silent=True) or {}).get('exit_price')
+    return jsonify(analyzer.close_position(position_id, exit_price))
\ No newline at end of file
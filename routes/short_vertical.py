@@ -0,0 +1,55 @@
+from flask import Blueprint, render_template, current_app, jsonify, request
+from routes.streaming import stream_results
+from routes.versioning import versioned_json
+
+bp = Blueprint('short_vertical', __name__)
+
+@bp.route('/')
+def short_vertical_dashboard():
+    analyzer = current_app.analyzers.get('short_vertical')
+    if not analyzer:
+        return "Short Vertical Analyzer not initialized", 500
+        
+    results = analyzer.get_latest_results()
+    
+    return render_template('analyzers/short_vertical.html',
+                         analyzer=analyzer,
+                         results=results,
+                         current_app=current_app)
+
+@bp.route('/status')
+def get_status():
+    analyzer = current_app.analyzers.get('short_vertical')
+    return versioned_json(analyzer, 'status', analyzer.get_analyzer_status)
+
+@bp.route('/analysis')
+def get_analysis():
+    analyzer = current_app.analyzers.get('short_vertical')
+    return versioned_json(analyzer, 'analysis', lambda results: {
+        'trade_opportunities': results.get('trade_opportunities', {}),
+        'put_trade_opportunities': results.get('put_trade_opportunities', {}),
+        'current_positions': results.get('current_positions', [])
+    })
+
+@bp.route('/stream')
+def stream():
+    analyzer = current_app.analyzers.get('short_vertical')
+    return stream_results(analyzer)
+
+@bp.route('/analyze', methods=['POST'])
+def analyze_now():
+    analyzer = current_app.analyzers.get('short_vertical')
+    result = analyzer.analyze_market()
+    return jsonify({'status': 'completed', 'timestamp': result['timestamp']})
+
+@bp.route('/position', methods=['POST'])
+def add_position():
+    analyzer = current_app.analyzers.get('short_vertical')
+    data = request.get_json()
+    return jsonify(analyzer.add_position(data))
+
+@bp.route('/position/<position_id>/close', methods=['POST'])
+def close_position(position_id):
+    analyzer = current_app.analyzers.get('short_vertical')
+    exit_price = (request.get_json(silent=True) or {}).get('exit_price')
+    return jsonify(analyzer.close_position(position_id, exit_price))
\ No newline at end of file
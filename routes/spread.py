@@ -1,5 +1,7 @@
 from flask import Blueprint, render_template
 from flask import current_app
+from routes.streaming import stream_results
+from routes.versioning import versioned_json
 
 bp = Blueprint('spread', __name__)
 
@@ -14,4 +16,9 @@ def spread_dashboard():
 @bp.route('/data')
 def spread_data():
     analyzer = current_app.analyzers['spread']
-    return analyzer.get_latest_results()
\ No newline at end of file
+    return versioned_json(analyzer, 'data', dict)
+
+@bp.route('/stream')
+def spread_stream():
+    analyzer = current_app.analyzers['spread']
+    return stream_results(analyzer)
@@ -0,0 +1,44 @@
+import json
+from flask import Response, current_app, request, stream_with_context
+
+NDJSON_MIMETYPE = 'application/x-ndjson'
+
+
+def stream_results(analyzer):
+    """
+    Server-sent event stream of an analyzer's published results.
+
+    Honours the Last-Event-ID header browsers send when EventSource
+    reconnects, so a client only gets a result it has not seen yet.
+    """
+    last_event_id = request.headers.get('Last-Event-ID')
+    try:
+        last_event_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        last_event_id = None
+
+    heartbeat = current_app.config.get('SSE_HEARTBEAT_INTERVAL', 15)
+    return Response(
+        analyzer.channel.subscribe(last_event_id, heartbeat=heartbeat),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            # Stop nginx from buffering the stream
+            'X-Accel-Buffering': 'no'
+        }
+    )
+
+
+def ndjson_response(batches):
+    """
+    Stream newline-delimited JSON, one line per dict.
+
+    `batches` yields lists of dicts (e.g. one per cursor partition); each
+    batch is encoded and sent as soon as it is read, so memory stays at one
+    batch and the first line goes out before the query is exhausted.
+    """
+    def generate():
+        for batch in batches:
+            if batch:
+                yield ''.join(json.dumps(item, default=str) + '\n' for item in batch)
+    return Response(stream_with_context(generate()), mimetype=NDJSON_MIMETYPE)
@@ -0,0 +1,86 @@
+import uuid
+from flask import Response, current_app, request
+
+# Serialized full payload per (analyzer, endpoint), reused until the result version changes
+_bodies = {}
+
+# Result versions count from 0 in every process, so versions handed to
+# clients are tagged with this process's boot id: another gunicorn worker,
+# or this one after a restart, never matches them
+BOOT_ID = uuid.uuid4().hex[:12]
+
+
+def version_tag(version):
+    """Client-facing token for a result version of this process"""
+    return f"{BOOT_ID}-{version}"
+
+
+def parse_version_tag(tag):
+    """The result version a token names, or None if it is not from this process"""
+    boot_id, _, version = (tag or '').rpartition('-')
+    if boot_id != BOOT_ID or not version.isdigit():
+        return None
+    return int(version)
+
+
+def versioned_json(analyzer, endpoint, build):
+    """
+    JSON response for an analyzer endpoint, built by `build(results)` from
+    the analyzer's last published results.
+
+    The version and the results are read together from
+    analyzer.published, so a cycle that publishes meanwhile can never get
+    its results cached or served under an older version.
+
+    - Payloads carry `version`, the result version tagged with this
+      process's boot id (version_tag). The ETag is the analyzer name plus
+      that token; a matching If-None-Match gets a 304 without building or
+      serializing anything.
+    - `?since=<version>` replaces the analyzer's delta collections with
+      `changed`/`removed` lists relative to that version. If the token is
+      from another process or no longer in the history, the full payload
+      is returned with `full: true`.
+    - Full payloads are serialized once per version and endpoint.
+    """
+    # Refreshes the result first when no scheduler is running
+    fallback = analyzer.get_latest_results()
+    version, results = analyzer.published
+    if results is None:
+        results = fallback
+    etag = f"{analyzer.name}-{version_tag(version)}"
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+        response.set_etag(etag)
+        return response
+
+    since = request.args.get('since')
+    if since is not None:
+        payload = build(results)
+        since_version = parse_version_tag(since)
+        delta = None if since_version is None else analyzer.changes_since(since_version)
+        payload['version'] = version_tag(version)
+        payload['since'] = since
+        payload['full'] = delta is None
+        if delta is not None:
+            names = [name for name in analyzer.delta_collections if name in payload]
+            for name in names:
+                del payload[name]
+            payload['changed'] = {name: delta['changed'].get(name, []) for name in names}
+            payload['removed'] = {name: delta['removed'].get(name, []) for name in names}
+        body = current_app.json.dumps(payload)
+    else:
+        key = (id(analyzer), endpoint)
+        cached = _bodies.get(key)
+        if cached is not None and cached[0] == version:
+            body = cached[1]
+        else:
+            payload = build(results)
+            payload['version'] = version_tag(version)
+            body = current_app.json.dumps(payload)
+            _bodies[key] = (version, body)
+
+    response = Response(body, mimetype='application/json')
+    response.set_etag(etag)
+    # Let browsers revalidate with If-None-Match on every poll
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
@@ -1,22 +1,33 @@
 document.addEventListener('DOMContentLoaded', function() {
     const ctx = document.getElementById('spread-chart').getContext('2d');
     let chart;
-    let currentData = JSON.parse('{{ results | tojson | safe }}');
+    let currentData = null;
+    
+    // Put spread credits by strike, one dataset per width
+    function chartData(spreads) {
+        const strikes = [...new Set(spreads.map(s => s.strike))].sort((a, b) => a - b);
+        const widths = [...new Set(spreads.map(s => s.width))].sort((a, b) => a - b);
+        const datasets = widths.map((width, i) => {
+            const credits = new Map(
+                spreads.filter(s => s.width === width).map(s => [s.strike, s.credit])
+            );
+            const hue = (210 + i * 40) % 360;
+            return {
+                label: `${width}-wide credit`,
+                data: strikes.map(strike => credits.has(strike) ? credits.get(strike) : null),
+                backgroundColor: `hsla(${hue}, 70%, 55%, 0.5)`,
+                borderColor: `hsla(${hue}, 70%, 45%, 1)`,
+                borderWidth: 1
+            };
+        });
+        return { labels: strikes, datasets: datasets };
+    }
     
     // Initialize chart
     function initChart() {
         chart = new Chart(ctx, {
             type: 'bar',
-            data: {
-                labels: currentData.put_spreads.map(s => s.strike),
-                datasets: [{
-                    label: 'Credit Received',
-                    data: currentData.put_spreads.map(s => s.credit),
-                    backgroundColor: 'rgba(54, 162, 235, 0.5)',
-                    borderColor: 'rgba(54, 162, 235, 1)',
-                    borderWidth: 1
-                }]
-            },
+            data: chartData(currentData.put_spreads),
             options: {
                 responsive: true,
                 plugins: {
@@ -44,22 +55,29 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     }
     
+    // Draw a result, creating the chart on first use
+    function render(data) {
+        currentData = data;
+        if (!currentData.put_spreads) {
+            return;
+        }
+        
+        if (chart) {
+            updateChart();
+        } else {
+            initChart();
+        }
+        
+        // Update last updated time
+        document.querySelector('.last-updated').textContent = 
+            `Last updated: ${new Date(currentData.timestamp).toLocaleString()}`;
+    }
+    
     // Refresh data from server
     async function refreshData() {
         try {
             const response = await fetch('/spread/data');
-            currentData = await response.json();
-            
-            if (chart) {
-                updateChart();
-            } else {
-                initChart();
-            }
-            
-            // Update last updated time
-            document.querySelector('.last-updated').textContent = 
-                `Last updated: ${new Date(currentData.timestamp).toLocaleString()}`;
-                
+            render(await response.json());
         } catch (error) {
             console.error('Error refreshing data:', error);
         }
@@ -67,8 +85,9 @@ document.addEventListener('DOMContentLoaded', function() {
     
     // Update existing chart with new data
     function updateChart() {
-        chart.data.labels = currentData.put_spreads.map(s => s.strike);
-        chart.data.datasets[0].data = currentData.put_spreads.map(s => s.credit);
+        const data = chartData(currentData.put_spreads);
+        chart.data.labels = data.labels;
+        chart.data.datasets = data.datasets;
         chart.update();
     }
     
@@ -76,8 +95,19 @@ document.addEventListener('DOMContentLoaded', function() {
     document.getElementById('refresh-btn').addEventListener('click', refreshData);
     
     // Initial setup
-    initChart();
+    refreshData();
     
-    // Auto-refresh every 30 seconds
-    setInterval(refreshData, 30000);
+    // New results are pushed by the server; poll only without EventSource
+    if (window.EventSource) {
+        const stream = new EventSource('/spread/stream');
+        stream.addEventListener('result', event => {
+            try {
+                render(JSON.parse(event.data));
+            } catch (error) {
+                console.error('Error reading pushed data:', error);
+            }
+        });
+    } else {
+        setInterval(refreshData, 30000);
+    }
 });
\ No newline at end of file
@@ -0,0 +1,58 @@
+"""
+Shared fixtures: a Flask app on a throwaway SQLite database and synthetic
+chains from benchmarks/synthetic.py.
+
+The database URL is set before config.py is imported, so no PostgreSQL
+server is needed. JSONB columns are created as JSON on SQLite.
+"""
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+_db_dir = tempfile.mkdtemp(prefix='spx-tests-')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_db_dir, 'spx.db')}"
+os.environ['SCHEDULER_ENABLED'] = 'False'
+os.environ['ROLLUP_ENABLED'] = 'False'
+
+import pytest
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.ext.compiler import compiles
+
+
+@compiles(JSONB, 'sqlite')
+def _jsonb_on_sqlite(type_, compiler, **kw):
+    return 'JSON'
+
+
+@pytest.fixture(scope='session')
+def app():
+    from flaskdashboard import create_app
+    return create_app()
+
+
+@pytest.fixture
+def db(app, monkeypatch):
+    """Empty tables in an app context, with fresh shared chain state"""
+    from models import db as database, SPXOptionStream
+    from analyzers.ingest import chain_loader
+    from analyzers.snapshot_cache import SnapshotCache
+
+    with app.app_context():
+        database.drop_all()
+        database.create_all()
+        chain_loader.use_model(SPXOptionStream)
+        monkeypatch.setattr('analyzers.base.chain_cache', SnapshotCache())
+        yield database
+        database.session.remove()
+
+
+def insert_stream(database, rows):
+    """Write synthetic rows to spx_0dte_stream"""
+    from models import SPXOptionStream
+    from benchmarks.synthetic import rows_to_records
+
+    database.session.execute(database.insert(SPXOptionStream), rows_to_records(rows))
+    database.session.commit()
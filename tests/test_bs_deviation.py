@@ -0,0 +1,12 @@
+import json
+from analyzers.bs_deviation import BSDeviationAnalyzer
+from benchmarks.synthetic import synthetic_market_data
+
+
+def test_historical_snapshot_is_priced_at_quote_time():
+    # The synthetic session is in 2024; pricing at the wall clock would give T = 0
+    results = BSDeviationAnalyzer().analyze(synthetic_market_data(strikes=100, expirations=2))
+    assert 'error' not in results
+    assert results['summary']['priced_count'] > 100
+    # Strictly valid JSON: no NaN anywhere
+    json.dumps(results, allow_nan=False)
@@ -0,0 +1,32 @@
+from datetime import timedelta
+import numpy as np
+from analyzers.chain import ChainSnapshot
+from analyzers.skew import SkewAnalyzer
+from benchmarks.synthetic import DEFAULT_START, synthetic_rows
+
+
+def _two_sessions():
+    # Day one lists the 1st and 2nd; day two quotes only the 2nd
+    day_one, _ = synthetic_rows(strikes=20, expirations=2)
+    day_two, _ = synthetic_rows(strikes=20, start=DEFAULT_START + timedelta(days=1))
+    return ChainSnapshot.from_rows(day_one + day_two)
+
+
+def test_expiry_defaults_to_current_expiration():
+    chain = _two_sessions()
+    today = np.datetime64((DEFAULT_START + timedelta(days=1)).date(), 'D')
+    assert chain.current_expiration() == today
+    assert chain.expiry().exp_date == today
+
+
+def test_expiry_falls_back_to_latest_when_all_expired():
+    rows, _ = synthetic_rows(strikes=20, expirations=2, exp_date=DEFAULT_START.date() - timedelta(days=3))
+    chain = ChainSnapshot.from_rows(rows)
+    assert chain.current_expiration() == chain.expirations()[-1]
+    assert len(chain.expiry()) == 20
+
+
+def test_skew_primary_expiry_is_current():
+    from analyzers.chain import MarketData
+    results = SkewAnalyzer().analyze(MarketData(_two_sessions(), spx_price=5000.0))
+    assert results['primary_expiry'] == str((DEFAULT_START + timedelta(days=1)).date())
@@ -0,0 +1,33 @@
+from datetime import timedelta
+import numpy as np
+from analyzers.ingest import QuoteBook
+from benchmarks.synthetic import DEFAULT_START, synthetic_rows
+
+
+def test_merge_keeps_newest_quote():
+    first, _ = synthetic_rows(strikes=10, ticks=2)
+    book = QuoteBook()
+    assert book.merge(first) == 20
+    assert len(book) == 10
+    newest = max(row[0] for row in first)
+    assert set(book.snapshot().timestamp.tolist()) == {int(newest.timestamp() * 1e6)}
+    # Older rows never replace newer ones
+    assert book.merge(first[:10]) == 0
+
+
+def test_merge_drops_expired_expirations():
+    day_one, _ = synthetic_rows(strikes=10, expirations=2)
+    day_two, _ = synthetic_rows(strikes=10, start=DEFAULT_START + timedelta(days=1))
+    book = QuoteBook()
+    book.merge(day_one)
+    assert len(book) == 20
+
+    book.merge(day_two)
+    snapshot = book.snapshot()
+    assert len(book) == 10
+    assert set(snapshot.exp_date.astype(str)) == {str((DEFAULT_START + timedelta(days=1)).date())}
+
+    # Late rows of an expired expiration are ignored
+    assert book.merge(day_one[:5]) == 0
+    assert len(book.snapshot()) == 10
+    assert np.all(snapshot.strike == book.snapshot().strike)
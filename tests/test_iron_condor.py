@@ -0,0 +1,98 @@
+import pytest
+from analyzers.iron_condor import IroncondorAnalyzer
+from benchmarks.synthetic import synthetic_market_data
+
+PARAMS = dict(
+    IroncondorAnalyzer.STRATEGY_PARAMS,
+    delta_range={'min': 0.05, 'max': 0.45},
+    wing_width=10,
+    min_premium=0.5,
+    max_risk=30.0
+)
+
+
+def _legacy_condors(analyzer, data):
+    """The original nested-loop search, without the top-5 cut"""
+    params = analyzer.STRATEGY_PARAMS
+    calls = sorted(data['calls'], key=lambda x: x['strike'])
+    puts = sorted(data['puts'], key=lambda x: x['strike'], reverse=True)
+    in_range = lambda o: o.get('delta') and params['delta_range']['min'] <= abs(o['delta']) <= params['delta_range']['max']
+
+    trades = []
+    for short_put in filter(in_range, puts):
+        for short_call in filter(in_range, calls):
+            long_put = next((p for p in puts if p['strike'] == short_put['strike'] - params['wing_width']), None)
+            long_call = next((c for c in calls if c['strike'] == short_call['strike'] + params['wing_width']), None)
+            if not long_put or not long_call:
+                continue
+            premium = short_put['bid'] - long_put['ask'] + short_call['bid'] - long_call['ask']
+            max_loss = params['wing_width'] - premium
+            if premium >= params['min_premium'] and max_loss <= params['max_risk']:
+                trade = {
+                    'short_put': short_put['strike'],
+                    'short_call': short_call['strike'],
+                    'premium': round(premium, 2),
+                    'max_loss': round(max_loss, 2),
+                    'short_call_delta': short_call['delta'],
+                    'short_put_delta': short_put['delta'],
+                    'call_volume': 0,
+                    'put_volume': 0,
+                    'call_iv': short_call['volatility'],
+                    'put_iv': short_put['volatility'],
+                    'gamma': (short_call['gamma'] + short_put['gamma']) / 2,
+                    'theta': (short_call['theta'] + short_put['theta']) / 2
+                }
+                trade['score'] = analyzer.calculate_trade_score(trade)
+                trades.append(trade)
+    return trades
+
+
+def _key(trade):
+    return trade['short_put'], trade['short_call']
+
+
+def test_condor_grid_matches_legacy_loops():
+    analyzer = IroncondorAnalyzer()
+    analyzer.STRATEGY_PARAMS = PARAMS
+    data = synthetic_market_data(strikes=120)
+
+    legacy = {_key(t): t for t in _legacy_condors(analyzer, data)}
+    grid = analyzer._condor_search(data.chain.expiry(), data['spx_price'], [(10, 10)], top_k=10 ** 6)[0]
+    assert len(legacy) > 20
+    assert {_key(t): t for t in grid}.keys() == legacy.keys()
+
+    for trade in grid:
+        expected = legacy[_key(trade)]
+        assert trade['premium'] == expected['premium']
+        assert trade['max_loss'] == expected['max_loss']
+        assert trade['long_put'] == trade['short_put'] - 10
+        assert trade['long_call'] == trade['short_call'] + 10
+        assert trade['score'] == pytest.approx(expected['score'], abs=0.01)
+
+
+def test_top_k_matches_legacy_ranking():
+    analyzer = IroncondorAnalyzer()
+    analyzer.STRATEGY_PARAMS = PARAMS
+    data = synthetic_market_data(strikes=120)
+
+    # Stable sort: ties keep the legacy iteration order, as _top_k does
+    legacy = sorted(_legacy_condors(analyzer, data), key=lambda t: -t['score'])[:5]
+    top = analyzer._condor_search(data.chain.expiry(), data['spx_price'], [(10, 10)], top_k=5)[0]
+    assert [_key(t) for t in top] == [_key(t) for t in legacy]
+
+
+def test_cycle_searches_once():
+    analyzer = IroncondorAnalyzer()
+    analyzer.STRATEGY_PARAMS = PARAMS
+    data = synthetic_market_data(strikes=120)
+    searches = []
+    search = analyzer._condor_search
+    analyzer._condor_search = lambda *args, **kwargs: searches.append(args[2]) or search(*args, **kwargs)
+
+    analyzer.process_data_callback(data)
+    results = analyzer.current_analysis
+    assert searches == [[(w, w) for w in PARAMS['wing_widths']]]
+    assert [e['put_width'] for e in results['condor_frontier']] == PARAMS['wing_widths']
+    assert results['scored_trades']
+    expected = analyzer.find_iron_condor_opportunities(data)
+    assert [dict(t, timestamp=None) for t in results['scored_trades']] == [dict(t, timestamp=None) for t in expected]
@@ -0,0 +1,56 @@
+import numpy as np
+from datetime import timezone
+from models import SPXSpot
+from analyzers.chain import MarketData
+from analyzers.skew import SkewAnalyzer
+from benchmarks.synthetic import DEFAULT_START, synthetic_market_data, synthetic_rows
+from conftest import insert_stream
+
+
+def _legacy_built(market_data):
+    return dict.__contains__(market_data, 'calls') or dict.__contains__(market_data, 'puts')
+
+
+def test_truth_test_keeps_lists_unbuilt():
+    market_data = synthetic_market_data(strikes=20)
+    assert market_data
+    assert not _legacy_built(market_data)
+    assert market_data['calls']
+    assert _legacy_built(market_data)
+
+
+def test_empty_market_data_is_false():
+    from analyzers.chain import ChainSnapshot
+    assert not MarketData(ChainSnapshot.from_rows([]))
+
+
+def test_run_cycle_keeps_lists_unbuilt(db):
+    rows, _ = synthetic_rows(strikes=40)
+    insert_stream(db, rows)
+    analyzer = SkewAnalyzer()
+    analyzer.persist_results = False
+    results = analyzer.run_cycle()
+
+    assert results['skew_data']
+    market_data = analyzer.get_market_data()
+    assert isinstance(market_data, MarketData)
+    assert not _legacy_built(market_data)
+
+
+def test_spot_price_comes_from_spot_table(db):
+    rows, _ = synthetic_rows(strikes=40)
+    insert_stream(db, rows)
+    db.session.add(SPXSpot(timestamp=DEFAULT_START, price=5001.25))
+    db.session.commit()
+
+    assert SkewAnalyzer().get_market_data()['spx_price'] == 5001.25
+
+
+def test_spot_price_falls_back_to_parity_forward(db):
+    rows, spots = synthetic_rows(strikes=40)
+    insert_stream(db, rows)
+
+    spx_price = SkewAnalyzer().get_market_data()['spx_price']
+    # Not the top strike, but close to the underlying
+    assert abs(spx_price - spots[-1]) < 1.0
+    assert spx_price != max(row[2] for row in rows)
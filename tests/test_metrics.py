@@ -0,0 +1,19 @@
+import re
+
+
+def _types(text):
+    return dict(re.findall(r'^# TYPE (\S+) (\S+)$', text, re.MULTILINE))
+
+
+def test_monotonic_counts_are_counters(app):
+    text = app.test_client().get('/metrics').get_data(as_text=True)
+    types = _types(text)
+    for name in ('spx_snapshot_fetches_total', 'spx_vol_surface_builds_total',
+                 'spx_writer_written_total', 'spx_writer_dropped_total', 'spx_writer_failed_total'):
+        assert types[name] == 'counter'
+    for name in ('spx_snapshot_fetches', 'spx_vol_surface_builds', 'spx_writer_written'):
+        assert name not in types
+    # Point-in-time values stay gauges
+    assert types['spx_writer_depth'] == 'gauge'
+    assert types['spx_snapshot_version'] == 'gauge'
+    assert '# HELP spx_chain_rows_fetched Rows read from spx_0dte_latest' in text
@@ -0,0 +1,41 @@
+import atexit
+from models import SPXAnalysis
+from analyzers.metrics import writer_flush_seconds
+from analyzers.persistence import WriteBehindQueue
+
+
+def _row(i):
+    return {'spx_price': 5000.0 + i, 'opportunity': {'i': i}}
+
+
+def test_configure_keeps_pending_rows(app):
+    writer = WriteBehindQueue(SPXAnalysis, max_pending=10)
+    # Queue rows without a writer thread
+    for i in range(6):
+        writer._queue.put_nowait(_row(i))
+
+    writer.configure(max_pending=20, batch_size=50)
+    assert writer.max_pending == 20 and writer._queue.maxsize == 20
+    assert writer.batch_size == 50
+    assert writer._queue.qsize() == 6
+
+
+def test_exit_hook_registered_once(app, monkeypatch):
+    hooks = []
+    monkeypatch.setattr(atexit, 'register', hooks.append)
+    writer = WriteBehindQueue(SPXAnalysis, flush_interval=0.05)
+    for _ in range(3):
+        writer.start(app)
+        writer.stop()
+    assert hooks == [writer.stop]
+
+
+def test_flush_durations_are_recorded(db):
+    before = sum(count for suffix, labels, _, count in writer_flush_seconds.samples()
+                 if suffix == '_count' and labels == ('spx_analysis',))
+    writer = WriteBehindQueue(SPXAnalysis)
+    writer.put(_row(0))
+    writer.put(_row(1))
+    after = sum(count for suffix, labels, _, count in writer_flush_seconds.samples()
+                if suffix == '_count' and labels == ('spx_analysis',))
+    assert after == before + 2
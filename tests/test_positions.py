@@ -0,0 +1,74 @@
+from models import Position
+from analyzers.positions import PositionBook, PositionWriter
+
+CONDOR = {'premium': 1.5, 'short_put': 4950, 'long_put': 4930, 'short_call': 5050, 'long_call': 5070}
+
+
+def _book():
+    # Writers that are not started write synchronously
+    return PositionBook(PositionWriter(Position))
+
+
+def _status(database, position_id):
+    return database.session.execute(
+        database.select(Position.status).where(Position.position_uuid == position_id)
+    ).scalar()
+
+
+def test_close_checks_strategy(db):
+    book = _book()
+    position = book.add('iron_condor', CONDOR)
+    assert book.close(position['id'], strategy='short_vertical') is None
+    assert not book.get(position['id'])['closed']
+    assert book.close(position['id'], 2.0, strategy='iron_condor')['closed']
+    assert _status(db, position['id']) == 'closed'
+
+
+def test_refresh_picks_up_other_workers(db):
+    worker_a, worker_b = _book(), _book()
+    position = worker_a.add('iron_condor', CONDOR)
+
+    assert worker_b.refresh() == (1, 0)
+    assert [p['id'] for p in worker_b.positions('iron_condor', 'open')] == [position['id']]
+
+    worker_a.close(position['id'], 0.5)
+    assert worker_b.refresh() == (0, 1)
+    assert worker_b.positions('iron_condor', 'open') == []
+    # Closed elsewhere and persisted: evicted, but still found by close()
+    assert worker_b.get(position['id']) is None
+    assert worker_b.close(position['id'], strategy='iron_condor')['exit_price'] == 0.5
+    assert worker_b.close(position['id'], strategy='short_vertical') is None
+
+
+def test_closed_positions_are_evicted_once_persisted(db):
+    book = _book()
+    kept = book.add('iron_condor', CONDOR)
+    position = book.add('iron_condor', CONDOR)
+    closed = book.close(position['id'], 1.0)
+    assert closed['closed']
+    assert book.get(position['id']) is None
+    assert book.positions('iron_condor') == [kept] and len(book) == 1
+    assert book.positions(status='closed') == []
+    # Closing again reads the stored row
+    assert book.close(position['id'])['exit_price'] == 1.0
+
+
+def test_close_finds_positions_opened_elsewhere(db):
+    worker_a, worker_b = _book(), _book()
+    position = worker_a.add('iron_condor', CONDOR)
+    assert worker_b.get(position['id']) is None
+    assert worker_b.close(position['id'], 0.75, strategy='iron_condor')['closed']
+    assert _status(db, position['id']) == 'closed'
+    assert worker_a.refresh() == (0, 1)
+    assert len(worker_a) == 0
+
+
+def test_close_of_unwritten_position_is_not_lost(db):
+    book = _book()
+    # The insert is lost (e.g. its batch failed); only the close reaches the writer
+    book.writer.write_batch = lambda rows, write=book.writer.write_batch: write(
+        [r for r in rows if r['op'] != 'insert']
+    )
+    position = book.add('iron_condor', CONDOR)
+    book.close(position['id'], 1.0)
+    assert _status(db, position['id']) == 'closed'
@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+from analyzers.pricing import bs_price_greeks, implied_volatility
+
+
+def test_textbook_prices():
+    # Hull, Options, Futures and Other Derivatives: S=42, K=40, r=10%, T=0.5, sigma=20%
+    call = bs_price_greeks(42.0, 40.0, 0.5, 0.2, 0.1, True)['price']
+    put = bs_price_greeks(42.0, 40.0, 0.5, 0.2, 0.1, False)['price']
+    assert call == pytest.approx(4.76, abs=0.005)
+    assert put == pytest.approx(0.81, abs=0.005)
+    assert implied_volatility(4.76, 42.0, 40.0, 0.5, 0.1, True) == pytest.approx(0.2, abs=1e-3)
+    assert implied_volatility(0.81, 42.0, 40.0, 0.5, 0.1, False) == pytest.approx(0.2, abs=1e-3)
+
+
+def test_recovers_known_volatilities():
+    rng = np.random.default_rng(0)
+    n = 2000
+    S = 5000.0
+    K = S * np.exp(rng.uniform(-0.08, 0.08, n))
+    T = rng.uniform(0.5, 30, n) / 365
+    sigma = rng.uniform(0.08, 0.8, n)
+    is_call = rng.random(n) < 0.5
+    price = bs_price_greeks(S, K, T, sigma, 0.0, is_call)['price']
+
+    # Options with enough time value to pin sigma down; the solver stops
+    # within 1e-6 in price, so sigma is off by at most about 1e-6 / vega
+    vega = bs_price_greeks(S, K, T, sigma, 0.0, is_call)['vega']
+    solvable = vega > 1e-2
+    tolerance = 2e-6 / vega[solvable]
+    assert solvable.sum() > n // 2
+
+    solved = implied_volatility(price, S, K, T, 0.0, is_call)
+    assert np.all(np.abs(solved[solvable] - sigma[solvable]) <= tolerance)
+
+    # A warm start converges to the same answer
+    warm = implied_volatility(price, S, K, T, 0.0, is_call, initial_guess=sigma * 1.1)
+    assert np.all(np.abs(warm[solvable] - sigma[solvable]) <= tolerance)
+
+
+def test_prices_outside_no_arbitrage_bounds_are_nan():
+    # Below intrinsic, above the underlying, expired
+    solved = implied_volatility([5.0, 60.0, 3.0], 50.0, [40.0, 40.0, 50.0], [0.1, 0.1, 0.0], 0.0, True)
+    assert np.isnan(solved).all()
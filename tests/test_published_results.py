@@ -0,0 +1,38 @@
+import copy
+from analyzers.iron_condor import IroncondorAnalyzer
+from analyzers.short_vertical import ShortverticalAnalyzer
+from benchmarks.synthetic import synthetic_market_data
+
+
+def _two_snapshots():
+    first = synthetic_market_data(strikes=120)
+    second = synthetic_market_data(strikes=120, spot=5010.0)
+    second['snapshot_version'] = 2
+    return first, second
+
+
+def test_condor_cycles_swap_in_new_results(app):
+    analyzer = IroncondorAnalyzer()
+    first, second = _two_snapshots()
+    with app.app_context():
+        published = analyzer.analyze(first)
+        before = copy.deepcopy(published)
+        latest = analyzer.analyze(second)
+
+    assert latest is not published
+    assert published == before
+    assert 'options_chain' not in latest
+    assert latest['spx_price'] == second['spx_price']
+
+
+def test_vertical_cycles_swap_in_new_results(app):
+    analyzer = ShortverticalAnalyzer()
+    first, second = _two_snapshots()
+    with app.app_context():
+        published = analyzer.analyze(first)
+        before = copy.deepcopy(published)
+        latest = analyzer.analyze(second)
+
+    assert latest is not published
+    assert published == before
+    assert 'options_chain' not in latest
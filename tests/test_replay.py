@@ -0,0 +1,84 @@
+from datetime import timedelta
+import numpy as np
+from models import SPXSpot
+from analyzers.chain import SIDE_FIELDS, ChainSnapshot
+from analyzers.ingest import QuoteBook
+from analyzers.iron_condor import IroncondorAnalyzer
+from analyzers.positions import position_book
+from analyzers.replay import ReplayEngine
+from analyzers.vol_surface import surface_cache
+from benchmarks.synthetic import DEFAULT_START, synthetic_rows
+from conftest import insert_stream
+
+CONDOR = {'premium': 1.5, 'short_put': 4950, 'long_put': 4930, 'short_call': 5050, 'long_call': 5070}
+
+
+def _assert_same(a, b):
+    assert np.array_equal(a.timestamp, b.timestamp)
+    assert np.array_equal(a.exp_date, b.exp_date)
+    assert np.array_equal(a.strike, b.strike)
+    for field in SIDE_FIELDS:
+        for side in ('call', 'put'):
+            assert np.array_equal(getattr(getattr(a, side), field), getattr(getattr(b, side), field), equal_nan=True)
+
+
+def test_upsert_matches_quote_book():
+    rows, _ = synthetic_rows(strikes=30, ticks=4, expirations=2)
+    # Later ticks quote only part of the chain, and new strikes appear
+    extra, _ = synthetic_rows(strikes=40, start=DEFAULT_START + timedelta(minutes=5), seed=3)
+    ticks = [rows[:60], rows[60:75], rows[120:135] + rows[200:210], extra[::3]]
+
+    book, chain = QuoteBook(), ChainSnapshot.empty()
+    for tick in ticks:
+        book.merge(tick)
+        chain, written = chain.upsert(tick)
+        assert written == len(tick)
+        _assert_same(chain, book.snapshot())
+
+    # Stale rows are not written
+    chain, written = chain.upsert(rows[:10])
+    assert written == 0
+    _assert_same(chain, book.snapshot())
+
+
+def test_upsert_updates_existing_arrays_in_place():
+    rows, _ = synthetic_rows(strikes=20, ticks=2)
+    chain, _ = ChainSnapshot.empty().upsert(rows[:20])
+    bid = chain.call.bid
+    updated, written = chain.upsert(rows[20:25])
+    assert updated is chain and written == 5
+    assert updated.call.bid is bid
+
+
+def test_replay_uses_its_own_state(db):
+    rows, _ = synthetic_rows(strikes=40, ticks=3)
+    insert_stream(db, rows)
+    db.session.add(SPXSpot(timestamp=DEFAULT_START, price=5001.25))
+    db.session.commit()
+
+    live_positions = len(position_book)
+    live_builds = surface_cache.builds
+    live = IroncondorAnalyzer()
+    engine = ReplayEngine({'iron_condor': live})
+    analyzer = engine.analyzers['iron_condor']
+    # The analyzer passed in is left as it was
+    assert analyzer is not live and isinstance(analyzer, IroncondorAnalyzer)
+    assert live.position_book is position_book and live.persist_results and live.surface_cache is None
+    assert analyzer.position_book is engine.position_book
+    analyzer.add_position(CONDOR)
+
+    spots = []
+    report = engine.run(DEFAULT_START.date(), on_result=lambda name, ts, results: spots.append(results['spx_price']))
+    assert report['ticks'] == 3 and report['errors'] == 0
+    assert spots == [5001.25] * 3
+    assert len(position_book) == live_positions
+    assert len(engine.position_book.positions('iron_condor', 'open')) == 1
+    # Surfaces were fitted on the replay's cache, once per tick
+    assert engine.surface_cache.builds == 3
+    assert surface_cache.builds == live_builds
+
+
+def test_replay_by_name():
+    engine = ReplayEngine(['iron_condor', 'short_vertical'])
+    assert list(engine.analyzers) == ['iron_condor', 'short_vertical']
+    assert all(a.surface_cache is engine.surface_cache for a in engine.analyzers.values())
@@ -0,0 +1,44 @@
+from datetime import timedelta
+from models import Position
+from analyzers.positions import PositionBook, PositionWriter
+from analyzers.risk import PositionRiskEngine
+from benchmarks.synthetic import DEFAULT_START, synthetic_market_data
+
+CONDOR = {'premium': 1.5, 'short_put': 4950, 'long_put': 4930, 'short_call': 5050, 'long_call': 5070}
+
+
+def test_positions_are_marked_against_their_own_expiration():
+    today = DEFAULT_START.date()
+    data = synthetic_market_data(strikes=80, expirations=2)
+    book = PositionBook(None)
+    front = book.add('iron_condor', dict(CONDOR, exp_date=today.isoformat()))
+    back = book.add('iron_condor', dict(CONDOR, exp_date=(today + timedelta(days=1)).isoformat()))
+    # Left open from yesterday's session: not in today's chain
+    stale = book.add('iron_condor', dict(CONDOR, exp_date=(today - timedelta(days=1)).isoformat()))
+
+    marks = {p['id']: p for p in PositionRiskEngine(book).mark(data)['positions']}
+    assert marks[front['id']]['complete'] and marks[back['id']]['complete']
+    # Same strikes, different expirations: the longer-dated condor is worth more to close
+    assert marks[back['id']]['value'] < marks[front['id']]['value']
+    assert not marks[stale['id']]['complete'] and marks[stale['id']]['pnl'] is None
+
+    # A single-expiration view only prices the positions of that expiration
+    marks = {p['id']: p for p in PositionRiskEngine(book).mark(data.chain.expiry())['positions']}
+    assert marks[front['id']]['complete']
+    assert not marks[back['id']]['complete']
+
+
+def test_expiration_is_persisted(db):
+    book = PositionBook(PositionWriter(Position))
+    position = book.add('iron_condor', dict(CONDOR, exp_date='2024-05-02'))
+    # Without an expiration a position is 0DTE
+    undated = book.add('iron_condor', CONDOR)
+    assert undated['exp_date'] == undated['timestamp'][:10]
+
+    other = PositionBook(None)
+    other.refresh()
+    assert other.get(position['id'])['exp_date'] == '2024-05-02'
+    stored = db.session.execute(
+        db.select(Position.exp_date).where(Position.position_uuid == position['id'])
+    ).scalar()
+    assert stored.isoformat() == '2024-05-02'
@@ -0,0 +1,61 @@
+from datetime import timedelta
+from models import OptionBar, SpreadData
+from analyzers.rollup import RollupJob
+from benchmarks.synthetic import DEFAULT_START, synthetic_rows
+from conftest import insert_stream
+
+
+def _minutes(ticks, start=DEFAULT_START, seed=0):
+    # One full chain per minute
+    rows, _ = synthetic_rows(strikes=12, ticks=ticks, tick_seconds=60, start=start, seed=seed)
+    return rows
+
+
+def _count(database, model):
+    return database.session.execute(database.select(database.func.count()).select_from(model)).scalar()
+
+
+def _duplicate_spread_rows(database):
+    keys = (SpreadData.timestamp, SpreadData.option_type, SpreadData.delta_bucket, SpreadData.point_spread)
+    return database.session.execute(
+        database.select(*keys).group_by(*keys).having(database.func.count() > 1)
+    ).all()
+
+
+def test_backlog_catches_up_in_one_run(db):
+    insert_stream(db, _minutes(11))
+    job = RollupJob(max_minutes=3)
+    # The newest minute is not complete yet
+    assert job.run_cycle() == 10
+    assert _count(db, OptionBar) == 10 * 12
+    assert job.run_cycle() == 0
+    assert _count(db, OptionBar) == 10 * 12
+    assert not _duplicate_spread_rows(db)
+
+
+def test_gap_longer_than_a_chunk_is_skipped(db):
+    insert_stream(db, _minutes(3) + _minutes(3, start=DEFAULT_START + timedelta(hours=3)))
+    job = RollupJob(max_minutes=30)
+    assert job.run_cycle() > 0
+    minutes = db.session.execute(db.select(OptionBar.minute).distinct()).scalars().all()
+    assert len(minutes) == 5
+
+
+def test_late_rows_are_rolled_up(db):
+    insert_stream(db, _minutes(4))
+    RollupJob().run_cycle()
+    spread_rows = _count(db, SpreadData)
+
+    # A tick committed after minute 1 was rolled up, then the next minute
+    late, _ = synthetic_rows(strikes=12, start=DEFAULT_START + timedelta(seconds=90), seed=5)
+    insert_stream(db, late + _minutes(1, start=DEFAULT_START + timedelta(minutes=4), seed=6))
+
+    # A second worker picks up from the bars already written
+    assert RollupJob().run_cycle() == 1
+    ticks = db.session.execute(
+        db.select(OptionBar.ticks).where(OptionBar.minute == DEFAULT_START.replace(tzinfo=None) + timedelta(minutes=1))
+    ).scalars().all()
+    assert ticks == [2] * 12
+    assert _count(db, OptionBar) == 4 * 12
+    assert _count(db, SpreadData) > spread_rows
+    assert not _duplicate_spread_rows(db)
@@ -0,0 +1,37 @@
+from datetime import timedelta
+from models import SPXOptionLatest
+from analyzers.schema import ensure_schema, latest_trigger_installed
+from benchmarks.synthetic import DEFAULT_START, synthetic_rows
+from conftest import insert_stream
+
+
+def _latest_count(database):
+    return database.session.execute(database.select(database.func.count()).select_from(SPXOptionLatest)).scalar()
+
+
+def test_new_trigger_backfills_existing_latest_table(db):
+    # The latest table exists (create_all) but the trigger does not yet
+    rows, _ = synthetic_rows(strikes=25, ticks=2)
+    insert_stream(db, rows)
+    assert not latest_trigger_installed(db.engine)
+    assert _latest_count(db) == 0
+
+    assert ensure_schema(db.engine) == {'latest_chain': True}
+    assert latest_trigger_installed(db.engine)
+    assert _latest_count(db) == 25
+
+    # From now on the trigger keeps it current
+    more, _ = synthetic_rows(strikes=30, start=DEFAULT_START + timedelta(minutes=1), seed=2)
+    insert_stream(db, more)
+    assert _latest_count(db) == 30
+
+
+def test_empty_latest_table_is_backfilled(db):
+    ensure_schema(db.engine)
+    rows, _ = synthetic_rows(strikes=25)
+    insert_stream(db, rows)
+    db.session.execute(db.delete(SPXOptionLatest))
+    db.session.commit()
+
+    ensure_schema(db.engine)
+    assert _latest_count(db) == 25
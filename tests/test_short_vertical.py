@@ -0,0 +1,76 @@
+import pytest
+from analyzers.short_vertical import ShortverticalAnalyzer
+from benchmarks.synthetic import synthetic_market_data
+
+
+def _legacy_vertical(data, params, side):
+    """The original per-profile loop (calls), mirrored for puts"""
+    direction = 1 if side == 'call' else -1
+    rows = sorted(data['calls' if side == 'call' else 'puts'], key=lambda x: x['strike'], reverse=direction < 0)
+    candidates = [
+        o for o in rows
+        if o.get('delta') and params['delta_range']['min'] <= abs(o['delta']) <= params['delta_range']['max']
+    ]
+    opportunities = []
+    for short in candidates:
+        long = next((o for o in rows if o['strike'] == short['strike'] + direction * params['wing_width']), None)
+        if not long:
+            continue
+        premium = short['bid'] - long['ask']
+        if premium >= params['min_premium']:
+            opportunities.append({
+                f'short_{side}': short['strike'],
+                f'long_{side}': long['strike'],
+                'premium': round(premium, 2),
+                'max_loss': round(params['wing_width'] - premium, 2)
+            })
+    return sorted(opportunities, key=lambda x: -x['premium'])[0] if opportunities else None
+
+
+@pytest.mark.parametrize('side', ['call', 'put'])
+def test_vertical_grid_matches_legacy_loops(side):
+    analyzer = ShortverticalAnalyzer()
+    data = synthetic_market_data(strikes=160)
+    grid = analyzer.find_vertical_opportunities(data)[side]
+
+    found = 0
+    for profile, params in analyzer.STRATEGY_PARAMS.items():
+        expected = _legacy_vertical(data, params, side)
+        trade = grid[profile]
+        if expected is None:
+            assert trade is None
+            continue
+        found += 1
+        assert {k: trade[k] for k in expected} == expected
+    assert found >= 2
+
+
+def test_results_keep_the_call_shape():
+    analyzer = ShortverticalAnalyzer()
+    data = synthetic_market_data(strikes=160)
+    results = analyzer.analyze(data)
+    grid = analyzer.find_vertical_opportunities(data)
+
+    # trade_opportunities is profile -> call vertical, as before puts were added
+    assert results['trade_opportunities'].keys() == analyzer.STRATEGY_PARAMS.keys()
+    assert results['trade_opportunities']['moderate']['short_call'] == grid['call']['moderate']['short_call']
+    assert results['put_trade_opportunities']['moderate']['short_put'] == grid['put']['moderate']['short_put']
+    status = analyzer.get_analyzer_status(results)
+    assert status['moderate_found'] == 1 and status['moderate_put_found'] == 1
+
+
+def test_side_finders_share_one_search():
+    analyzer = ShortverticalAnalyzer()
+    data = synthetic_market_data(strikes=160)
+    searches = []
+    search = analyzer.find_vertical_opportunities
+    analyzer.find_vertical_opportunities = lambda data: searches.append(1) or search(data)
+
+    analyzer.analyze(data)
+    for profile in analyzer.STRATEGY_PARAMS:
+        analyzer.find_short_call_vertical_opportunities(data, profile)
+        analyzer.find_short_put_vertical_opportunities(data, profile)
+    assert len(searches) == 1
+
+    analyzer.find_short_put_vertical_opportunities(synthetic_market_data(strikes=160, seed=2), 'moderate')
+    assert len(searches) == 2
@@ -0,0 +1,30 @@
+import numpy as np
+from scipy.stats import linregress
+from analyzers.skew import segment_slopes
+
+
+def test_segment_slopes_match_linregress():
+    rng = np.random.default_rng(1)
+    sizes = [12, 40, 3, 75, 20]
+    starts = np.cumsum([0] + sizes[:-1])
+    x = np.concatenate([np.sort(rng.uniform(4500, 5500, n)) for n in sizes])
+    y = 0.2 - 0.0004 * (x - 5000) + rng.normal(0, 0.01, len(x))
+    valid = rng.random(len(x)) > 0.2
+
+    slopes, counts = segment_slopes(x, y, valid, starts)
+    for i, (start, size) in enumerate(zip(starts, sizes)):
+        rows = np.arange(start, start + size)
+        rows = rows[valid[rows]]
+        assert counts[i] == len(rows)
+        if len(rows) >= 2:
+            assert np.isclose(slopes[i], linregress(x[rows], y[rows]).slope, rtol=1e-9, atol=1e-12)
+        else:
+            assert slopes[i] == 0
+
+
+def test_degenerate_segments_have_zero_slope():
+    x = np.array([5000.0, 5000.0, 5000.0, 4990.0])
+    y = np.array([0.2, 0.3, 0.4, 0.1])
+    slopes, counts = segment_slopes(x, y, np.ones(4, dtype=bool), np.array([0, 3]))
+    assert slopes.tolist() == [0.0, 0.0]
+    assert counts.tolist() == [3, 1]
@@ -0,0 +1,33 @@
+from models import SPXOptionStream
+from analyzers import base
+from analyzers.skew import SkewAnalyzer
+from benchmarks.synthetic import synthetic_rows
+from conftest import insert_stream
+
+
+def test_quote_rewritten_at_the_watermark_is_a_new_snapshot(db):
+    rows, _ = synthetic_rows(strikes=20)
+    insert_stream(db, rows)
+    analyzer = SkewAnalyzer()
+    first = analyzer.get_market_data()
+
+    # Same rows, same newest timestamp; one quote corrected in place
+    strike = rows[5][2]
+    db.session.execute(
+        db.update(SPXOptionStream).where(SPXOptionStream.strike_price == strike).values(call_bid=123.0)
+    )
+    db.session.commit()
+    base.chain_cache.invalidate()
+
+    second = analyzer.get_market_data()
+    assert len(second.chain) == len(first.chain)
+    assert second['snapshot_version'] == first['snapshot_version'] + 1
+    assert 123.0 in second.chain.call.bid
+
+
+def test_unchanged_book_keeps_the_snapshot(db):
+    insert_stream(db, synthetic_rows(strikes=20)[0])
+    analyzer = SkewAnalyzer()
+    first = analyzer.get_market_data()
+    base.chain_cache.invalidate()
+    assert analyzer.get_market_data() is first
@@ -0,0 +1,20 @@
+import json
+import os
+import subprocess
+import sys
+from conftest import ROOT
+
+PROBE = """
+import json, sys
+import analyzers, analyzers.ingest, analyzers.risk, analyzers.replay
+import flaskdashboard
+flaskdashboard.create_app()
+print(json.dumps([m for m in ('pandas', 'scipy') if m in sys.modules]))
+"""
+
+
+def test_create_app_does_not_load_heavy_modules():
+    env = dict(os.environ, SCHEDULER_ENABLED='False', ROLLUP_ENABLED='False')
+    out = subprocess.run([sys.executable, '-c', PROBE], cwd=ROOT, env=env,
+                         capture_output=True, text=True, check=True)
+    assert json.loads(out.stdout.strip().splitlines()[-1]) == []
@@ -0,0 +1,64 @@
+from analyzers.base import BaseAnalyzer
+from routes.versioning import BOOT_ID, version_tag, versioned_json
+
+
+class ListAnalyzer(BaseAnalyzer):
+    name = 'list'
+    delta_collections = {'items': ('id',)}
+
+
+def _publish(analyzer, ids):
+    analyzer.publish({'items': [{'id': i} for i in ids]})
+
+
+def _get(app, analyzer, query='', headers=None, build=dict):
+    with app.test_request_context(f'/data{query}', headers=headers or {}):
+        return versioned_json(analyzer, 'data', build)
+
+
+def test_etag_is_tagged_with_the_boot_id(app):
+    analyzer = ListAnalyzer()
+    _publish(analyzer, [1, 2])
+    response = _get(app, analyzer)
+    etag = response.get_etag()[0]
+    assert etag == f"list-{BOOT_ID}-1"
+    assert response.get_json()['version'] == version_tag(1)
+
+    assert _get(app, analyzer, headers={'If-None-Match': f'"{etag}"'}).status_code == 304
+    # Same version number from another worker or an earlier process
+    assert _get(app, analyzer, headers={'If-None-Match': '"list-0123456789ab-1"'}).status_code == 200
+
+
+def test_since_from_another_process_gets_the_full_result(app):
+    analyzer = ListAnalyzer()
+    _publish(analyzer, [1, 2])
+    _publish(analyzer, [2, 3])
+
+    delta = _get(app, analyzer, f'?since={version_tag(1)}').get_json()
+    assert delta['full'] is False
+    assert delta['changed'] == {'items': [{'id': 3}]}
+    assert delta['removed'] == {'items': [[1]]}
+
+    for since in ('1', '0123456789ab-1', 'garbage'):
+        payload = _get(app, analyzer, f'?since={since}').get_json()
+        assert payload['full'] is True
+        assert payload['items'] == [{'id': 2}, {'id': 3}]
+
+
+def test_body_matches_the_version_it_is_served_under(app):
+    analyzer = ListAnalyzer()
+    analyzer.scheduled = True
+    _publish(analyzer, [1, 2])
+
+    def build(results):
+        # A cycle publishes while the body is being built
+        _publish(analyzer, [9])
+        return dict(results)
+
+    first = _get(app, analyzer, build=build).get_json()
+    assert first['version'] == version_tag(1)
+    assert first['items'] == [{'id': 1}, {'id': 2}]
+
+    second = _get(app, analyzer).get_json()
+    assert second['version'] == version_tag(2)
+    assert second['items'] == [{'id': 9}]